@@ -1 +1,6 @@
-# Django project initialization
\ No newline at end of file
+# Django project initialization
+
+# Load the Celery app when Django starts so shared_task producers use it
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
@@ -13,4 +13,14 @@ app = Celery('healthkart360')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # Load task modules from all registered Django apps.
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+def can_queue_tasks():
+    """Whether tasks can be handed to a worker.
+
+    Without REDIS_URL the broker falls back to localhost, which is normally
+    absent in development; callers then do the work inline instead of
+    blocking on connection retries.
+    """
+    from django.conf import settings
+    return bool(settings.REDIS_URL) or getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False)
@@ -99,6 +99,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'healthkart360.wsgi.application'
+ASGI_APPLICATION = 'healthkart360.asgi.application'
 
 # Database
 # Using SQLite for development and production to avoid connection issues
@@ -288,15 +289,73 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Reminders are dispatched by Celery tasks queued with an ETA for each fire
+# time, reconciled hourly; turn off to poll for due reminders every minute.
+# On by default only with Redis, which the ETA tasks need as their broker
+REMINDER_ETA_TASKS = os.getenv('REMINDER_ETA_TASKS', str(bool(REDIS_URL))) == 'True'
+
+# Redis redelivers tasks not acknowledged within the visibility timeout;
+# keep it above the longest ETA queued (one hour ahead)
+CELERY_BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': 2 * 60 * 60}
+
 # Celery Beat Schedule for reminder emails
 from celery.schedules import crontab
 CELERY_BEAT_SCHEDULE = {
     'send-reminder-emails': {
+        'task': 'reminders.tasks.reconcile_reminder_tasks',
+        'schedule': crontab(minute=0),  # Hourly
+    } if REMINDER_ETA_TASKS else {
         'task': 'reminders.tasks.send_reminder_emails',
         'schedule': crontab(minute='*'),  # Every minute
     },
+    'archive-old-orders': {
+        'task': 'orders.tasks.archive_old_orders',
+        'schedule': crontab(hour=3, minute=30),  # Daily, off-peak
+    },
+    'forecast-restock-suggestions': {
+        'task': 'medicines.tasks.forecast_restock_suggestions',
+        'schedule': crontab(hour=2, minute=30),  # Nightly
+    },
+    'batch-advance-orders': {
+        'task': 'orders.tasks.batch_advance_order_items',
+        'schedule': crontab(minute=0),  # Hourly
+    },
+    'release-expired-reservations': {
+        'task': 'orders.tasks.release_expired_reservations',
+        'schedule': crontab(minute='*/10'),
+    },
+    'send-low-stock-digests': {
+        'task': 'medicines.tasks.send_low_stock_digests',
+        'schedule': crontab(minute='*/15'),
+    },
 }
 
+# Order archival: completed/cancelled orders untouched for this many days are
+# moved to the archive tables in batches of ORDER_ARCHIVE_BATCH_SIZE
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv('ORDER_ARCHIVE_AFTER_DAYS', '365'))
+ORDER_ARCHIVE_BATCH_SIZE = int(os.getenv('ORDER_ARCHIVE_BATCH_SIZE', '500'))
+
+# Stock held for a cart while the customer completes an online payment
+STOCK_RESERVATION_SECONDS = int(os.getenv('STOCK_RESERVATION_SECONDS', '900'))
+
+# Bulk email delivery (reminder bursts): messages per SMTP connection and sending threads
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', '100'))
+EMAIL_BATCH_WORKERS = int(os.getenv('EMAIL_BATCH_WORKERS', '8'))
+
+# Reminder dispatch is split into this many shards (parallel tasks), at most 64
+REMINDER_DISPATCH_SHARDS = int(os.getenv('REMINDER_DISPATCH_SHARDS', '4'))
+
+# Due-queue without Redis: 'local' keeps it in process memory (one dispatching
+# process); 'database' pops straight from the next_fire_at index, for several
+# dispatching processes or one-shot cron runs of send_reminders
+REMINDER_DUE_QUEUE = os.getenv('REMINDER_DUE_QUEUE', 'local')
+
+# Reminders found due this late (missed ticks, deploys) are still sent; older ones are skipped
+REMINDER_CATCH_UP_MINUTES = int(os.getenv('REMINDER_CATCH_UP_MINUTES', '360'))
+
+# A medicine that fell to its reorder point is not alerted again for this long
+STOCK_ALERT_DEBOUNCE_SECONDS = int(os.getenv('STOCK_ALERT_DEBOUNCE_SECONDS', '21600'))
+
 # IMPORTANT:
 # - For Gmail, you must enable 2-Step Verification and create an App Password.
 # - Do NOT use your normal Gmail password here.
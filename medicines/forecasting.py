@@ -0,0 +1,134 @@
+import logging
+import math
+from datetime import datetime, time, timedelta
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Medicine, RestockSuggestion
+
+logger = logging.getLogger(__name__)
+
+
+class DemandForecastService:
+    """Forecast medicine demand from the order history and suggest reorder quantities.
+
+    Sales are read with one grouped query and laid out as a
+    (medicines x days) matrix, so every forecast below is a handful of NumPy
+    operations over all series at once rather than a query per medicine.
+    """
+
+    WINDOW_DAYS = 56  # Eight full weeks of history
+    SHORT_WINDOW_DAYS = 7
+    LONG_WINDOW_DAYS = 28
+    HORIZON_DAYS = 14  # Supplier lead time plus review period
+    SERVICE_LEVEL_Z = 1.65  # ~95% chance of not running out during the horizon
+    # Weekday factors are pulled halfway back to 1 so sparse series do not swing
+    SEASONAL_DAMPING = 0.5
+    EXCLUDED_STATUSES = ('cancelled',)
+
+    @staticmethod
+    def daily_sales(start, end, pharmacy_id=None):
+        """Units sold per (medicine, day) in [start, end), as a DataFrame"""
+        from orders.models import OrderItem
+
+        # Local-midnight bounds keep the filter a plain range on created_at
+        items = OrderItem.objects.filter(
+            order__created_at__gte=timezone.make_aware(datetime.combine(start, time.min)),
+            order__created_at__lt=timezone.make_aware(datetime.combine(end, time.min)),
+        ).exclude(order__status__in=DemandForecastService.EXCLUDED_STATUSES)
+        if pharmacy_id is not None:
+            items = items.filter(order__pharmacy_id=pharmacy_id)
+
+        rows = items.annotate(day=TruncDate('order__created_at')).values('medicine_id', 'day').annotate(
+            units=Sum('quantity')
+        ).values_list('medicine_id', 'day', 'units')
+        return pd.DataFrame.from_records(list(rows), columns=['medicine_id', 'day', 'units'])
+
+    @staticmethod
+    def demand_matrix(sales, start, days):
+        """Pivot daily sales into a dense (medicines x days) matrix of units"""
+        medicine_ids, series = np.unique(sales['medicine_id'].to_numpy(), return_inverse=True)
+        offsets = (pd.to_datetime(sales['day']) - pd.Timestamp(start)).dt.days.to_numpy()
+        matrix = np.zeros((len(medicine_ids), days))
+        np.add.at(matrix, (series, offsets), sales['units'].to_numpy(dtype=float))
+        return medicine_ids, matrix
+
+    @staticmethod
+    def forecast(matrix, horizon_days=None):
+        """Vectorized forecasts for every row of the demand matrix.
+
+        The level is the mean of the short and long moving averages; weekday
+        seasonality comes from the per-weekday means over the whole window.
+        Returns (average daily demand, forecast over the horizon, safety stock).
+        """
+        horizon_days = horizon_days or DemandForecastService.HORIZON_DAYS
+        days = matrix.shape[1]
+
+        short_average = matrix[:, -DemandForecastService.SHORT_WINDOW_DAYS:].mean(axis=1)
+        long_average = matrix[:, -DemandForecastService.LONG_WINDOW_DAYS:].mean(axis=1)
+        level = (short_average + long_average) / 2
+
+        # Column j of the matrix is start + j; fold it into weeks to get weekday means
+        weeks = days // 7
+        weekday_means = matrix[:, days - weeks * 7:].reshape(len(matrix), weeks, 7).mean(axis=1)
+        overall = weekday_means.mean(axis=1, keepdims=True)
+        factors = np.divide(weekday_means, overall, out=np.ones_like(weekday_means), where=overall > 0)
+        factors = 1 + (factors - 1) * DemandForecastService.SEASONAL_DAMPING
+
+        # Which weekday column each day of the horizon falls on
+        first_column = (days - weeks * 7) % 7
+        horizon_columns = (np.arange(days, days + horizon_days) - first_column) % 7
+        forecast = level * factors[:, horizon_columns].sum(axis=1)
+
+        volatility = matrix[:, -DemandForecastService.LONG_WINDOW_DAYS:].std(axis=1)
+        safety_stock = DemandForecastService.SERVICE_LEVEL_Z * volatility * math.sqrt(horizon_days)
+        return long_average, forecast, safety_stock
+
+    @staticmethod
+    def refresh(pharmacy_id=None, horizon_days=None):
+        """Recompute and store restock suggestions; returns the number stored"""
+        horizon_days = horizon_days or DemandForecastService.HORIZON_DAYS
+        now = timezone.now()
+        end = timezone.localdate(now)  # Today is still partial and left out
+        start = end - timedelta(days=DemandForecastService.WINDOW_DAYS)
+
+        stock = Medicine.objects.all()
+        if pharmacy_id is not None:
+            stock = stock.filter(pharmacy_id=pharmacy_id)
+        stock = {medicine_id: (pharmacy, quantity) for medicine_id, pharmacy, quantity in stock.values_list('id', 'pharmacy_id', 'quantity')}
+
+        sales = DemandForecastService.daily_sales(start, end, pharmacy_id)
+        suggestions = []
+        if not sales.empty:
+            medicine_ids, matrix = DemandForecastService.demand_matrix(sales, start, DemandForecastService.WINDOW_DAYS)
+            average, forecast, safety_stock = DemandForecastService.forecast(matrix, horizon_days)
+            current = np.array([stock.get(medicine_id, (None, 0))[1] for medicine_id in medicine_ids])
+            suggested = np.ceil(np.maximum(forecast + safety_stock - current, 0)).astype(int)
+
+            for i, medicine_id in enumerate(medicine_ids.tolist()):
+                if medicine_id not in stock:
+                    continue  # Deleted since it was sold
+                suggestions.append(RestockSuggestion(
+                    medicine_id=medicine_id,
+                    pharmacy_id=stock[medicine_id][0],
+                    average_daily_demand=round(float(average[i]), 3),
+                    forecast_demand=round(float(forecast[i]), 3),
+                    safety_stock=round(float(safety_stock[i]), 3),
+                    current_stock=int(current[i]),
+                    suggested_quantity=int(suggested[i]),
+                    horizon_days=horizon_days,
+                    generated_at=now,
+                ))
+
+        with transaction.atomic():
+            existing = RestockSuggestion.objects.all()
+            if pharmacy_id is not None:
+                existing = existing.filter(pharmacy_id=pharmacy_id)
+            existing.delete()
+            RestockSuggestion.objects.bulk_create(suggestions, batch_size=1000)
+
+        logger.info(f"Stored {len(suggestions)} restock suggestions" + (f" for pharmacy {pharmacy_id}" if pharmacy_id else ""))
+        return len(suggestions)
@@ -6,7 +6,7 @@ class MedicineForm(forms.ModelForm):
         model = Medicine
         fields = [
             'name', 'generic_name', 'brand', 'medicine_type', 'strength',
-            'price', 'quantity', 'expiry_date', 'batch_number',
+            'price', 'quantity', 'reorder_point', 'expiry_date', 'batch_number',
             'is_essential', 'is_prescription_required'
         ]
         widgets = {
@@ -38,6 +38,10 @@ class MedicineForm(forms.ModelForm):
                 'class': 'form-control',
                 'min': '0'
             }),
+            'reorder_point': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'min': '0'
+            }),
             'expiry_date': forms.DateInput(attrs={
                 'class': 'form-control',
                 'type': 'date'
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from medicines.forecasting import DemandForecastService
+
+
+class Command(BaseCommand):
+    help = 'Forecast medicine demand from the order history and store suggested reorder quantities'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pharmacy',
+            type=int,
+            help='Only forecast medicines of the pharmacy with this ID',
+        )
+        parser.add_argument(
+            '--horizon',
+            type=int,
+            default=DemandForecastService.HORIZON_DAYS,
+            help=f'Days of demand to cover (default: {DemandForecastService.HORIZON_DAYS})',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stored = DemandForecastService.refresh(pharmacy_id=options['pharmacy'], horizon_days=options['horizon'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Stored {stored} restock suggestions in {elapsed:.2f}s"))
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0005_alter_pharmacy_owner'),
+        ('medicines', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicineAvailabilityIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('medicine_count', models.PositiveIntegerField(default=0)),
+                ('in_stock_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('pharmacy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_tokens', to='pharmacy.pharmacy')),
+            ],
+            options={
+                'unique_together': {('token', 'pharmacy')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicines', '0003_medicineavailabilityindex'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicine',
+            index=models.Index(fields=['quantity', 'pharmacy'], name='medicines_m_quantit_60ef5f_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0005_alter_pharmacy_owner'),
+        ('medicines', '0004_medicine_quantity_pharmacy_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestockSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('average_daily_demand', models.FloatField(default=0)),
+                ('forecast_demand', models.FloatField(default=0, help_text='Expected units sold over the forecast horizon')),
+                ('safety_stock', models.FloatField(default=0)),
+                ('current_stock', models.IntegerField(default=0)),
+                ('suggested_quantity', models.PositiveIntegerField(default=0)),
+                ('horizon_days', models.PositiveSmallIntegerField()),
+                ('generated_at', models.DateTimeField()),
+                ('medicine', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='restock_suggestion', to='medicines.medicine')),
+                ('pharmacy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='restock_suggestions', to='pharmacy.pharmacy')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['pharmacy', 'suggested_quantity'], name='medicines_r_pharmac_ff61da_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0005_alter_pharmacy_owner'),
+        ('medicines', '0005_restocksuggestion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicine',
+            name='reorder_point',
+            field=models.PositiveIntegerField(default=10, help_text='Stock below this level counts as low and raises a restock alert'),
+        ),
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(help_text='Stock right after the crossing')),
+                ('reorder_point', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('notified_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('medicine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='medicines.medicine')),
+                ('pharmacy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='pharmacy.pharmacy')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['pharmacy', 'notified_at'], name='medicines_s_pharmac_41749b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicines', '0006_reorder_point_stock_alert'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='medicine',
+            name='reorder_point',
+            field=models.PositiveIntegerField(default=10, help_text='Stock at or below this level counts as low and raises a restock alert'),
+        ),
+        migrations.AddIndex(
+            model_name='stockalert',
+            index=models.Index(fields=['medicine', 'created_at'], name='medicines_s_medicin_fd03e3_idx'),
+        ),
+    ]
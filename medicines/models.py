@@ -25,12 +25,19 @@ class Medicine(models.Model):
     strength = models.CharField(max_length=50)  # e.g., "500mg", "10ml"
     price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.IntegerField(default=0)
+    reorder_point = models.PositiveIntegerField(default=10, help_text="Stock at or below this level counts as low and raises a restock alert")
     expiry_date = models.DateField()
     batch_number = models.CharField(max_length=50)
     is_essential = models.BooleanField(default=False)
     is_prescription_required = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Low / out of stock catalog scans, optionally for one pharmacy
+            models.Index(fields=['quantity', 'pharmacy']),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.brand}) - {self.pharmacy.name}"
@@ -63,3 +70,70 @@ class MedicineAlternative(models.Model):
     
     def __str__(self):
         return f"{self.original_medicine.name} -> {self.alternative_medicine.name}"
+
+class MedicineAvailabilityIndex(models.Model):
+    """Which pharmacies stock, or have stocked, medicines carrying a name token.
+
+    One row per (normalized name token, pharmacy). Rows are kept when the
+    stock runs out so pharmacies that have carried a medicine can still be
+    routed advance orders for it. Maintained by ``MedicineAvailabilityService``.
+    """
+    token = models.CharField(max_length=64)
+    pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE, related_name='availability_tokens')
+    medicine_count = models.PositiveIntegerField(default=0)
+    in_stock_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('token', 'pharmacy')
+
+    def __str__(self):
+        return f"{self.token} -> {self.pharmacy.name} ({self.in_stock_count}/{self.medicine_count} in stock)"
+
+class RestockSuggestion(models.Model):
+    """Nightly demand forecast and suggested reorder quantity for a medicine.
+
+    Written in bulk by ``DemandForecastService`` from the order history;
+    one row per medicine that sold during the forecast window.
+    """
+    medicine = models.OneToOneField(Medicine, on_delete=models.CASCADE, related_name='restock_suggestion')
+    pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE, related_name='restock_suggestions')
+    average_daily_demand = models.FloatField(default=0)
+    forecast_demand = models.FloatField(default=0, help_text="Expected units sold over the forecast horizon")
+    safety_stock = models.FloatField(default=0)
+    current_stock = models.IntegerField(default=0)
+    suggested_quantity = models.PositiveIntegerField(default=0)
+    horizon_days = models.PositiveSmallIntegerField()
+    generated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pharmacy', 'suggested_quantity']),
+        ]
+
+    def __str__(self):
+        return f"Reorder {self.suggested_quantity} x {self.medicine.name}"
+
+class StockAlert(models.Model):
+    """A medicine's stock falling to or below its reorder point.
+
+    Recorded by ``StockAlertService`` from the stock write paths and mailed to
+    the pharmacy in one digest per run; ``notified_at`` is set once sent.
+    """
+    pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE, related_name='stock_alerts')
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name='stock_alerts')
+    quantity = models.IntegerField(help_text="Stock right after the crossing")
+    reorder_point = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    notified_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['pharmacy', 'notified_at']),
+            # Debounce and sweep look up a medicine's latest alert
+            models.Index(fields=['medicine', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.medicine.name} at {self.quantity} (reorder point {self.reorder_point})"
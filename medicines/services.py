@@ -0,0 +1,285 @@
+import re
+import logging
+from collections import defaultdict
+from django.db import transaction
+from .models import Medicine, MedicineAvailabilityIndex, StockAlert
+
+logger = logging.getLogger(__name__)
+
+
+class MedicineAvailabilityService:
+    """Service class maintaining and querying the MedicineAvailabilityIndex"""
+
+    MAX_TOKEN_LENGTH = 64
+    # Words that say nothing about which medicine is meant
+    STOP_WORDS = {'tab', 'tabs', 'tablet', 'tablets', 'cap', 'caps', 'capsule', 'capsules', 'syrup',
+                  'injection', 'cream', 'drops', 'mg', 'ml', 'mcg', 'gm'}
+    # Placeholder medicines created for advance orders are not real stock
+    PLACEHOLDER_BRAND = 'Advance Order'
+
+    @staticmethod
+    def tokenize(text):
+        """Normalized name tokens: lowercased words, without numbers and dosage words"""
+        return [
+            token[:MedicineAvailabilityService.MAX_TOKEN_LENGTH]
+            for token in re.findall(r'\w+', str(text or '').lower())
+            if not token.isdigit() and len(token) > 1 and token not in MedicineAvailabilityService.STOP_WORDS
+        ]
+
+    @staticmethod
+    def refresh_pharmacy(pharmacy_id):
+        """Recompute the index rows of one pharmacy from its medicines.
+
+        Tokens the pharmacy no longer carries keep their row with zero
+        counts, recording that it has stocked them before.
+        """
+        medicine_counts = defaultdict(int)
+        in_stock_counts = defaultdict(int)
+        medicines = Medicine.objects.filter(pharmacy_id=pharmacy_id).exclude(
+            brand=MedicineAvailabilityService.PLACEHOLDER_BRAND
+        ).values_list('name', 'generic_name', 'quantity')
+        for name, generic_name, quantity in medicines:
+            for token in set(MedicineAvailabilityService.tokenize(f"{name} {generic_name}")):
+                medicine_counts[token] += 1
+                if quantity > 0:
+                    in_stock_counts[token] += 1
+
+        with transaction.atomic():
+            rows = {row.token: row for row in MedicineAvailabilityIndex.objects.filter(pharmacy_id=pharmacy_id)}
+            changed, created = [], []
+            for token in set(rows) | set(medicine_counts):
+                counts = (medicine_counts.get(token, 0), in_stock_counts.get(token, 0))
+                row = rows.get(token)
+                if row is None:
+                    created.append(MedicineAvailabilityIndex(
+                        token=token, pharmacy_id=pharmacy_id, medicine_count=counts[0], in_stock_count=counts[1]
+                    ))
+                elif (row.medicine_count, row.in_stock_count) != counts:
+                    row.medicine_count, row.in_stock_count = counts
+                    changed.append(row)
+            if created:
+                MedicineAvailabilityIndex.objects.bulk_create(created)
+            if changed:
+                MedicineAvailabilityIndex.objects.bulk_update(changed, ['medicine_count', 'in_stock_count'])
+        return len(created) + len(changed)
+
+    @staticmethod
+    def schedule_refresh(pharmacy_id):
+        """Refresh a pharmacy's rows once the current transaction commits"""
+        def refresh():
+            try:
+                MedicineAvailabilityService.refresh_pharmacy(pharmacy_id)
+            except Exception as e:
+                # Never fail an inventory write because of the routing index
+                logger.error(f"Failed to refresh availability index for pharmacy {pharmacy_id}: {e}")
+
+        transaction.on_commit(refresh)
+
+    @staticmethod
+    def rebuild():
+        """Refresh the index for every pharmacy; returns the number of rows written"""
+        pharmacy_ids = Medicine.objects.values_list('pharmacy_id', flat=True).distinct()
+        return sum(MedicineAvailabilityService.refresh_pharmacy(pharmacy_id) for pharmacy_id in pharmacy_ids)
+
+    @staticmethod
+    def route(names):
+        """Pick the best pharmacy for each medicine name, with one index query.
+
+        A pharmacy scores per matching token, double when it has the medicine
+        in stock and double again for the first token of the name. Returns
+        a dict of name -> pharmacy id, or None when nothing matches.
+        """
+        tokens_by_name = {name: MedicineAvailabilityService.tokenize(name) for name in names}
+        all_tokens = {token for tokens in tokens_by_name.values() for token in tokens}
+        if not all_tokens:
+            return {name: None for name in names}
+
+        if not MedicineAvailabilityIndex.objects.exists():
+            MedicineAvailabilityService.rebuild()
+
+        pharmacies_by_token = defaultdict(list)
+        for token, pharmacy_id, in_stock_count in MedicineAvailabilityIndex.objects.filter(
+            token__in=all_tokens
+        ).values_list('token', 'pharmacy_id', 'in_stock_count'):
+            pharmacies_by_token[token].append((pharmacy_id, in_stock_count))
+
+        routes = {}
+        for name, tokens in tokens_by_name.items():
+            scores = defaultdict(int)
+            for position, token in enumerate(dict.fromkeys(tokens)):
+                for pharmacy_id, in_stock_count in pharmacies_by_token.get(token, ()):
+                    score = 2 if in_stock_count else 1
+                    scores[pharmacy_id] += score * 2 if position == 0 else score
+            # Highest score wins; ties go to the oldest pharmacy for stable routing
+            routes[name] = min(scores, key=lambda pharmacy_id: (-scores[pharmacy_id], pharmacy_id)) if scores else None
+        return routes
+
+
+class MedicineCatalogService:
+    """Service class serving the low / out of stock catalog used for advance ordering"""
+
+    DEFAULT_PAGE_SIZE = 25
+    MAX_PAGE_SIZE = 100
+
+    @staticmethod
+    def advance_catalog(stock='low', pharmacy_id=None, generic_name=None, query=None, cursor=0, limit=None):
+        """Return one keyset page of low (``stock='low'``) or out of stock medicines.
+
+        Low stock means in stock but at or below the medicine's own reorder point.
+
+        Pages are ordered by id; pass ``next_cursor`` back as ``cursor`` to
+        continue. The stock filter plus pharmacy hits the (quantity, pharmacy)
+        index, so a page never scans the whole catalog.
+        """
+        from django.db.models import F, Q
+
+        limit = min(limit or MedicineCatalogService.DEFAULT_PAGE_SIZE, MedicineCatalogService.MAX_PAGE_SIZE)
+        if stock == 'out':
+            medicines = Medicine.objects.filter(quantity=0)
+        else:
+            medicines = Medicine.objects.filter(quantity__gt=0, quantity__lte=F('reorder_point'))
+
+        if pharmacy_id:
+            medicines = medicines.filter(pharmacy_id=pharmacy_id)
+        if generic_name:
+            medicines = medicines.filter(generic_name__iexact=generic_name)
+        if query:
+            medicines = medicines.filter(Q(name__icontains=query) | Q(generic_name__icontains=query))
+
+        page = list(medicines.filter(id__gt=cursor).order_by('id').values(
+            'id', 'name', 'generic_name', 'strength', 'quantity', 'price', 'pharmacy_id', 'pharmacy__name'
+        )[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+        return {
+            'medicines': [
+                {
+                    'id': row['id'],
+                    'name': row['name'],
+                    'generic_name': row['generic_name'],
+                    'strength': row['strength'],
+                    'quantity': row['quantity'],
+                    'price': str(row['price']),
+                    'pharmacy_id': row['pharmacy_id'],
+                    'pharmacy_name': row['pharmacy__name'],
+                }
+                for row in page
+            ],
+            'next_cursor': page[-1]['id'] if page else cursor,
+            'has_more': has_more,
+        }
+
+
+class StockAlertService:
+    """Service class detecting reorder-point crossings and mailing low stock digests.
+
+    Stock write paths pass the quantities they already know (before and after
+    the write) to ``schedule``; crossings are found in memory, so a write that
+    crosses nothing costs no query. Alerts are debounced per medicine against
+    its latest ``StockAlert`` row, so every worker sees the same window, and
+    coalesced into one digest per pharmacy by ``send_digests``.
+    """
+
+    # Medicines changed this recently are re-checked by the sweep
+    SWEEP_WINDOW_HOURS = 24
+
+    @staticmethod
+    def debounce_seconds():
+        from django.conf import settings
+        return getattr(settings, 'STOCK_ALERT_DEBOUNCE_SECONDS', 6 * 60 * 60)
+
+    @staticmethod
+    def crossings(changes):
+        """Changes whose stock went from above the reorder point to at or below it.
+
+        ``changes`` yields (medicine id, pharmacy id, reorder point, old
+        quantity, new quantity) tuples.
+        """
+        return [change for change in changes if change[3] > change[2] >= change[4]]
+
+    @staticmethod
+    def schedule(changes):
+        """Record alerts for the crossings in ``changes`` once the transaction commits"""
+        crossed = StockAlertService.crossings(changes)
+        if crossed:
+            transaction.on_commit(lambda: StockAlertService.record(crossed))
+        return len(crossed)
+
+    @staticmethod
+    def record(crossed):
+        """Store alerts for crossings, skipping medicines alerted within the debounce window"""
+        from datetime import timedelta
+        from django.utils import timezone
+
+        try:
+            # The last crossing of a medicine written twice in one batch wins
+            latest = {change[0]: change for change in crossed}
+            since = timezone.now() - timedelta(seconds=StockAlertService.debounce_seconds())
+            recent = set(StockAlert.objects.filter(
+                medicine_id__in=latest, created_at__gte=since
+            ).values_list('medicine_id', flat=True))
+            alerts = [
+                StockAlert(medicine_id=medicine_id, pharmacy_id=pharmacy_id, reorder_point=reorder_point, quantity=new)
+                for medicine_id, pharmacy_id, reorder_point, old, new in latest.values()
+                if medicine_id not in recent
+            ]
+            if alerts:
+                StockAlert.objects.bulk_create(alerts)
+                logger.info(f"Recorded {len(alerts)} low stock alerts")
+            return len(alerts)
+        except Exception as e:
+            # Never fail a stock write because of an alert
+            logger.error(f"Failed to record low stock alerts: {e}")
+            return 0
+
+    @staticmethod
+    def sweep():
+        """Alert recently changed medicines that are at or below their reorder point without an alert.
+
+        Catches crossings the write paths could not see, e.g. two concurrent
+        checkouts that each decremented from a stale quantity. Like
+        ``crossings``, this includes medicines that sold out (quantity 0):
+        they are out of stock rather than low stock on the dashboards, but
+        they need restocking all the more.
+        """
+        from datetime import timedelta
+        from django.db.models import Exists, F, OuterRef
+        from django.utils import timezone
+
+        since = timezone.now() - timedelta(hours=StockAlertService.SWEEP_WINDOW_HOURS)
+        alerted = StockAlert.objects.filter(medicine=OuterRef('pk'), created_at__gte=OuterRef('updated_at'))
+        missed = Medicine.objects.filter(
+            updated_at__gte=since, quantity__lte=F('reorder_point')
+        ).exclude(Exists(alerted)).values_list('id', 'pharmacy_id', 'reorder_point', 'quantity')
+        return StockAlertService.record([
+            (medicine_id, pharmacy_id, reorder_point, reorder_point + 1, quantity)
+            for medicine_id, pharmacy_id, reorder_point, quantity in missed
+        ])
+
+    @staticmethod
+    def send_digests():
+        """Mail each pharmacy one digest of its pending alerts; returns the number sent.
+
+        Medicines restocked above their reorder point before the digest
+        went out are dropped from it.
+        """
+        from django.utils import timezone
+        from notifications.services import NotificationService
+
+        pending = defaultdict(dict)
+        alert_ids = defaultdict(list)
+        for alert in StockAlert.objects.filter(notified_at__isnull=True).select_related(
+            'medicine', 'pharmacy__owner'
+        ).order_by('created_at'):
+            alert_ids[alert.pharmacy_id].append(alert.id)
+            if alert.medicine.quantity <= alert.medicine.reorder_point:
+                pending[alert.pharmacy_id][alert.medicine_id] = alert  # Latest alert per medicine
+
+        sent = 0
+        for pharmacy_id, ids in alert_ids.items():
+            alerts = sorted(pending[pharmacy_id].values(), key=lambda alert: alert.medicine.quantity)
+            if alerts and not NotificationService.send_low_stock_digest(alerts[0].pharmacy, alerts):
+                continue  # Left pending for the next run
+            StockAlert.objects.filter(id__in=ids).update(notified_at=timezone.now())
+            sent += bool(alerts)
+        return sent
@@ -0,0 +1,42 @@
+from celery import shared_task
+from django.db import connections
+import logging
+
+logger = logging.getLogger(__name__)
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=300)
+def forecast_restock_suggestions(self):
+    """
+    Celery task refreshing the nightly demand forecasts and suggested
+    reorder quantities for every pharmacy.
+    """
+    from .forecasting import DemandForecastService
+
+    try:
+        stored = DemandForecastService.refresh()
+        logger.info(f"[Celery Task] Stored {stored} restock suggestions")
+        return stored
+    except Exception as exc:
+        logger.error(f"[Celery Task] Error forecasting restock suggestions: {exc}. Retrying...")
+        raise self.retry(exc=exc)
+    finally:
+        connections.close_all()
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=120)
+def send_low_stock_digests(self):
+    """
+    Celery task mailing each pharmacy one digest of the medicines that
+    crossed below their reorder point since the last run.
+    """
+    from .services import StockAlertService
+
+    try:
+        StockAlertService.sweep()
+        sent = StockAlertService.send_digests()
+        logger.info(f"[Celery Task] Sent {sent} low stock digests")
+        return sent
+    except Exception as exc:
+        logger.error(f"[Celery Task] Error sending low stock digests: {exc}. Retrying...")
+        raise self.retry(exc=exc)
+    finally:
+        connections.close_all()
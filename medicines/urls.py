@@ -14,4 +14,5 @@ urlpatterns = [
     path('<int:medicine_id>/details/', views.medicine_details, name='details'),
     path('bulk-update-stock/', views.bulk_update_stock, name='bulk_update_stock'),
     path('<int:medicine_id>/delete-ajax/', views.delete_medicine_ajax, name='delete_ajax'),
+    path('restock-suggestions/', views.restock_suggestions, name='restock_suggestions'),
 ]
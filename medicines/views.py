@@ -2,10 +2,13 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from django.db.models import Q
+from django.db.models import F, Q
+from decimal import Decimal
 from django.template.loader import render_to_string
-from .models import Medicine, MedicineAlternative
+from .models import Medicine, MedicineAlternative, RestockSuggestion
 from .forms import MedicineForm
+from orders.services import CartService
+from .services import MedicineAvailabilityService, StockAlertService
 
 @login_required
 def add_medicine(request):
@@ -21,6 +24,7 @@ def add_medicine(request):
             medicine = form.save(commit=False)
             medicine.pharmacy = pharmacy
             medicine.save()
+            MedicineAvailabilityService.schedule_refresh(pharmacy.id)
             messages.success(request, 'Medicine added successfully!')
             return redirect('medicines:inventory')
     else:
@@ -39,9 +43,14 @@ def edit_medicine(request, medicine_id):
     medicine = get_object_or_404(Medicine, id=medicine_id, pharmacy=pharmacy)
 
     if request.method == 'POST':
+        old_price, old_quantity = medicine.price, medicine.quantity
         form = MedicineForm(request.POST, instance=medicine)
         if form.is_valid():
             form.save()
+            if medicine.price != old_price:
+                CartService.invalidate_summaries([medicine.id])
+            StockAlertService.schedule([(medicine.id, pharmacy.id, medicine.reorder_point, old_quantity, medicine.quantity)])
+            MedicineAvailabilityService.schedule_refresh(pharmacy.id)
             messages.success(request, 'Medicine updated successfully!')
             return redirect('medicines:inventory')
     else:
@@ -60,7 +69,10 @@ def delete_medicine(request, medicine_id):
     medicine = get_object_or_404(Medicine, id=medicine_id, pharmacy=pharmacy)
 
     if request.method == 'POST':
+        # Carts holding this medicine lose the line through the cascade
+        CartService.invalidate_summaries([medicine.id])
         medicine.delete()
+        MedicineAvailabilityService.schedule_refresh(pharmacy.id)
         messages.success(request, 'Medicine deleted successfully!')
         return redirect('medicines:inventory')
 
@@ -78,7 +90,9 @@ def delete_medicine_ajax(request, medicine_id):
         try:
             medicine = get_object_or_404(Medicine, id=medicine_id, pharmacy=pharmacy)
             medicine_name = medicine.name
+            CartService.invalidate_summaries([medicine.id])
             medicine.delete()
+            MedicineAvailabilityService.schedule_refresh(pharmacy.id)
 
             return JsonResponse({
                 'success': True,
@@ -157,7 +171,7 @@ def inventory(request):
     status_filter = request.GET.get('status')
     if status_filter:
         if status_filter == 'low_stock':
-            medicines = medicines.filter(quantity__lt=10)
+            medicines = medicines.filter(quantity__gt=0, quantity__lte=F('reorder_point'))
         elif status_filter == 'out_of_stock':
             medicines = medicines.filter(quantity=0)
         elif status_filter == 'expiring_soon':
@@ -174,8 +188,8 @@ def inventory(request):
     else:
         total_medicines = medicines.count()
         all_medicines = Medicine.objects.filter(pharmacy=pharmacy)
-        in_stock_count = all_medicines.filter(quantity__gte=10).count()
-        low_stock_count = all_medicines.filter(quantity__lt=10, quantity__gt=0).count()
+        in_stock_count = all_medicines.filter(quantity__gt=F('reorder_point')).count()
+        low_stock_count = all_medicines.filter(quantity__gt=0, quantity__lte=F('reorder_point')).count()
         out_of_stock_count = all_medicines.filter(quantity=0).count()
         cache.set(counts_cache_key, (total_medicines, in_stock_count, low_stock_count, out_of_stock_count), 600)
 
@@ -215,9 +229,17 @@ def update_stock(request, medicine_id):
             else:
                 quantity = int(request.POST.get('quantity', medicine.quantity))
                 price = float(request.POST.get('price', medicine.price or 0))
+            price_changed = medicine.price != Decimal(str(price))
+            stock_flipped = (medicine.quantity > 0) != (quantity > 0)
+            old_quantity = medicine.quantity
             medicine.quantity = quantity
             medicine.price = price
             medicine.save()
+            if price_changed:
+                CartService.invalidate_summaries([medicine.id])
+            if stock_flipped:
+                MedicineAvailabilityService.schedule_refresh(pharmacy.id)
+            StockAlertService.schedule([(medicine.id, pharmacy.id, medicine.reorder_point, old_quantity, quantity)])
             return JsonResponse({
                 'success': True,
                 'message': 'Stock updated successfully',
@@ -279,15 +301,26 @@ def bulk_update_stock(request):
         try:
             updates = request.POST.getlist('updates[]')
             updated_count = 0
+            repriced_ids = []
+            stock_changes = []
 
             for update in updates:
                 medicine_id, quantity, price = update.split(',')
                 medicine = get_object_or_404(Medicine, id=medicine_id, pharmacy=pharmacy)
+                if medicine.price != Decimal(price):
+                    repriced_ids.append(medicine.id)
+                stock_changes.append((medicine.id, pharmacy.id, medicine.reorder_point, medicine.quantity, int(quantity)))
                 medicine.quantity = int(quantity)
                 medicine.price = float(price)
                 medicine.save()
                 updated_count += 1
 
+            if repriced_ids:
+                CartService.invalidate_summaries(repriced_ids)
+            StockAlertService.schedule(stock_changes)
+            if updated_count:
+                MedicineAvailabilityService.schedule_refresh(pharmacy.id)
+
             return JsonResponse({
                 'success': True,
                 'message': f'{updated_count} medicines updated successfully'
@@ -296,3 +329,31 @@ def bulk_update_stock(request):
             return JsonResponse({'success': False, 'message': str(e)})
 
     return JsonResponse({'success': False, 'message': 'Invalid request method'})
+
+@login_required
+def restock_suggestions(request):
+    """Suggested reorder quantities from the nightly demand forecast"""
+    # Get pharmacy from user.pharmacy or user.owned_pharmacy
+    pharmacy = getattr(request.user, 'pharmacy', None) or getattr(request.user, 'owned_pharmacy', None)
+    if pharmacy is None:
+        return JsonResponse({'success': False, 'message': 'Access denied'})
+
+    suggestions = RestockSuggestion.objects.filter(
+        pharmacy=pharmacy, suggested_quantity__gt=0
+    ).select_related('medicine').order_by('-suggested_quantity')[:100]
+    return JsonResponse({
+        'success': True,
+        'suggestions': [
+            {
+                'medicine_id': suggestion.medicine_id,
+                'medicine_name': suggestion.medicine.name,
+                'current_stock': suggestion.current_stock,
+                'average_daily_demand': suggestion.average_daily_demand,
+                'forecast_demand': suggestion.forecast_demand,
+                'suggested_quantity': suggestion.suggested_quantity,
+                'horizon_days': suggestion.horizon_days,
+                'generated_at': suggestion.generated_at.isoformat(),
+            }
+            for suggestion in suggestions
+        ]
+    })
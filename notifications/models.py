@@ -13,6 +13,7 @@ class Notification(models.Model):
     
     STATUS_CHOICES = [
         ('pending', 'Pending'),
+        ('sending', 'Sending'),
         ('sent', 'Sent'),
         ('failed', 'Failed'),
     ]
@@ -24,9 +25,20 @@ class Notification(models.Model):
     message = models.TextField()
     sent_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Send ledger: the reminder fire time this notification is for, and the
+    # dispatch run that owns delivering it
+    scheduled_for = models.DateTimeField(null=True, blank=True)
+    claim_token = models.CharField(max_length=32, blank=True, db_index=True)
     
     def __str__(self):
         return f"{self.get_notification_type_display()} - {self.user.first_name} - {self.reminder.medicine_name}"
     
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            # At most one send per reminder fire time, however often it is dispatched
+            models.UniqueConstraint(fields=['reminder', 'scheduled_for'], name='unique_reminder_send'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
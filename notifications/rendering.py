@@ -0,0 +1,97 @@
+import logging
+import re
+import threading
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils import translation
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationRenderer:
+    """Render notification templates compiled once per process and language.
+
+    ``compile`` renders a template a single time under the requested
+    language with a sentinel in place of every variable, and splits the
+    output into its static chunks (translated text, markup, styles) and the
+    names of the slots between them. Rendering a message afterwards is one
+    join of the cached chunks with the escaped values, with no template
+    engine or translation lookup per message.
+
+    Templates compiled this way may only use plain variables named in
+    ``fields``; anything depending on the values (filters, ``{% if %}``)
+    belongs in the caller, which passes final strings.
+    """
+
+    SENTINEL = '\x00{}\x00'
+    SLOT = re.compile('\x00(\\d+)\x00')
+    # The replacements of django.utils.html.escape, as one str.translate table
+    ESCAPES = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#x27;'})
+
+    _compiled = {}
+    _translations = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def language_for(user):
+        """The user's preferred language, when the site offers it"""
+        language = getattr(user, 'preferred_language', None)
+        return language if any(language == code for code, name in settings.LANGUAGES) else settings.LANGUAGE_CODE
+
+    @staticmethod
+    def translate(message, language):
+        """Cached gettext of ``message`` in ``language``"""
+        key = (message, language)
+        if key not in NotificationRenderer._translations:
+            with translation.override(language):
+                NotificationRenderer._translations[key] = str(translation.gettext(message))
+        return NotificationRenderer._translations[key]
+
+    @staticmethod
+    def compile(template_name, language, fields):
+        """Return (static chunks, slot names) of a template in ``language``, compiling it once"""
+        key = (template_name, language, fields)
+        compiled = NotificationRenderer._compiled.get(key)
+        if compiled is not None:
+            return compiled
+
+        with NotificationRenderer._lock:
+            compiled = NotificationRenderer._compiled.get(key)
+            if compiled is None:
+                with translation.override(language):
+                    output = render_to_string(template_name, {
+                        field: NotificationRenderer.SENTINEL.format(index) for index, field in enumerate(fields)
+                    })
+                parts = NotificationRenderer.SLOT.split(output)
+                compiled = (tuple(parts[0::2]), tuple(fields[int(index)] for index in parts[1::2]))
+                NotificationRenderer._compiled[key] = compiled
+                logger.debug(f"Compiled {template_name} for {language} with {len(compiled[1])} slots")
+        return compiled
+
+    @staticmethod
+    def render(template_name, language, values):
+        """Render a compiled template with ``values``; HTML templates escape them"""
+        chunks, slots = NotificationRenderer.compile(template_name, language, tuple(values))
+        escape = template_name.endswith('.html')
+        parts = [chunks[0]]
+        for slot, chunk in zip(slots, chunks[1:]):
+            value = values[slot]
+            if not escape or hasattr(value, '__html__'):
+                parts.append(str(value))  # Plain text, or already safe HTML
+            else:
+                parts.append(str(value).translate(NotificationRenderer.ESCAPES))
+            parts.append(chunk)
+        return ''.join(parts)
+
+    @staticmethod
+    def render_template(template_name, language, context):
+        """Render a template that cannot be compiled (loops, conditionals) in ``language``"""
+        with translation.override(language):
+            return render_to_string(template_name, context)
+
+    @staticmethod
+    def clear():
+        """Drop compiled templates, e.g. after templates or catalogs change"""
+        with NotificationRenderer._lock:
+            NotificationRenderer._compiled.clear()
+            NotificationRenderer._translations.clear()
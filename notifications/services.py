@@ -62,76 +62,68 @@ class NotificationService:
         logger.error(f"Failed to send email after {max_retries} attempts to {email_message.to}")
         return False
     @staticmethod
-    def send_email_notification(reminder):
-        """Send email notification for a reminder - using exact same pattern as order emails"""
+    def _send_over(connection, email_message):
+        """Send one message over an open connection; True if the backend accepted it"""
         try:
-            user = reminder.user
-            subject = f"Medicine Reminder - HealthKart 360"
-
-            # Plain text message for fallback - exact same format as order emails
-            message = f"""
-            Hello {user.first_name},
-
-            It's time to take your medicine!
-
-            Medicine: {reminder.medicine_name}
-            Time: {reminder.get_time_slot_display()}
-            Notes: {reminder.notes or 'No additional notes'}
-
-            Please take your medicine as prescribed.
+            return connection.send_messages([email_message]) > 0
+        except Exception as e:
+            logger.warning(f"Batched email to {email_message.to} failed: {e}")
+            return False
 
-            Best regards,
-            HealthKart 360 Team
-            """
+    @staticmethod
+    def _send_chunk(email_messages):
+        """Send a chunk over one backend connection; returns one success flag per message"""
+        from django.core.mail import get_connection
 
-            # HTML message - using exact same structure as order confirmation email
-            html_message = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="UTF-8">
-                <title>Medicine Reminder - HealthKart 360</title>
-                <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; background-color: #f4f4f4; margin: 0; padding: 20px; }}
-                    .container {{ max-width: 600px; margin: 0 auto; background-color: #ffffff; padding: 30px; border-radius: 10px; box-shadow: 0 0 10px rgba(0,0,0,0.1); }}
-                    .header {{ text-align: center; padding-bottom: 20px; border-bottom: 2px solid #007bff; }}
-                    .header h1 {{ color: #007bff; margin: 0; font-size: 24px; }}
-                    .content {{ padding: 20px 0; }}
-                    .reminder-details {{ background-color: #f8f9fa; padding: 20px; border-radius: 5px; margin: 20px 0; }}
-                    .reminder-details p {{ margin: 10px 0; }}
-                    .footer {{ text-align: center; padding-top: 20px; border-top: 1px solid #eee; font-size: 12px; color: #777; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>Medicine Reminder</h1>
-                    </div>
-                    <div class="content">
-                        <p>Hello {user.first_name},</p>
-                        <p>It's time to take your medicine!</p>
-
-                        <div class="reminder-details">
-                            <p><strong>Medicine:</strong> {reminder.medicine_name}</p>
-                            <p><strong>Time:</strong> {reminder.get_time_slot_display()}</p>
-                            <p><strong>Notes:</strong> {reminder.notes or 'No additional notes'}</p>
-                        </div>
-
-                        <p>Please take your medicine as prescribed.</p>
-                    </div>
-                    <div class="footer">
-                        <p>Best regards,<br>HealthKart 360 Team</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            logger.warning(f"Could not open email connection for {len(email_messages)} messages: {e}")
+            return [False] * len(email_messages)
+        try:
+            return [NotificationService._send_over(connection, email_message) for email_message in email_messages]
+        finally:
+            connection.close()
 
-            recipient_email = user.email
+    @staticmethod
+    def send_email_batch(email_messages, chunk_size=None, max_workers=None):
+        """Deliver many emails over pooled connections; returns one success flag per message.
+
+        Messages are split into chunks of ``EMAIL_BATCH_SIZE``, each sent over
+        a single backend connection by a pool of ``EMAIL_BATCH_WORKERS``
+        threads. Failed messages get one more try on fresh connections,
+        without the sleeps of ``_send_email_with_retry``.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        chunk_size = chunk_size or getattr(settings, 'EMAIL_BATCH_SIZE', 100)
+        max_workers = max_workers or getattr(settings, 'EMAIL_BATCH_WORKERS', 8)
+        results = [False] * len(email_messages)
+        pending = list(range(len(email_messages)))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for attempt in range(2):
+                chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+                outcomes = pool.map(
+                    NotificationService._send_chunk,
+                    [[email_messages[index] for index in chunk] for chunk in chunks],
+                )
+                for chunk, flags in zip(chunks, outcomes):
+                    for index, flag in zip(chunk, flags):
+                        results[index] = flag
+                pending = [index for index in pending if not results[index]]
+                if not pending:
+                    break
+
+        logger.info(f"Batch email delivery: {len(email_messages) - len(pending)} sent, {len(pending)} failed")
+        return results
 
-            # Send HTML email with retry - exact same pattern as order confirmation email
-            email = EmailMultiAlternatives(subject, message, settings.DEFAULT_FROM_EMAIL, [recipient_email])
-            email.attach_alternative(html_message, "text/html")
+    @staticmethod
+    def send_email_notification(reminder):
+        """Send email notification for a reminder - using exact same pattern as order emails"""
+        try:
+            email = NotificationService.build_reminder_email(reminder)
             success = NotificationService._send_email_with_retry(email)
 
             if success:
@@ -144,6 +136,50 @@ class NotificationService:
             logger.error(f"Error sending medicine reminder email: {e}")
             return False
 
+    @staticmethod
+    def build_reminder_email(reminder):
+        """Build, without sending, the email for a reminder in the user's language.
+
+        The templates are compiled once per process and language by
+        ``NotificationRenderer``; each email only fills in its values.
+        """
+        from notifications.rendering import NotificationRenderer
+
+        user = reminder.user
+        language = NotificationRenderer.language_for(user)
+        subject = NotificationRenderer.translate("Medicine Reminder - HealthKart 360", language)
+        values = {
+            'first_name': user.first_name,
+            'medicine_name': reminder.medicine_name,
+            'time_slot': reminder.get_time_slot_display(),
+            'notes': reminder.notes or NotificationRenderer.translate("No additional notes", language),
+        }
+
+        message = NotificationRenderer.render('notifications/reminder_email.txt', language, values)
+        html_message = NotificationRenderer.render('notifications/reminder_email.html', language, values)
+
+        email = EmailMultiAlternatives(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+        email.attach_alternative(html_message, "text/html")
+        return email
+
+    @staticmethod
+    def build_reminder_digest_email(user, reminders):
+        """Build, without sending, one email covering several reminders due together"""
+        from notifications.rendering import NotificationRenderer
+
+        language = NotificationRenderer.language_for(user)
+        subject = NotificationRenderer.translate(
+            "Medicine Reminder: %(count)s medicines due - HealthKart 360", language
+        ) % {'count': len(reminders)}
+        context = {'user': user, 'reminders': reminders}
+
+        message = NotificationRenderer.render_template('notifications/reminder_digest_email.txt', language, context)
+        html_message = NotificationRenderer.render_template('notifications/reminder_digest_email.html', language, context)
+
+        email = EmailMultiAlternatives(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+        email.attach_alternative(html_message, "text/html")
+        return email
+
     @staticmethod
     def send_prescription_verification_code(prescription):
         """Send verification code email for prescription"""
@@ -880,3 +916,105 @@ class NotificationService:
         except Exception as e:
             logger.error(f"Error sending advance order status email: {e}")
             return False
+
+    @staticmethod
+    def send_advance_order_status_digest(user, advance_orders):
+        """Send one status update email covering several advance orders of a customer"""
+        try:
+            subject = f"Advance Order Status Update - HealthBridge 360"
+
+            # Plain text message for fallback
+            message = f"""
+            Hello {user.first_name},
+
+            The status of {len(advance_orders)} of your advance orders has been updated!
+            """
+            for advance_order in advance_orders:
+                message += f"""
+            Advance order #{advance_order.id} ({advance_order.pharmacy.name}): {advance_order.get_status_display()}
+            """
+                for item in advance_order.items.all():
+                    message += f"- {item.medicine_name} ({item.dosage}) x {item.quantity_requested}\n"
+
+            message += f"""
+
+            You can track your advance orders on our website.
+
+            Best regards,
+            HealthBridge 360 Team
+            """
+
+            # HTML message
+            html_message = render_to_string('notifications/advance_order_status_digest_email.html', {
+                'user': user,
+                'advance_orders': advance_orders,
+                'orders_url': f"{settings.SITE_URL}/orders/advance-orders/"
+            })
+
+            email = EmailMultiAlternatives(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+            email.attach_alternative(html_message, "text/html")
+            success = NotificationService._send_email_with_retry(email)
+
+            order_ids = ', '.join(str(advance_order.id) for advance_order in advance_orders)
+            if success:
+                logger.info(f"Advance order status digest sent to user {user.id} for advance orders {order_ids}")
+                return True
+            else:
+                logger.error(f"Failed to send advance order status digest to user {user.id} for advance orders {order_ids}")
+                return False
+        except Exception as e:
+            logger.error(f"Error sending advance order status digest: {e}")
+            return False
+
+    @staticmethod
+    def send_low_stock_digest(pharmacy, alerts):
+        """Send one email listing the medicines of a pharmacy that fell below their reorder point"""
+        try:
+            recipients = []
+            if pharmacy.owner.email:
+                recipients.append(pharmacy.owner.email)
+            if pharmacy.email and pharmacy.email not in recipients:
+                recipients.append(pharmacy.email)
+            if not recipients:
+                logger.warning(f"No email address for pharmacy {pharmacy.id}, low stock digest not sent")
+                return False
+
+            subject = f"Low Stock Alert: {len(alerts)} medicines below reorder point - {pharmacy.name}"
+
+            # Plain text message for fallback
+            message = f"""
+            Hello {pharmacy.name},
+
+            The following medicines have fallen below their reorder point:
+            """
+            for alert in alerts:
+                message += f"- {alert.medicine.name} ({alert.medicine.strength}): {alert.medicine.quantity} left, reorder point {alert.reorder_point}\n"
+
+            message += f"""
+
+            Please restock them from your inventory page.
+
+            Best regards,
+            HealthBridge 360 Team
+            """
+
+            # HTML message
+            html_message = render_to_string('notifications/low_stock_digest_email.html', {
+                'pharmacy': pharmacy,
+                'alerts': alerts,
+                'inventory_url': f"{settings.SITE_URL}/medicines/inventory/?status=low_stock"
+            })
+
+            email = EmailMultiAlternatives(subject, message, settings.DEFAULT_FROM_EMAIL, recipients)
+            email.attach_alternative(html_message, "text/html")
+            success = NotificationService._send_email_with_retry(email)
+
+            if success:
+                logger.info(f"Low stock digest sent to pharmacy {pharmacy.id} for {len(alerts)} medicines")
+                return True
+            else:
+                logger.error(f"Failed to send low stock digest to pharmacy {pharmacy.id}")
+                return False
+        except Exception as e:
+            logger.error(f"Error sending low stock digest: {e}")
+            return False
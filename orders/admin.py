@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem, Prescription, PrescriptionMedicine, Cart, CartItem, MedicineReminder, AdvanceOrder, AdvanceOrderItem
+from .models import Order, OrderItem, Prescription, PrescriptionMedicine, Cart, CartItem, MedicineReminder, AdvanceOrder, AdvanceOrderItem, PharmacyOrderStats, OrderEvent, OrderSearchToken, ArchivedOrder, ArchivedOrderItem, StockReservation, SupplierPurchaseOrder, SupplierPurchaseOrderLine
 
 @admin.register(Prescription)
 class PrescriptionAdmin(admin.ModelAdmin):
@@ -73,3 +73,55 @@ class AdvanceOrderItemAdmin(admin.ModelAdmin):
     list_display = ['advance_order', 'medicine_name', 'quantity_requested', 'estimated_price', 'created_at']
     list_filter = ['created_at']
     search_fields = ['medicine_name', 'advance_order__user__first_name']
+
+@admin.register(PharmacyOrderStats)
+class PharmacyOrderStatsAdmin(admin.ModelAdmin):
+    list_display = ['pharmacy', 'pending_count', 'confirmed_count', 'completed_count', 'advance_pending_count', 'revenue', 'updated_at']
+    search_fields = ['pharmacy__name']
+    readonly_fields = ['updated_at']
+
+@admin.register(OrderEvent)
+class OrderEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'pharmacy', 'event_type', 'order_type', 'order_id', 'old_status', 'new_status', 'created_at']
+    list_filter = ['event_type', 'order_type', 'created_at']
+    search_fields = ['order_id', 'pharmacy__name', 'user__username']
+    readonly_fields = ['created_at']
+
+@admin.register(OrderSearchToken)
+class OrderSearchTokenAdmin(admin.ModelAdmin):
+    list_display = ['token', 'order_type', 'order_id', 'weight', 'pharmacy']
+    list_filter = ['order_type', 'weight']
+    search_fields = ['token', 'pharmacy__name']
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    readonly_fields = ['medicine_name', 'medicine_brand', 'medicine_strength', 'quantity', 'price']
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'pharmacy', 'status', 'total_amount', 'created_at', 'archived_at']
+    list_filter = ['status', 'created_at', 'archived_at']
+    search_fields = ['id', 'user__first_name', 'user__last_name']
+    readonly_fields = ['created_at', 'updated_at', 'archived_at']
+    inlines = [ArchivedOrderItemInline]
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['medicine', 'user', 'quantity', 'expires_at', 'created_at']
+    list_filter = ['expires_at']
+    search_fields = ['medicine__name', 'user__username']
+    readonly_fields = ['created_at']
+
+class SupplierPurchaseOrderLineInline(admin.TabularInline):
+    model = SupplierPurchaseOrderLine
+    extra = 0
+    readonly_fields = ['normalized_name']
+
+@admin.register(SupplierPurchaseOrder)
+class SupplierPurchaseOrderAdmin(admin.ModelAdmin):
+    list_display = ['id', 'pharmacy', 'status', 'supplier_name', 'ordered_at', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['id', 'pharmacy__name', 'supplier_name']
+    readonly_fields = ['created_at', 'updated_at']
+    inlines = [SupplierPurchaseOrderLineInline]
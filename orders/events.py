@@ -0,0 +1,91 @@
+import logging
+import threading
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+class OrderEventBus:
+    """Per-pharmacy change counters waking the order SSE stream.
+
+    The events themselves are the ``OrderEvent`` rows; the bus only tells a
+    stream that its pharmacy has new ones, so an idle stream polls a counter
+    instead of the database. The counters live in the cache when it is
+    shared by all workers (Redis) and in process memory otherwise, which
+    serves a single-process (ASGI) deploy. With several processes and no
+    shared cache, streams in other processes pick the events up from the
+    table when they reconnect.
+    """
+
+    _versions = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def shared():
+        """True when the cache is shared by all workers; a per-process
+        LocMemCache would only see events published by the same worker"""
+        from django.core.cache import caches
+        from django.core.cache.backends.dummy import DummyCache
+        from django.core.cache.backends.locmem import LocMemCache
+
+        return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+    @staticmethod
+    def _version_key(pharmacy_id):
+        return f'order_events_version_{pharmacy_id}'
+
+    @staticmethod
+    def publish(pharmacy_id):
+        """Wake the pharmacy's streams once the surrounding transaction commits"""
+        if pharmacy_id is None:
+            return
+
+        def publish_now():
+            try:
+                OrderEventBus._bump(pharmacy_id)
+            except Exception as e:
+                # Never fail an order write because the event feed is unavailable
+                logger.error(f"Failed to publish order events for pharmacy {pharmacy_id}: {e}")
+
+        transaction.on_commit(publish_now)
+
+    @staticmethod
+    def _bump(pharmacy_id):
+        if not OrderEventBus.shared():
+            with OrderEventBus._lock:
+                OrderEventBus._versions[pharmacy_id] = OrderEventBus._versions.get(pharmacy_id, 0) + 1
+            return
+        key = OrderEventBus._version_key(pharmacy_id)
+        try:
+            cache.add(key, 0, None)
+            cache.incr(key)
+        except ValueError:
+            # The counter was evicted between add() and incr(); start it again
+            cache.set(key, 1, None)
+
+    @staticmethod
+    def version(pharmacy_id):
+        """The pharmacy's change counter; it moves whenever new events are committed"""
+        if not OrderEventBus.shared():
+            return OrderEventBus._versions.get(pharmacy_id, 0)
+        return cache.get(OrderEventBus._version_key(pharmacy_id), 0)
+
+    @staticmethod
+    async def aversion(pharmacy_id):
+        """Async variant of version for the ASGI event stream"""
+        if not OrderEventBus.shared():
+            return OrderEventBus._versions.get(pharmacy_id, 0)
+        return await cache.aget(OrderEventBus._version_key(pharmacy_id), 0)
+
+    @staticmethod
+    def stats_payload(pharmacy_id):
+        """The pharmacy's order badges, sent along with each batch of events"""
+        from .models import PharmacyOrderStats
+
+        stats = PharmacyOrderStats.objects.filter(pk=pharmacy_id).first()
+        if stats is None:
+            return None
+        badges = stats.as_badges()
+        badges['total_revenue'] = str(badges['total_revenue'])
+        return badges
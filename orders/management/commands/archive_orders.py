@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from orders.services import OrderArchiveService
+
+
+class Command(BaseCommand):
+    help = 'Move completed and cancelled orders older than ORDER_ARCHIVE_AFTER_DAYS to the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help='Archive orders not updated for this many days',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.ORDER_ARCHIVE_BATCH_SIZE,
+            help='Number of orders moved per transaction',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many orders would be archived',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if options['dry_run']:
+            count = OrderArchiveService.archivable_orders(days).count()
+            self.stdout.write(f"{count} orders older than {days} days would be archived")
+            return
+
+        total = 0
+        while True:
+            archived = OrderArchiveService.archive_batch(days, options['batch_size'])
+            if not archived:
+                break
+            total += archived
+            self.stdout.write(f"Archived {total} orders so far...")
+
+        self.stdout.write(self.style.SUCCESS(f"\nArchived {total} orders older than {days} days"))
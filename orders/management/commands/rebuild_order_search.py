@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from pharmacy.models import Pharmacy
+from orders.services import OrderSearchService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the order search token index from the order tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pharmacy',
+            type=int,
+            help='Only rebuild the index for the pharmacy with this ID',
+        )
+
+    def handle(self, *args, **options):
+        pharmacy_ids = Pharmacy.objects.order_by('id').values_list('id', flat=True)
+        if options['pharmacy']:
+            pharmacy_ids = pharmacy_ids.filter(id=options['pharmacy'])
+
+        total = 0
+        for pharmacy_id in pharmacy_ids:
+            indexed = OrderSearchService.rebuild(pharmacy_id)
+            self.stdout.write(f"Pharmacy {pharmacy_id}: indexed {indexed} orders")
+            total += indexed
+
+        self.stdout.write(self.style.SUCCESS(f"\nIndexed {total} orders for search"))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from pharmacy.models import Pharmacy
+from orders.services import OrderStatsService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized per-pharmacy order stats from the order tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pharmacy',
+            type=int,
+            help='Only rebuild stats for the pharmacy with this ID',
+        )
+
+    def handle(self, *args, **options):
+        pharmacy_ids = Pharmacy.objects.order_by('id').values_list('id', flat=True)
+        if options['pharmacy']:
+            pharmacy_ids = pharmacy_ids.filter(id=options['pharmacy'])
+
+        rebuilt = 0
+        for pharmacy_id in pharmacy_ids:
+            stats = OrderStatsService.rebuild(pharmacy_id)
+            self.stdout.write(
+                f"Pharmacy {pharmacy_id}: {stats.total_regular_orders} orders, "
+                f"{stats.total_advance_orders} advance orders, revenue ₹{stats.revenue}"
+            )
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f"\nRebuilt order stats for {rebuilt} pharmacies"))
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0005_alter_pharmacy_owner'),
+        ('orders', '0014_order_payment_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PharmacyOrderStats',
+            fields=[
+                ('pharmacy', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='order_stats', serialize=False, to='pharmacy.pharmacy')),
+                ('pending_count', models.IntegerField(default=0)),
+                ('confirmed_count', models.IntegerField(default=0)),
+                ('preparing_count', models.IntegerField(default=0)),
+                ('ready_count', models.IntegerField(default=0)),
+                ('out_for_delivery_count', models.IntegerField(default=0)),
+                ('delivered_count', models.IntegerField(default=0)),
+                ('completed_count', models.IntegerField(default=0)),
+                ('cancelled_count', models.IntegerField(default=0)),
+                ('advance_pending_count', models.IntegerField(default=0)),
+                ('advance_confirmed_count', models.IntegerField(default=0)),
+                ('advance_ordered_count', models.IntegerField(default=0)),
+                ('advance_received_count', models.IntegerField(default=0)),
+                ('advance_ready_count', models.IntegerField(default=0)),
+                ('advance_cancelled_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Pharmacy order stats',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('pharmacy', '0005_alter_pharmacy_owner'),
+        ('orders', '0015_pharmacyorderstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('event_type', models.CharField(choices=[('order_created', 'Order Created'), ('status_changed', 'Status Changed')], max_length=20)),
+                ('order_type', models.CharField(choices=[('regular', 'Regular'), ('advance', 'Advance')], default='regular', max_length=10)),
+                ('order_id', models.PositiveIntegerField()),
+                ('old_status', models.CharField(blank=True, max_length=20)),
+                ('new_status', models.CharField(max_length=20)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('pharmacy', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='order_events', to='pharmacy.pharmacy')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['pharmacy', 'id'], name='orders_orde_pharmac_d87495_idx'), models.Index(fields=['user', 'id'], name='orders_orde_user_id_8bb17e_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0005_alter_pharmacy_owner'),
+        ('orders', '0016_orderevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_type', models.CharField(choices=[('regular', 'Regular'), ('advance', 'Advance')], default='regular', max_length=10)),
+                ('order_id', models.PositiveIntegerField()),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('pharmacy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_search_tokens', to='pharmacy.pharmacy')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['pharmacy', 'token'], name='orders_orde_pharmac_74a4a8_idx'), models.Index(fields=['order_type', 'order_id'], name='orders_orde_order_t_afdefe_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0005_alter_pharmacy_owner'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('orders', '0017_ordersearchtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('preparing', 'Preparing'), ('ready', 'Ready for Pickup'), ('out_for_delivery', 'Out for Delivery'), ('delivered', 'Delivered'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('payment_method', models.CharField(choices=[('cod', 'Cash on Delivery'), ('online', 'Online Payment'), ('card', 'Card Payment')], max_length=20)),
+                ('payment_status', models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('failed', 'Failed'), ('refunded', 'Refunded')], max_length=20)),
+                ('delivery_method', models.CharField(choices=[('pickup', 'Store Pickup'), ('home_delivery', 'Home Delivery')], max_length=20)),
+                ('delivery_address', models.TextField(blank=True)),
+                ('delivery_email', models.EmailField(blank=True, max_length=254)),
+                ('delivery_charges', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('notes', models.TextField(blank=True)),
+                ('is_advance_order', models.BooleanField(default=False)),
+                ('advance_order_type', models.CharField(blank=True, max_length=20, null=True)),
+                ('verification_code', models.CharField(blank=True, max_length=6, null=True)),
+                ('is_verified', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('pharmacy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to='pharmacy.pharmacy')),
+                ('prescription', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_orders', to='orders.prescription')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('medicine_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('medicine_name', models.CharField(max_length=200)),
+                ('medicine_brand', models.CharField(blank=True, max_length=100)),
+                ('medicine_strength', models.CharField(blank=True, max_length=50)),
+                ('quantity', models.IntegerField(default=1)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='orders.archivedorder')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['user', 'created_at'], name='orders_arch_user_id_101d40_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['pharmacy', 'created_at'], name='orders_arch_pharmac_8c0f61_idx'),
+        ),
+    ]
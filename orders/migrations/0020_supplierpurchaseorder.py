@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0005_alter_pharmacy_owner'),
+        ('orders', '0019_stockreservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplierPurchaseOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('ordered', 'Ordered from Supplier'), ('received', 'Received'), ('cancelled', 'Cancelled')], default='draft', max_length=20)),
+                ('supplier_name', models.CharField(blank=True, max_length=200)),
+                ('supplier_contact', models.CharField(blank=True, max_length=200)),
+                ('notes', models.TextField(blank=True)),
+                ('ordered_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('pharmacy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='supplier_purchase_orders', to='pharmacy.pharmacy')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SupplierPurchaseOrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized_name', models.CharField(max_length=200)),
+                ('medicine_name', models.CharField(max_length=200)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('estimated_cost', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('purchase_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='orders.supplierpurchaseorder')),
+            ],
+            options={
+                'unique_together': {('purchase_order', 'normalized_name')},
+            },
+        ),
+        migrations.AddField(
+            model_name='advanceorderitem',
+            name='purchase_order_line',
+            field=models.ForeignKey(blank=True, help_text='Supplier purchase order line this item was batched into', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='advance_items', to='orders.supplierpurchaseorderline'),
+        ),
+        migrations.AddIndex(
+            model_name='supplierpurchaseorder',
+            index=models.Index(fields=['pharmacy', 'status'], name='orders_supp_pharmac_8b1123_idx'),
+        ),
+    ]
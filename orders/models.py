@@ -54,11 +54,14 @@ class Cart(models.Model):
     
     @property
     def total_amount(self):
-        return sum(item.total_price for item in self.items.all())
+        # Prefer CartService.get_summary(), which is cached per user
+        from .services import CartService
+        return CartService.get_summary(self.user, fresh=True)['subtotal']
     
     @property
     def item_count(self):
-        return self.items.count()
+        from .services import CartService
+        return CartService.get_summary(self.user, fresh=True)['item_count']
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
@@ -215,6 +218,51 @@ class AdvanceOrder(models.Model):
             return f"Restock Order #{self.id} - {self.pharmacy.name}"
         return f"Advance Order #{self.id} - {self.user.first_name}"
 
+class SupplierPurchaseOrder(models.Model):
+    """Consolidated restock order sent to a supplier.
+
+    Open advance-order items of a pharmacy are rolled into the pharmacy's
+    draft purchase order by ``SupplierBatchService``, one line per
+    normalized medicine name; status changes fan back out to the advance
+    orders behind the lines.
+    """
+    STATUS_CHOICES = [
+        ('draft', _('Draft')),
+        ('ordered', _('Ordered from Supplier')),
+        ('received', _('Received')),
+        ('cancelled', _('Cancelled')),
+    ]
+
+    pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE, related_name='supplier_purchase_orders')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
+    supplier_name = models.CharField(max_length=200, blank=True)
+    supplier_contact = models.CharField(max_length=200, blank=True)
+    notes = models.TextField(blank=True)
+    ordered_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pharmacy', 'status']),
+        ]
+
+    def __str__(self):
+        return f"Supplier PO #{self.id} - {self.pharmacy.name} ({self.get_status_display()})"
+
+class SupplierPurchaseOrderLine(models.Model):
+    purchase_order = models.ForeignKey(SupplierPurchaseOrder, on_delete=models.CASCADE, related_name='lines')
+    normalized_name = models.CharField(max_length=200)
+    medicine_name = models.CharField(max_length=200)
+    quantity = models.PositiveIntegerField(default=0)
+    estimated_cost = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('purchase_order', 'normalized_name')
+
+    def __str__(self):
+        return f"{self.medicine_name} x {self.quantity}"
+
 class AdvanceOrderItem(models.Model):
     advance_order = models.ForeignKey(AdvanceOrder, on_delete=models.CASCADE, related_name='items')
     medicine_name = models.CharField(max_length=200)
@@ -222,7 +270,254 @@ class AdvanceOrderItem(models.Model):
     frequency = models.CharField(max_length=100, blank=True)
     quantity_requested = models.IntegerField()
     estimated_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    purchase_order_line = models.ForeignKey(
+        SupplierPurchaseOrderLine, on_delete=models.SET_NULL, null=True, blank=True, related_name='advance_items',
+        help_text="Supplier purchase order line this item was batched into"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"{self.medicine_name} x {self.quantity_requested}"
+
+class PharmacyOrderStats(models.Model):
+    """Denormalized per-pharmacy order counters used for the dashboard badges.
+
+    Kept in step with order placement and status transitions by
+    ``OrderStatsService``; ``rebuild_order_stats`` repairs any drift.
+    """
+    pharmacy = models.OneToOneField(Pharmacy, on_delete=models.CASCADE, primary_key=True, related_name='order_stats')
+
+    # Regular order counts, one column per Order.STATUS_CHOICES value
+    pending_count = models.IntegerField(default=0)
+    confirmed_count = models.IntegerField(default=0)
+    preparing_count = models.IntegerField(default=0)
+    ready_count = models.IntegerField(default=0)
+    out_for_delivery_count = models.IntegerField(default=0)
+    delivered_count = models.IntegerField(default=0)
+    completed_count = models.IntegerField(default=0)
+    cancelled_count = models.IntegerField(default=0)
+
+    # Advance order counts, one column per AdvanceOrder.STATUS_CHOICES value
+    advance_pending_count = models.IntegerField(default=0)
+    advance_confirmed_count = models.IntegerField(default=0)
+    advance_ordered_count = models.IntegerField(default=0)
+    advance_received_count = models.IntegerField(default=0)
+    advance_ready_count = models.IntegerField(default=0)
+    advance_cancelled_count = models.IntegerField(default=0)
+
+    # Sum of total_amount over delivered and completed orders
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    REVENUE_STATUSES = ('delivered', 'completed')
+
+    class Meta:
+        verbose_name_plural = "Pharmacy order stats"
+
+    def __str__(self):
+        return f"Order stats - {self.pharmacy_id}"
+
+    @staticmethod
+    def order_field(status):
+        return f"{status}_count"
+
+    @staticmethod
+    def advance_field(status):
+        return f"advance_{status}_count"
+
+    @property
+    def total_regular_orders(self):
+        return sum(getattr(self, self.order_field(status)) for status, _ in Order.STATUS_CHOICES)
+
+    @property
+    def total_advance_orders(self):
+        return sum(getattr(self, self.advance_field(status)) for status, _ in AdvanceOrder.STATUS_CHOICES)
+
+    def as_badges(self):
+        """Badge values for the pharmacy orders page (regular + advance orders)"""
+        return {
+            'pending_count': self.pending_count + self.advance_pending_count,
+            'confirmed_count': self.confirmed_count + self.advance_confirmed_count,
+            'ready_count': self.ready_count,
+            'delivered_count': self.delivered_count,
+            'completed_count': self.completed_count,
+            'total_orders': self.total_regular_orders + self.total_advance_orders,
+            'total_revenue': self.revenue,
+        }
+
+    def as_order_stats(self):
+        """Statistics for regular orders only, as returned by the orders-data API"""
+        return {
+            'pending_count': self.pending_count,
+            'confirmed_count': self.confirmed_count,
+            'ready_count': self.ready_count,
+            'delivered_count': self.delivered_count,
+            'completed_count': self.completed_count,
+            'total_orders': self.total_regular_orders,
+            'total_revenue': self.revenue,
+        }
+
+class OrderEvent(models.Model):
+    """Append-only change log of order placement and status transitions.
+
+    The auto-incrementing id doubles as the sync cursor for the
+    "changes since" API; rows are never updated or deleted in place.
+    """
+    EVENT_CHOICES = [
+        ('order_created', _('Order Created')),
+        ('status_changed', _('Status Changed')),
+    ]
+
+    ORDER_TYPE_CHOICES = [
+        ('regular', _('Regular')),
+        ('advance', _('Advance')),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE, null=True, blank=True, related_name='order_events')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='order_events')
+    event_type = models.CharField(max_length=20, choices=EVENT_CHOICES)
+    order_type = models.CharField(max_length=10, choices=ORDER_TYPE_CHOICES, default='regular')
+    # Plain ids rather than foreign keys so the log outlives the order rows
+    order_id = models.PositiveIntegerField()
+    old_status = models.CharField(max_length=20, blank=True)
+    new_status = models.CharField(max_length=20)
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['pharmacy', 'id']),
+            models.Index(fields=['user', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.order_type} order #{self.order_id}"
+
+    def as_dict(self):
+        return {
+            'cursor': self.id,
+            'event': self.event_type,
+            'order_type': self.order_type,
+            'order_id': self.order_id,
+            'old_status': self.old_status or None,
+            'status': self.new_status,
+            'created_at': self.created_at.isoformat(),
+            **self.payload,
+        }
+
+class OrderSearchToken(models.Model):
+    """Denormalized search document for the pharmacy order search box.
+
+    One row per distinct token of an order's number, customer name and
+    medicine names, so a lookup is an indexed prefix scan on
+    (pharmacy, token) instead of icontains joins across orders and items.
+    Maintained by ``OrderSearchService``; ``rebuild_order_search`` repairs it.
+    """
+    # Relative importance of where a token came from, used for ranking
+    WEIGHT_ORDER_NUMBER = 4
+    WEIGHT_CUSTOMER = 2
+    WEIGHT_MEDICINE = 1
+
+    pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE, related_name='order_search_tokens')
+    order_type = models.CharField(max_length=10, choices=OrderEvent.ORDER_TYPE_CHOICES, default='regular')
+    order_id = models.PositiveIntegerField()
+    token = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=WEIGHT_MEDICINE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pharmacy', 'token']),
+            models.Index(fields=['order_type', 'order_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.token} -> {self.order_type} order #{self.order_id}"
+
+class ArchivedOrder(models.Model):
+    """Cold copy of a finished Order, moved out of the hot orders table.
+
+    Keeps the original primary key and column names so read paths can fall
+    back to it transparently; see ``OrderArchiveService``.
+    """
+    is_archived = True
+
+    id = models.PositiveIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders')
+    pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE, related_name='archived_orders')
+    prescription = models.ForeignKey(Prescription, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_orders')
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    payment_method = models.CharField(max_length=20, choices=Order.PAYMENT_METHODS)
+    payment_status = models.CharField(max_length=20, choices=Order.PAYMENT_STATUS_CHOICES)
+    delivery_method = models.CharField(max_length=20, choices=Order.DELIVERY_METHODS)
+    delivery_address = models.TextField(blank=True)
+    delivery_email = models.EmailField(blank=True)
+    delivery_charges = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    notes = models.TextField(blank=True)
+    is_advance_order = models.BooleanField(default=False)
+    advance_order_type = models.CharField(max_length=20, blank=True, null=True)
+    verification_code = models.CharField(max_length=6, blank=True, null=True)
+    is_verified = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+            models.Index(fields=['pharmacy', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Archived Order #{self.id} - {self.user.first_name} - {self.status}"
+
+class ArchivedOrderItem(models.Model):
+    """Cold copy of an OrderItem with a snapshot of the medicine it referenced"""
+    id = models.PositiveIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    # Plain id plus snapshot columns so archived bills survive catalogue changes
+    medicine_id = models.PositiveIntegerField(null=True, blank=True)
+    medicine_name = models.CharField(max_length=200)
+    medicine_brand = models.CharField(max_length=100, blank=True)
+    medicine_strength = models.CharField(max_length=50, blank=True)
+    quantity = models.IntegerField(default=1)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.medicine_name} x {self.quantity}"
+
+    @property
+    def medicine(self):
+        """Medicine-like view of the snapshot, so order templates render unchanged"""
+        from types import SimpleNamespace
+        return SimpleNamespace(id=self.medicine_id, name=self.medicine_name, brand=self.medicine_brand, strength=self.medicine_strength)
+
+    @property
+    def total_price(self):
+        return self.quantity * self.price
+
+class StockReservation(models.Model):
+    """Time-limited hold on stock for a customer's cart while they pay.
+
+    Holds are counted against ``Medicine.quantity`` when computing the
+    available-to-promise quantity and simply stop counting once
+    ``expires_at`` passes; ``release_expired_reservations`` deletes them.
+    Maintained by ``StockReservationService``.
+    """
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name='reservations')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='stock_reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('medicine', 'user')
+        indexes = [
+            models.Index(fields=['medicine', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} holds {self.quantity} x {self.medicine.name} until {self.expires_at}"
@@ -1,6 +1,7 @@
 import json
 import razorpay
 from django.conf import settings
+from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse, HttpResponseBadRequest
 from django.contrib.auth.decorators import login_required
@@ -16,9 +17,13 @@ def create_razorpay_order(request):
 
     logger = logging.getLogger(__name__)
 
+    from orders.services import CartService, StockReservationService
+
     try:
         cart = Cart.objects.get(user=request.user)
-        if cart.item_count == 0:
+        # Fresh summary: the charged amount must reflect current prices
+        summary = CartService.get_summary(request.user, fresh=True)
+        if summary['item_count'] == 0:
             logger.error(f"Cart is empty for user {request.user.id}")
             return JsonResponse({'success': False, 'error': 'Cart is empty'})
 
@@ -28,13 +33,19 @@ def create_razorpay_order(request):
             logger.error(f"Form validation failed for user {request.user.id}: {form.errors}")
             return JsonResponse({'success': False, 'error': 'Invalid form data', 'errors': form.errors})
 
+        # Hold the stock while the customer pays
+        try:
+            StockReservationService.reserve_cart(request.user)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)})
+
         # Calculate delivery charges
         delivery_method = form.cleaned_data['delivery_method']
         delivery_charges = Decimal('50.00') if delivery_method == 'home_delivery' else Decimal('0.00')
-        total_amount = cart.total_amount + delivery_charges
+        total_amount = summary['subtotal'] + delivery_charges
         amount = int(total_amount * 100)  # Razorpay expects paise
 
-        logger.info(f"Creating Razorpay order for user {request.user.id}: subtotal={cart.total_amount}, delivery_charges={delivery_charges}, total={total_amount}")
+        logger.info(f"Creating Razorpay order for user {request.user.id}: subtotal={summary['subtotal']}, delivery_charges={delivery_charges}, total={total_amount}")
 
         # Store form data in session for callback
         checkout_form_data = {
@@ -43,7 +54,7 @@ def create_razorpay_order(request):
             'notes': form.cleaned_data.get('notes', ''),
             'payment_method': form.cleaned_data.get('payment_method', 'online'),
             'delivery_charges': str(delivery_charges),
-            'subtotal': str(cart.total_amount),
+            'subtotal': str(summary['subtotal']),
             'total_amount': str(total_amount)
         }
         request.session['checkout_form_data'] = checkout_form_data
@@ -78,6 +89,16 @@ def create_razorpay_order(request):
         return JsonResponse({'success': False, 'error': f'Failed to initiate payment: {str(e)}'})
 
 
+@login_required
+@require_POST
+def release_stock_hold(request):
+    """Release the user's stock holds when the payment is cancelled or fails"""
+    from orders.services import StockReservationService
+
+    StockReservationService.release(request.user)
+    return JsonResponse({'success': True, 'message': 'Stock hold released'})
+
+
 @csrf_exempt
 @require_POST
 def razorpay_callback(request):
@@ -88,6 +109,7 @@ def razorpay_callback(request):
     from django.conf import settings as django_settings
     from orders.models import Cart, Order, OrderItem
     from orders.forms import CheckoutForm
+    from orders.services import CartService, OrderStatsService, OrderEventService, OrderSearchService, BillPDFService, StockReservationService
     from notifications.services import NotificationService
     from django.contrib.auth import get_user_model
 
@@ -124,50 +146,57 @@ def razorpay_callback(request):
 
         # Place order for this user
         cart = Cart.objects.get(user=user)
-        if cart.item_count == 0:
+        summary = CartService.get_summary(user, fresh=True)
+        if summary['item_count'] == 0:
             return JsonResponse({'success': False, 'error': 'Cart is empty.'})
 
         # Determine pharmacy
         pharmacy = cart.items.first().medicine.pharmacy
 
         # Check if cart contains advance order items
-        has_advance_order_items = cart.items.filter(is_advance_order=True).exists()
-
-        # Create order
-        from decimal import Decimal
-        order = Order.objects.create(
-            user=user,
-            pharmacy=pharmacy,
-            status='confirmed',
-            payment_method=checkout_data['payment_method'],
-            delivery_method=checkout_data['delivery_method'],
-            delivery_address=checkout_data.get('delivery_address', ''),
-            notes=checkout_data.get('notes', ''),
-            delivery_charges=Decimal(checkout_data['delivery_charges']),
-            total_amount=Decimal(checkout_data['total_amount'])
-        )
-
-        # Mark as advance order if cart contains advance order items
-        if has_advance_order_items:
-            order.is_advance_order = True
-            order.advance_order_type = 'restock'
-            order.save()
-
-        # Create order items
-        for item in cart.items.all():
-            OrderItem.objects.create(
-                order=order,
-                medicine=item.medicine,
-                quantity=item.quantity,
-                price=item.medicine.price
+        has_advance_order_items = summary['has_advance_items']
+
+        # Create the order and take its stock in one transaction
+        with transaction.atomic():
+            # Create order
+            from decimal import Decimal
+            order = Order.objects.create(
+                user=user,
+                pharmacy=pharmacy,
+                status='confirmed',
+                payment_method=checkout_data['payment_method'],
+                delivery_method=checkout_data['delivery_method'],
+                delivery_address=checkout_data.get('delivery_address', ''),
+                notes=checkout_data.get('notes', ''),
+                delivery_charges=Decimal(checkout_data['delivery_charges']),
+                total_amount=Decimal(checkout_data['total_amount'])
             )
-            # Only update medicine stock for non-advance order items
-            if not item.is_advance_order:
-                item.medicine.quantity -= item.quantity
-                item.medicine.save()
 
-        # Calculate totals (though we set them manually)
-        order.calculate_totals()
+            # Mark as advance order if cart contains advance order items
+            if has_advance_order_items:
+                order.is_advance_order = True
+                order.advance_order_type = 'restock'
+                order.save()
+
+            # Take the held stock; payment is already captured, so a hold that
+            # expired does not block the order, the shortfall is only logged
+            StockReservationService.commit_cart(user, strict=False)
+
+            # Create order items
+            for item in cart.items.select_related('medicine'):
+                OrderItem.objects.create(
+                    order=order,
+                    medicine=item.medicine,
+                    quantity=item.quantity,
+                    price=item.medicine.price
+                )
+
+            # Calculate totals (though we set them manually)
+            order.calculate_totals()
+        OrderStatsService.record_order_placed(order)
+        OrderEventService.record_order_placed(order)
+        OrderSearchService.index_order(order)
+        BillPDFService.schedule(order.id)
 
         # Create AdvanceOrder record if this is an advance order
         if has_advance_order_items:
@@ -178,6 +207,8 @@ def razorpay_callback(request):
                 order_type='restock',
                 status='confirmed'  # Since payment is done
             )
+            OrderStatsService.record_advance_order_placed(advance_order)
+            OrderEventService.record_advance_order_placed(advance_order)
 
             # Create AdvanceOrderItems for advance order items
             for cart_item in cart.items.filter(is_advance_order=True):
@@ -189,6 +220,7 @@ def razorpay_callback(request):
                     quantity_requested=cart_item.quantity,
                     estimated_price=cart_item.medicine.price * cart_item.quantity
                 )
+            OrderSearchService.index_advance_order(advance_order)
 
             # Send advance order notification email to pharmacist
             if NotificationService.send_advance_order_notification(advance_order):
@@ -209,7 +241,8 @@ def razorpay_callback(request):
                 pass
 
         # Clear cart
-        cart.items.all().delete()
+        # The payment is confirmed from the customer's browser, so this is their session
+        CartService.clear_cart(user, session=request.session if request.user == user else None)
 
         # Send order status notification emails to customer
         if NotificationService.send_order_status_notification(order):
@@ -241,6 +274,12 @@ def razorpay_callback(request):
 
         logger.info(f"Order {order.id} created successfully for user {user.id}, redirecting to order detail")
         return JsonResponse({'success': True, 'redirect_url': reverse('orders:order_detail', args=[order.id])})
+    except razorpay.errors.SignatureVerificationError:
+        logger.warning(f"Payment signature verification failed for order {order_id}")
+        # The payment is not trusted: give the held stock back
+        if request.user.is_authenticated:
+            StockReservationService.release(request.user)
+        return JsonResponse({'success': False, 'error': 'Payment verification failed.'})
     except Exception as e:
         logger.error(f"Error in Razorpay callback: {str(e)}", exc_info=True)
         return JsonResponse({'success': False, 'error': str(e)})
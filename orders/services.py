@@ -1,10 +1,13 @@
 import re
 import json
+import logging
 from typing import List, Dict, Optional
 from django.db.models import Q
 from medicines.models import Medicine
 from .models import Prescription, PrescriptionMedicine
 
+logger = logging.getLogger(__name__)
+
 class PrescriptionProcessor:
     """Service class for processing prescription images and extracting medicine information"""
     
@@ -144,16 +147,126 @@ class PrescriptionProcessor:
 
 class CartService:
     """Service class for cart operations"""
-    
+
+    # Per-user cart summary (count, subtotal, advance items) kept in the cache
+    # and adjusted in place by the mutations below, so cart responses need no
+    # aggregate queries. Price changes drop the affected summaries.
+    SUMMARY_TIMEOUT = 60 * 60 * 24 * 7  # 7 days; refreshed at every login
+    # A per-process LocMemCache only sees the writes made in its own process,
+    # so there a summary lives briefly and another worker's write shows up soon
+    LOCAL_SUMMARY_TIMEOUT = 60
+    MAX_BATCH_LINES = 100
+    # The navbar badge reads the item count from the session; cart mutations
+    # given the request's session keep it current
+    SESSION_COUNT_KEY = 'cart_item_count'
+
     @staticmethod
     def get_or_create_cart(user):
         """Get or create cart for user"""
         from .models import Cart
         cart, created = Cart.objects.get_or_create(user=user)
         return cart
-    
+
+    @staticmethod
+    def _summary_key(user_id):
+        return f'cart_summary_{user_id}'
+
+    @staticmethod
+    def _summary_timeout():
+        from django.core.cache import caches
+        from django.core.cache.backends.locmem import LocMemCache
+
+        if isinstance(caches['default'], LocMemCache):
+            return CartService.LOCAL_SUMMARY_TIMEOUT
+        return CartService.SUMMARY_TIMEOUT
+
+    @staticmethod
+    def _summary_view(summary):
+        return {
+            'item_count': summary['item_count'],
+            'advance_count': summary['advance_count'],
+            'subtotal': summary['subtotal'],
+            'has_advance_items': summary['advance_count'] > 0,
+        }
+
+    @staticmethod
+    def compute_summary(user):
+        """Recompute the cart summary with one aggregate query and cache it"""
+        from decimal import Decimal
+        from django.core.cache import cache
+        from django.db.models import Count, DecimalField, F, Sum
+        from .models import CartItem
+
+        totals = CartItem.objects.filter(cart__user=user).aggregate(
+            item_count=Count('id'),
+            advance_count=Count('id', filter=Q(is_advance_order=True)),
+            subtotal=Sum(F('quantity') * F('medicine__price'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+        )
+        summary = {
+            'item_count': totals['item_count'],
+            'advance_count': totals['advance_count'],
+            'subtotal': (totals['subtotal'] or Decimal('0')).quantize(Decimal('0.01')),
+        }
+        cache.set(CartService._summary_key(user.id), summary, CartService._summary_timeout())
+        return CartService._summary_view(summary)
+
+    @staticmethod
+    def get_summary(user, fresh=False):
+        """Cart summary from the cache; ``fresh`` forces a recompute (checkout, payment)"""
+        from django.core.cache import cache
+
+        if not fresh:
+            summary = cache.get(CartService._summary_key(user.id))
+            if summary is not None:
+                return CartService._summary_view(summary)
+        return CartService.compute_summary(user)
+
     @staticmethod
-    def add_to_cart(user, medicine_id: int, quantity: int = 1, is_advance_order: bool = False):
+    def remember_count(session, user):
+        """Store the user's cart item count in ``session`` for the navbar badge"""
+        if session is not None:
+            session[CartService.SESSION_COUNT_KEY] = CartService.get_summary(user)['item_count']
+
+    @staticmethod
+    def session_item_count(session, user):
+        """Cart item count for the navbar badge; never queries the database.
+
+        Read from the session, else from a cached summary, else 0 until the
+        next cart change or login stores it.
+        """
+        from django.core.cache import cache
+
+        if session is not None and CartService.SESSION_COUNT_KEY in session:
+            return session[CartService.SESSION_COUNT_KEY]
+        summary = cache.get(CartService._summary_key(user.id))
+        return summary['item_count'] if summary is not None else 0
+
+    @staticmethod
+    def _adjust_summary(user, count=0, advance=0, subtotal=0):
+        """Apply a mutation's deltas to the cached summary, if one is cached"""
+        from django.core.cache import cache
+
+        key = CartService._summary_key(user.id)
+        summary = cache.get(key)
+        if summary is None:
+            # Nothing cached; the next read recomputes from the database
+            return
+        summary['item_count'] += count
+        summary['advance_count'] += advance
+        summary['subtotal'] += subtotal
+        cache.set(key, summary, CartService._summary_timeout())
+
+    @staticmethod
+    def invalidate_summaries(medicine_ids):
+        """Drop cached summaries of every cart holding one of these medicines"""
+        from django.core.cache import cache
+        from .models import CartItem
+
+        user_ids = CartItem.objects.filter(medicine_id__in=medicine_ids).values_list('cart__user_id', flat=True).distinct()
+        cache.delete_many([CartService._summary_key(user_id) for user_id in user_ids])
+
+    @staticmethod
+    def add_to_cart(user, medicine_id: int, quantity: int = 1, is_advance_order: bool = False, session=None):
         """Add medicine to cart"""
         from .models import Cart, CartItem
         from medicines.models import Medicine
@@ -165,8 +278,12 @@ class CartService:
             else:
                 medicine = Medicine.objects.get(id=medicine_id, quantity__gt=0)
 
-            if not is_advance_order and quantity > medicine.quantity:
-                raise ValueError(f"Only {medicine.quantity} units available")
+            # Stock held by other customers' checkouts is not available
+            available = medicine.quantity
+            if not is_advance_order:
+                available = StockReservationService.available_to_promise([medicine.id], exclude_user=user).get(medicine.id, 0)
+                if quantity > available:
+                    raise ValueError(f"Only {available} units available")
 
             cart = CartService.get_or_create_cart(user)
 
@@ -177,72 +294,209 @@ class CartService:
                 defaults={'quantity': quantity, 'is_advance_order': is_advance_order}
             )
 
-            if not created:
+            if created:
+                CartService._adjust_summary(
+                    user, count=1, advance=int(is_advance_order), subtotal=medicine.price * quantity
+                )
+            else:
                 new_quantity = cart_item.quantity + quantity
-                if not is_advance_order and new_quantity > medicine.quantity:
-                    raise ValueError(f"Only {medicine.quantity} units available")
+                if not is_advance_order and new_quantity > available:
+                    raise ValueError(f"Only {available} units available")
                 cart_item.quantity = new_quantity
+                advance = 0
                 # Update is_advance_order flag if it's different
                 if cart_item.is_advance_order != is_advance_order:
                     cart_item.is_advance_order = is_advance_order
+                    advance = 1 if is_advance_order else -1
                 cart_item.save()
+                CartService._adjust_summary(user, advance=advance, subtotal=medicine.price * quantity)
 
+            CartService.remember_count(session, user)
             return cart_item
 
         except Medicine.DoesNotExist:
             raise ValueError("Medicine not found or out of stock")
     
     @staticmethod
-    def update_cart_item(user, medicine_id: int, quantity: int):
+    def apply_batch(user, lines, session=None):
+        """Add, update or remove many cart lines at once.
+
+        Each line is a dict with ``medicine_id``, ``quantity``, ``action``
+        (``add`` increments like add_to_cart, ``set`` sets the quantity and
+        removes at 0, ``remove``) and optional ``is_advance_order``. Stock is
+        checked for all lines with one available-to-promise query and the
+        writes happen in one transaction; invalid lines are skipped and
+        reported.
+
+        Returns ``{'applied': [medicine ids], 'errors': [{'medicine_id', 'message'}]}``.
+        """
+        from django.db import transaction
+        from .models import CartItem
+        from medicines.models import Medicine
+
+        medicine_ids = {line['medicine_id'] for line in lines}
+        medicines = Medicine.objects.in_bulk(medicine_ids)
+        available = StockReservationService.available_to_promise(medicine_ids, exclude_user=user)
+        cart = CartService.get_or_create_cart(user)
+        applied, errors = [], []
+
+        with transaction.atomic():
+            existing = {
+                item.medicine_id: item
+                for item in CartItem.objects.select_for_update().filter(cart=cart, medicine_id__in=medicine_ids)
+            }
+            # medicine_id -> (quantity, is_advance_order), or None once removed
+            state = {mid: (item.quantity, item.is_advance_order) for mid, item in existing.items()}
+
+            for line in lines:
+                medicine_id = line['medicine_id']
+                action = line.get('action', 'add')
+                quantity = line.get('quantity', 1)
+                medicine = medicines.get(medicine_id)
+                current = state.get(medicine_id)
+
+                if medicine is None:
+                    errors.append({'medicine_id': medicine_id, 'message': 'Medicine not found'})
+                    continue
+
+                if action == 'remove' or (action == 'set' and quantity <= 0):
+                    if current is None:
+                        errors.append({'medicine_id': medicine_id, 'message': 'Item not found in cart'})
+                        continue
+                    state[medicine_id] = None
+                    applied.append(medicine_id)
+                    continue
+
+                if action not in ('add', 'set') or quantity <= 0:
+                    errors.append({'medicine_id': medicine_id, 'message': f'Invalid cart line: {action} {quantity}'})
+                    continue
+
+                is_advance_order = line.get('is_advance_order', current[1] if current else False)
+                new_quantity = quantity + (current[0] if current and action == 'add' else 0)
+                if not is_advance_order:
+                    if medicine.quantity <= 0:
+                        errors.append({'medicine_id': medicine_id, 'message': 'Medicine not found or out of stock'})
+                        continue
+                    if new_quantity > available[medicine_id]:
+                        errors.append({'medicine_id': medicine_id, 'message': f"Only {available[medicine_id]} units available"})
+                        continue
+                state[medicine_id] = (new_quantity, is_advance_order)
+                applied.append(medicine_id)
+
+            to_create, to_update, to_delete = [], [], []
+            deltas = {'count': 0, 'advance': 0, 'subtotal': 0}
+            for medicine_id, new in state.items():
+                item = existing.get(medicine_id)
+                old = (item.quantity, item.is_advance_order) if item else None
+                if new == old:
+                    continue
+                price = medicines[medicine_id].price
+                if old:
+                    deltas['count'] -= 1
+                    deltas['advance'] -= int(old[1])
+                    deltas['subtotal'] -= price * old[0]
+                if new:
+                    deltas['count'] += 1
+                    deltas['advance'] += int(new[1])
+                    deltas['subtotal'] += price * new[0]
+
+                if new is None:
+                    to_delete.append(item.id)
+                elif item is None:
+                    to_create.append(CartItem(cart=cart, medicine_id=medicine_id, quantity=new[0], is_advance_order=new[1]))
+                else:
+                    item.quantity, item.is_advance_order = new
+                    to_update.append(item)
+
+            if to_create:
+                CartItem.objects.bulk_create(to_create)
+            if to_update:
+                CartItem.objects.bulk_update(to_update, ['quantity', 'is_advance_order'])
+            if to_delete:
+                CartItem.objects.filter(id__in=to_delete).delete()
+
+        CartService._adjust_summary(user, **deltas)
+        CartService.remember_count(session, user)
+        return {'applied': applied, 'errors': errors}
+
+    @staticmethod
+    def update_cart_item(user, medicine_id: int, quantity: int, session=None):
         """Update cart item quantity"""
         from .models import CartItem
 
         try:
-            cart_item = CartItem.objects.get(
+            cart_item = CartItem.objects.select_related('medicine').get(
                 cart__user=user,
                 medicine_id=medicine_id
             )
+            price = cart_item.medicine.price
 
             if quantity <= 0:
                 cart_item.delete()
+                CartService._adjust_summary(
+                    user, count=-1, advance=-int(cart_item.is_advance_order), subtotal=-price * cart_item.quantity
+                )
+                CartService.remember_count(session, user)
                 return None
             else:
-                # Check stock availability if not advance order
-                if not cart_item.is_advance_order and quantity > cart_item.medicine.quantity:
-                    raise ValueError(f"Only {cart_item.medicine.quantity} units available")
+                # Stock held by other customers' checkouts is not available
+                if not cart_item.is_advance_order:
+                    available = StockReservationService.available_to_promise(
+                        [cart_item.medicine_id], exclude_user=user
+                    ).get(cart_item.medicine_id, 0)
+                    if quantity > available:
+                        raise ValueError(f"Only {available} units available")
+                delta = quantity - cart_item.quantity
                 cart_item.quantity = quantity
                 cart_item.save()
+                CartService._adjust_summary(user, subtotal=price * delta)
                 return cart_item
 
         except CartItem.DoesNotExist:
             raise ValueError("Item not found in cart")
     
     @staticmethod
-    def remove_from_cart(user, medicine_id: int):
+    def remove_from_cart(user, medicine_id: int, session=None):
         """Remove item from cart"""
         from .models import CartItem
         
         try:
-            cart_items = CartItem.objects.filter(
+            cart_items = list(CartItem.objects.filter(
                 cart__user=user,
                 medicine_id=medicine_id
-            )
-            if not cart_items.exists():
+            ).select_related('medicine'))
+            if not cart_items:
                 return False
             # Delete all matching cart items (should normally be one)
-            cart_items.delete()
+            CartItem.objects.filter(id__in=[item.id for item in cart_items]).delete()
+            CartService._adjust_summary(
+                user,
+                count=-len(cart_items),
+                advance=-sum(1 for item in cart_items if item.is_advance_order),
+                subtotal=-sum(item.medicine.price * item.quantity for item in cart_items),
+            )
+            CartService.remember_count(session, user)
             return True
         except Exception:
             return False
     
     @staticmethod
-    def clear_cart(user):
+    def clear_cart(user, session=None):
         """Clear user's cart"""
+        from decimal import Decimal
+        from django.core.cache import cache
         from .models import Cart
         
         try:
             cart = Cart.objects.get(user=user)
             cart.items.all().delete()
+            cache.set(
+                CartService._summary_key(user.id),
+                {'item_count': 0, 'advance_count': 0, 'subtotal': Decimal('0.00')},
+                CartService._summary_timeout(),
+            )
+            if session is not None:
+                session[CartService.SESSION_COUNT_KEY] = 0
             return True
         except Cart.DoesNotExist:
             return False
@@ -292,3 +546,1080 @@ class ReminderService:
             return 'after_meals'
         else:
             return 'once_daily'
+
+class OrderStatsService:
+    """Service class keeping PharmacyOrderStats in step with order writes"""
+
+    @staticmethod
+    def get_stats(pharmacy):
+        """Return the stats row for a pharmacy, building it on first access"""
+        from .models import PharmacyOrderStats
+
+        stats = PharmacyOrderStats.objects.filter(pk=pharmacy.pk).first()
+        if stats is None:
+            stats = OrderStatsService.rebuild(pharmacy.pk)
+        return stats
+
+    @staticmethod
+    def record_order_placed(order):
+        """Count a newly placed order"""
+        from .models import PharmacyOrderStats
+
+        deltas = {PharmacyOrderStats.order_field(order.status): 1}
+        if order.status in PharmacyOrderStats.REVENUE_STATUSES:
+            deltas['revenue'] = order.total_amount
+        OrderStatsService._apply(order.pharmacy_id, deltas)
+
+    @staticmethod
+    def record_status_change(order, old_status):
+        """Move an order from its old status counter to its new one"""
+        from .models import PharmacyOrderStats
+
+        new_status = order.status
+        if old_status == new_status:
+            return
+        deltas = {
+            PharmacyOrderStats.order_field(old_status): -1,
+            PharmacyOrderStats.order_field(new_status): 1,
+        }
+        was_revenue = old_status in PharmacyOrderStats.REVENUE_STATUSES
+        is_revenue = new_status in PharmacyOrderStats.REVENUE_STATUSES
+        if is_revenue and not was_revenue:
+            deltas['revenue'] = order.total_amount
+        elif was_revenue and not is_revenue:
+            deltas['revenue'] = -order.total_amount
+        OrderStatsService._apply(order.pharmacy_id, deltas)
+
+    @staticmethod
+    def record_advance_order_placed(advance_order):
+        """Count a newly placed advance order"""
+        from .models import PharmacyOrderStats
+
+        if advance_order.pharmacy_id is None:
+            return
+        OrderStatsService._apply(advance_order.pharmacy_id, {
+            PharmacyOrderStats.advance_field(advance_order.status): 1,
+        })
+
+    @staticmethod
+    def record_advance_status_change(advance_order, old_status):
+        """Move an advance order from its old status counter to its new one"""
+        from .models import PharmacyOrderStats
+
+        if advance_order.pharmacy_id is None or old_status == advance_order.status:
+            return
+        OrderStatsService._apply(advance_order.pharmacy_id, {
+            PharmacyOrderStats.advance_field(old_status): -1,
+            PharmacyOrderStats.advance_field(advance_order.status): 1,
+        })
+
+    @staticmethod
+    def rebuild(pharmacy_id):
+        """Recompute the stats row for a pharmacy from the order tables"""
+        from django.db.models import Count, Sum
+        from .models import Order, ArchivedOrder, AdvanceOrder, PharmacyOrderStats
+
+        values = {}
+        for status, _ in Order.STATUS_CHOICES:
+            values[PharmacyOrderStats.order_field(status)] = 0
+        for status, _ in AdvanceOrder.STATUS_CHOICES:
+            values[PharmacyOrderStats.advance_field(status)] = 0
+
+        # Archived orders still count towards the totals and revenue
+        for model in (Order, ArchivedOrder):
+            order_counts = model.objects.filter(pharmacy_id=pharmacy_id).values('status').annotate(count=Count('id'))
+            for row in order_counts:
+                field = PharmacyOrderStats.order_field(row['status'])
+                if field in values:
+                    values[field] += row['count']
+
+        advance_counts = AdvanceOrder.objects.filter(pharmacy_id=pharmacy_id).values('status').annotate(count=Count('id'))
+        for row in advance_counts:
+            field = PharmacyOrderStats.advance_field(row['status'])
+            if field in values:
+                values[field] = row['count']
+
+        values['revenue'] = sum(
+            model.objects.filter(
+                pharmacy_id=pharmacy_id,
+                status__in=PharmacyOrderStats.REVENUE_STATUSES
+            ).aggregate(total=Sum('total_amount'))['total'] or 0
+            for model in (Order, ArchivedOrder)
+        )
+
+        stats, created = PharmacyOrderStats.objects.update_or_create(pharmacy_id=pharmacy_id, defaults=values)
+        return stats
+
+    @staticmethod
+    def _apply(pharmacy_id, deltas):
+        """Atomically apply counter deltas; a missing row is rebuilt from scratch"""
+        from django.db.models import F
+        from .models import PharmacyOrderStats
+
+        from django.utils import timezone
+
+        updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        if not updates:
+            return
+        updates['updated_at'] = timezone.now()
+        updated = PharmacyOrderStats.objects.filter(pk=pharmacy_id).update(**updates)
+        if not updated:
+            # The rebuild reads the order tables, which already include this change
+            OrderStatsService.rebuild(pharmacy_id)
+
+class OrderEventService:
+    """Service class writing the OrderEvent change log and feeding the live stream"""
+
+    DEFAULT_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 200
+
+    @staticmethod
+    def record_order_placed(order):
+        """Log a newly placed order"""
+        return OrderEventService._record(
+            order, 'regular', 'order_created', '',
+            customer_name=f"{order.user.first_name} {order.user.last_name}",
+            total_amount=str(order.total_amount),
+        )
+
+    @staticmethod
+    def record_status_change(order, old_status):
+        """Log a status transition of a regular order"""
+        if old_status == order.status:
+            return None
+        return OrderEventService._record(order, 'regular', 'status_changed', old_status)
+
+    @staticmethod
+    def record_advance_order_placed(advance_order):
+        """Log a newly placed advance order"""
+        return OrderEventService._record(
+            advance_order, 'advance', 'order_created', '',
+            customer_name=f"{advance_order.user.first_name} {advance_order.user.last_name}",
+        )
+
+    @staticmethod
+    def record_advance_status_change(advance_order, old_status):
+        """Log a status transition of an advance order"""
+        if old_status == advance_order.status:
+            return None
+        return OrderEventService._record(advance_order, 'advance', 'status_changed', old_status)
+
+    @staticmethod
+    def record_advance_status_changes(advance_orders, old_statuses):
+        """Log a bulk status transition; ``old_statuses`` maps order id -> old status"""
+        from .events import OrderEventBus
+        from .models import OrderEvent
+
+        events = OrderEvent.objects.bulk_create([
+            OrderEvent(
+                pharmacy_id=advance_order.pharmacy_id,
+                user_id=advance_order.user_id,
+                event_type='status_changed',
+                order_type='advance',
+                order_id=advance_order.id,
+                old_status=old_statuses[advance_order.id],
+                new_status=advance_order.status,
+                payload={'status_display': advance_order.get_status_display()},
+            )
+            for advance_order in advance_orders
+            if old_statuses[advance_order.id] != advance_order.status
+        ])
+        for pharmacy_id in {event.pharmacy_id for event in events}:
+            OrderEventBus.publish(pharmacy_id)
+        return events
+
+    @staticmethod
+    def _record(order, order_type, event_type, old_status, **payload):
+        from .events import OrderEventBus
+        from .models import OrderEvent
+
+        payload['status_display'] = order.get_status_display()
+        event = OrderEvent.objects.create(
+            pharmacy_id=order.pharmacy_id,
+            user_id=order.user_id,
+            event_type=event_type,
+            order_type=order_type,
+            order_id=order.id,
+            old_status=old_status,
+            new_status=order.status,
+            payload=payload,
+        )
+        OrderEventBus.publish(order.pharmacy_id)
+        return event
+
+    @staticmethod
+    def latest_cursor(pharmacy):
+        """Id of the pharmacy's newest event, 0 when it has none"""
+        from .models import OrderEvent
+
+        return OrderEvent.objects.filter(pharmacy=pharmacy).order_by('-id').values_list('id', flat=True).first() or 0
+
+    @staticmethod
+    def get_changes(cursor=0, limit=None, pharmacy=None, user=None):
+        """Return events after ``cursor`` for a pharmacy or a customer.
+
+        Returns a dict with the serialized events, the cursor to pass on the
+        next call and whether more events are already waiting.
+        """
+        from .models import OrderEvent
+
+        limit = min(limit or OrderEventService.DEFAULT_PAGE_SIZE, OrderEventService.MAX_PAGE_SIZE)
+        events = OrderEvent.objects.filter(id__gt=cursor)
+        if pharmacy is not None:
+            events = events.filter(pharmacy=pharmacy)
+        else:
+            events = events.filter(user=user)
+
+        page = list(events.order_by('id')[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+        return {
+            'events': [event.as_dict() for event in page],
+            'next_cursor': page[-1].id if page else cursor,
+            'has_more': has_more,
+        }
+
+class OrderSearchService:
+    """Service class maintaining and querying the OrderSearchToken index"""
+
+    MAX_TOKEN_LENGTH = 64
+    REBUILD_CHUNK_SIZE = 500
+
+    @staticmethod
+    def tokenize(text):
+        """Split free text into lowercase word tokens"""
+        if not text:
+            return []
+        return [token[:OrderSearchService.MAX_TOKEN_LENGTH] for token in re.findall(r'\w+', str(text).lower())]
+
+    @staticmethod
+    def _document_tokens(order_id, user, medicine_names):
+        """Map token -> best weight for one order"""
+        from .models import OrderSearchToken
+
+        weights = {}
+
+        def add(text, weight):
+            for token in OrderSearchService.tokenize(text):
+                if weights.get(token, 0) < weight:
+                    weights[token] = weight
+
+        for name in medicine_names:
+            add(name, OrderSearchToken.WEIGHT_MEDICINE)
+        add(f"{user.first_name} {user.last_name}", OrderSearchToken.WEIGHT_CUSTOMER)
+        add(order_id, OrderSearchToken.WEIGHT_ORDER_NUMBER)
+        return weights
+
+    @staticmethod
+    def _build_rows(pharmacy_id, order_type, order_id, weights):
+        from .models import OrderSearchToken
+
+        return [
+            OrderSearchToken(pharmacy_id=pharmacy_id, order_type=order_type, order_id=order_id, token=token, weight=weight)
+            for token, weight in weights.items()
+        ]
+
+    @staticmethod
+    def index_order(order):
+        """(Re)index a regular order after it and its items are written"""
+        from .models import OrderSearchToken
+
+        medicine_names = order.items.values_list('medicine__name', flat=True)
+        weights = OrderSearchService._document_tokens(order.id, order.user, medicine_names)
+        OrderSearchToken.objects.filter(order_type='regular', order_id=order.id).delete()
+        OrderSearchToken.objects.bulk_create(
+            OrderSearchService._build_rows(order.pharmacy_id, 'regular', order.id, weights)
+        )
+
+    @staticmethod
+    def index_advance_order(advance_order):
+        """(Re)index an advance order after it and its items are written"""
+        from .models import OrderSearchToken
+
+        OrderSearchToken.objects.filter(order_type='advance', order_id=advance_order.id).delete()
+        if advance_order.pharmacy_id is None:
+            return
+        medicine_names = advance_order.items.values_list('medicine_name', flat=True)
+        weights = OrderSearchService._document_tokens(advance_order.id, advance_order.user, medicine_names)
+        OrderSearchToken.objects.bulk_create(
+            OrderSearchService._build_rows(advance_order.pharmacy_id, 'advance', advance_order.id, weights)
+        )
+
+    @staticmethod
+    def search(pharmacy, query):
+        """Return ranked (order_type, order_id) keys matching every query term.
+
+        Each term is prefix-matched against the token index. A document scores
+        the best token weight per term, doubled for exact token matches; ties
+        go to the newer order.
+        """
+        from .models import OrderSearchToken
+
+        terms = list(dict.fromkeys(OrderSearchService.tokenize(query)))
+        if not terms:
+            return []
+        if not OrderSearchToken.objects.filter(pharmacy=pharmacy).exists():
+            # Orders placed before the index existed; build it on first search
+            OrderSearchService.rebuild(pharmacy.pk)
+
+        # Range scans instead of LIKE so the (pharmacy, token) index is used
+        condition = Q()
+        for term in terms:
+            condition |= Q(token__gte=term, token__lt=term + '\uffff')
+        rows = OrderSearchToken.objects.filter(condition, pharmacy=pharmacy).values_list(
+            'order_type', 'order_id', 'token', 'weight'
+        )
+
+        best = {}
+        for order_type, order_id, token, weight in rows:
+            scores = best.setdefault((order_type, order_id), {})
+            for term in terms:
+                if token.startswith(term):
+                    score = weight * 2 if token == term else weight
+                    if scores.get(term, 0) < score:
+                        scores[term] = score
+
+        ranked = [
+            (sum(scores.values()), key)
+            for key, scores in best.items()
+            if len(scores) == len(terms)
+        ]
+        ranked.sort(key=lambda hit: (hit[0], hit[1][1]), reverse=True)
+        return [key for score, key in ranked]
+
+    @staticmethod
+    def rebuild(pharmacy_id):
+        """Recreate the search index of one pharmacy from the order tables, archive included"""
+        from django.db import transaction
+        from .models import Order, AdvanceOrder, ArchivedOrder, OrderSearchToken
+
+        chunk_size = OrderSearchService.REBUILD_CHUNK_SIZE
+        indexed = 0
+        with transaction.atomic():
+            OrderSearchToken.objects.filter(pharmacy_id=pharmacy_id).delete()
+
+            orders = Order.objects.filter(pharmacy_id=pharmacy_id).select_related('user').prefetch_related('items__medicine')
+            rows = []
+            for order in orders.iterator(chunk_size=chunk_size):
+                names = [item.medicine.name for item in order.items.all()]
+                weights = OrderSearchService._document_tokens(order.id, order.user, names)
+                rows.extend(OrderSearchService._build_rows(pharmacy_id, 'regular', order.id, weights))
+                indexed += 1
+                if len(rows) >= chunk_size:
+                    OrderSearchToken.objects.bulk_create(rows)
+                    rows = []
+
+            # Archived orders keep their id and are indexed as regular orders
+            archived_orders = ArchivedOrder.objects.filter(pharmacy_id=pharmacy_id).select_related('user').prefetch_related('items')
+            for order in archived_orders.iterator(chunk_size=chunk_size):
+                names = [item.medicine_name for item in order.items.all()]
+                weights = OrderSearchService._document_tokens(order.id, order.user, names)
+                rows.extend(OrderSearchService._build_rows(pharmacy_id, 'regular', order.id, weights))
+                indexed += 1
+                if len(rows) >= chunk_size:
+                    OrderSearchToken.objects.bulk_create(rows)
+                    rows = []
+
+            advance_orders = AdvanceOrder.objects.filter(pharmacy_id=pharmacy_id).select_related('user').prefetch_related('items')
+            for advance_order in advance_orders.iterator(chunk_size=chunk_size):
+                names = [item.medicine_name for item in advance_order.items.all()]
+                weights = OrderSearchService._document_tokens(advance_order.id, advance_order.user, names)
+                rows.extend(OrderSearchService._build_rows(pharmacy_id, 'advance', advance_order.id, weights))
+                indexed += 1
+                if len(rows) >= chunk_size:
+                    OrderSearchToken.objects.bulk_create(rows)
+                    rows = []
+
+            OrderSearchToken.objects.bulk_create(rows)
+        return indexed
+
+class OrderArchiveService:
+    """Service class moving finished orders to the archive tables and reading across both"""
+
+    ARCHIVABLE_STATUSES = ('completed', 'cancelled')
+
+    @staticmethod
+    def archivable_orders(days=None):
+        """Finished orders untouched for ``days`` that are safe to move"""
+        from datetime import timedelta
+        from django.conf import settings
+        from django.utils import timezone
+        from .models import Order
+
+        if days is None:
+            days = settings.ORDER_ARCHIVE_AFTER_DAYS
+        cutoff = timezone.now() - timedelta(days=days)
+        # Medicine reminders point at order items and would be cascade-deleted
+        return Order.objects.filter(
+            status__in=OrderArchiveService.ARCHIVABLE_STATUSES,
+            updated_at__lt=cutoff,
+        ).exclude(items__medicinereminder__isnull=False)
+
+    @staticmethod
+    def archive_batch(days=None, batch_size=None):
+        """Move one batch of archivable orders in a single transaction.
+
+        Returns the number of orders archived; 0 means nothing is left.
+        """
+        from django.conf import settings
+        from django.db import transaction
+        from .models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+
+        batch_size = batch_size or settings.ORDER_ARCHIVE_BATCH_SIZE
+        archived_fields = {field.attname for field in ArchivedOrder._meta.concrete_fields}
+        order_fields = [field.attname for field in Order._meta.concrete_fields if field.attname in archived_fields]
+
+        with transaction.atomic():
+            ids = list(
+                OrderArchiveService.archivable_orders(days)
+                .select_for_update()
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return 0
+
+            orders = Order.objects.filter(id__in=ids)
+            ArchivedOrder.objects.bulk_create([
+                ArchivedOrder(**{name: getattr(order, name) for name in order_fields})
+                for order in orders
+            ])
+            items = OrderItem.objects.filter(order_id__in=ids).select_related('medicine')
+            ArchivedOrderItem.objects.bulk_create([
+                ArchivedOrderItem(
+                    id=item.id,
+                    order_id=item.order_id,
+                    medicine_id=item.medicine_id,
+                    medicine_name=item.medicine.name,
+                    medicine_brand=item.medicine.brand,
+                    medicine_strength=item.medicine.strength,
+                    quantity=item.quantity,
+                    price=item.price,
+                )
+                for item in items
+            ])
+
+            # Search tokens stay: the archived copy keeps the order id, so
+            # archived orders are still found by the pharmacy order search
+            OrderItem.objects.filter(order_id__in=ids).delete()
+            Order.objects.filter(id__in=ids).delete()
+
+        logger.info(f"Archived {len(ids)} orders ({ids[0]}..{ids[-1]})")
+        return len(ids)
+
+    @staticmethod
+    def get_order(order_id):
+        """Return the hot Order or its archived copy, or None"""
+        from .models import Order, ArchivedOrder
+
+        order = Order.objects.select_related('user', 'pharmacy').filter(id=order_id).first()
+        if order is None:
+            order = ArchivedOrder.objects.select_related('user', 'pharmacy').filter(id=order_id).first()
+        return order
+
+    @staticmethod
+    def get_user_orders(user):
+        """All orders of a customer, hot and archived, newest first"""
+        from .models import Order, ArchivedOrder
+
+        orders = list(Order.objects.filter(user=user).prefetch_related('items__medicine'))
+        orders.extend(ArchivedOrder.objects.filter(user=user).prefetch_related('items'))
+        orders.sort(key=lambda order: order.created_at, reverse=True)
+        return orders
+
+    @staticmethod
+    def iter_pharmacy_orders(pharmacy, status=None, date_from=None, date_to=None, chunk_size=500):
+        """Stream a pharmacy's orders from both tables for export, hot ones first"""
+        from .models import Order, ArchivedOrder
+
+        for model, prefetch in ((Order, 'items__medicine'), (ArchivedOrder, 'items')):
+            orders = model.objects.filter(pharmacy=pharmacy).select_related('user').prefetch_related(prefetch)
+            if status:
+                orders = orders.filter(status=status)
+            if date_from:
+                orders = orders.filter(created_at__date__gte=date_from)
+            if date_to:
+                orders = orders.filter(created_at__date__lte=date_to)
+            yield from orders.order_by('-created_at').iterator(chunk_size=chunk_size)
+
+class BillPDFService:
+    """Service class rendering order bills to PDF and caching them by content.
+
+    Files are stored under ``bills/orders/<order id>/<hash>.pdf`` where the
+    hash covers every field printed on the bill, so a stored PDF stays valid
+    until the items or totals change and repeat downloads are a plain file read.
+    """
+
+    STORAGE_DIR = 'bills/orders'
+
+    @staticmethod
+    def billing_context(order):
+        """Context for the PDF template; everything on the bill comes from here"""
+        items = list(order.items.all())
+        return {
+            'order': order,
+            'items': items,
+            'subtotal': order.subtotal,
+            'delivery_charges': order.delivery_charges,
+            'total_amount': order.total_amount,
+            # Derived from the order, not the download date, so the PDF is stable
+            'bill_number': f"BILL-{order.id}-{order.created_at.strftime('%Y%m%d')}",
+            'bill_date': order.created_at.date(),
+        }
+
+    @staticmethod
+    def content_hash(context):
+        """Hash of the billing-relevant fields in a billing context"""
+        import hashlib
+
+        order = context['order']
+        fields = [
+            order.id, order.created_at.isoformat(),
+            order.user.first_name, order.user.last_name, order.user.email,
+            order.pharmacy.name, order.pharmacy.address, order.pharmacy.phone_number, order.pharmacy.email,
+            order.payment_method, order.delivery_method, order.delivery_address, order.notes,
+            str(context['subtotal']), str(context['delivery_charges']), str(context['total_amount']),
+        ]
+        for item in context['items']:
+            fields.extend([item.medicine.name, item.medicine.brand, item.medicine.strength, item.quantity, str(item.price)])
+        return hashlib.sha256(json.dumps(fields, default=str).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _path(order_id, digest):
+        return f"{BillPDFService.STORAGE_DIR}/{order_id}/{digest}.pdf"
+
+    @staticmethod
+    def get_cached_path(order, context=None):
+        """Storage path of an up-to-date PDF for the order, or None"""
+        from django.core.files.storage import default_storage
+
+        context = context or BillPDFService.billing_context(order)
+        path = BillPDFService._path(order.id, BillPDFService.content_hash(context))
+        return path if default_storage.exists(path) else None
+
+    @staticmethod
+    def render(order):
+        """Render the order bill to PDF unless an identical one is stored.
+
+        Returns the storage path. Older PDFs of the same order are removed.
+        """
+        from io import BytesIO
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from django.template.loader import render_to_string
+        from xhtml2pdf import pisa
+
+        context = BillPDFService.billing_context(order)
+        path = BillPDFService._path(order.id, BillPDFService.content_hash(context))
+        if default_storage.exists(path):
+            return path
+
+        html = render_to_string('orders/order_bill_pdf.html', context)
+        pdf = BytesIO()
+        result = pisa.CreatePDF(html, dest=pdf, encoding='utf-8')
+        if result.err:
+            raise ValueError(f"PDF rendering failed for order {order.id}")
+
+        saved = default_storage.save(path, ContentFile(pdf.getvalue()))
+        if saved != path:
+            # Another worker stored the same content first; keep theirs
+            default_storage.delete(saved)
+        BillPDFService._delete_stale(order.id, path)
+        logger.info(f"Rendered bill PDF for order {order.id}")
+        return path
+
+    @staticmethod
+    def _delete_stale(order_id, current_path):
+        from django.core.files.storage import default_storage
+
+        directory = f"{BillPDFService.STORAGE_DIR}/{order_id}"
+        try:
+            _, files = default_storage.listdir(directory)
+        except FileNotFoundError:
+            return
+        for name in files:
+            path = f"{directory}/{name}"
+            if path != current_path:
+                default_storage.delete(path)
+
+    @staticmethod
+    def schedule(order_id):
+        """Pre-render a bill in the background once the transaction commits"""
+        from django.db import transaction
+        from healthkart360.celery import can_queue_tasks
+
+        if not can_queue_tasks():
+            # No worker available; the first download renders it instead
+            return
+
+        def enqueue():
+            from .tasks import render_order_bill_pdf
+            try:
+                render_order_bill_pdf.apply_async(args=[order_id], retry=False)
+            except Exception as e:
+                logger.warning(f"Could not queue bill PDF for order {order_id}: {e}")
+
+        transaction.on_commit(enqueue)
+
+
+class StockReservationService:
+    """Time-limited stock holds for carts that are being paid for.
+
+    Available-to-promise (ATP) is ``Medicine.quantity`` minus the unexpired
+    holds of other customers, computed in one query. Placing holds and
+    committing stock lock the ``Medicine`` rows involved, so they are
+    serialized per medicine; the stock itself only moves in ``commit``, as
+    a single conditional UPDATE that respects other customers' holds.
+    """
+
+    @staticmethod
+    def hold_seconds():
+        from django.conf import settings
+        return getattr(settings, 'STOCK_RESERVATION_SECONDS', 900)
+
+    @staticmethod
+    def _reserved(exclude_user=None):
+        """Subquery of the units of the outer ``Medicine`` held by unexpired reservations"""
+        from django.db.models import IntegerField, OuterRef, Subquery, Sum
+        from django.db.models.functions import Coalesce
+        from django.utils import timezone
+        from .models import StockReservation
+
+        holds = StockReservation.objects.filter(medicine=OuterRef('pk'), expires_at__gt=timezone.now())
+        if exclude_user is not None:
+            holds = holds.exclude(user=exclude_user)
+        reserved = holds.values('medicine').annotate(total=Sum('quantity')).values('total')
+        return Coalesce(Subquery(reserved, output_field=IntegerField()), 0)
+
+    @staticmethod
+    def _lock(medicine_ids):
+        """Lock the medicine rows, in id order so concurrent checkouts cannot deadlock"""
+        list(Medicine.objects.select_for_update().filter(id__in=medicine_ids).order_by('id').values_list('id', flat=True))
+
+    @staticmethod
+    def available_to_promise(medicine_ids, exclude_user=None):
+        """Map medicine id -> quantity that can still be promised"""
+        rows = Medicine.objects.filter(id__in=medicine_ids).annotate(
+            reserved=StockReservationService._reserved(exclude_user)
+        ).values_list('id', 'quantity', 'reserved')
+        return {medicine_id: max(quantity - reserved, 0) for medicine_id, quantity, reserved in rows}
+
+    @staticmethod
+    def _cart_quantities(user):
+        """Quantities of the in-stock (non advance order) lines of the user's cart"""
+        from .models import CartItem
+
+        return dict(
+            CartItem.objects.filter(cart__user=user, is_advance_order=False).values_list('medicine_id', 'quantity')
+        )
+
+    @staticmethod
+    def reserve_cart(user):
+        """(Re)place holds for the user's cart; raises ValueError if stock is short.
+
+        The medicine rows are locked before ATP is checked, so two customers
+        racing for the last units are serialized: the second one sees the
+        first one's committed hold and backs out.
+        """
+        from datetime import timedelta
+        from django.db import transaction
+        from django.utils import timezone
+        from .models import StockReservation
+
+        quantities = StockReservationService._cart_quantities(user)
+        expires_at = timezone.now() + timedelta(seconds=StockReservationService.hold_seconds())
+
+        with transaction.atomic():
+            StockReservation.objects.filter(user=user).delete()
+            if not quantities:
+                return None
+            StockReservationService._lock(quantities)
+            StockReservation.objects.bulk_create([
+                StockReservation(medicine_id=medicine_id, user=user, quantity=quantity, expires_at=expires_at)
+                for medicine_id, quantity in quantities.items()
+            ])
+            available = StockReservationService.available_to_promise(quantities, exclude_user=user)
+            short = [medicine_id for medicine_id, quantity in quantities.items() if quantity > available.get(medicine_id, 0)]
+            if short:
+                names = dict(Medicine.objects.filter(id__in=short).values_list('id', 'name'))
+                details = ', '.join(f"{names.get(medicine_id, medicine_id)} (only {available.get(medicine_id, 0)} available)" for medicine_id in short)
+                # Raising rolls the new holds back
+                raise ValueError(f"Not enough stock for: {details}")
+
+        logger.info(f"Reserved stock for {len(quantities)} cart items of user {user.id} until {expires_at}")
+        return expires_at
+
+    @staticmethod
+    def release(user):
+        """Drop all holds of the user (cart abandoned, payment failed)"""
+        from .models import StockReservation
+        StockReservation.objects.filter(user=user).delete()
+
+    @staticmethod
+    def commit(user, quantities, strict=True, stock=None):
+        """Decrement stock for an order and drop the user's holds.
+
+        ``quantities`` maps medicine id -> quantity. The rows are locked and
+        then decremented by one UPDATE conditioned on ``quantity - other
+        customers' unexpired holds >= wanted`` for every row, so an order
+        never takes units promised to someone paying online; if any row is
+        short nothing is changed and ValueError is raised. With
+        ``strict=False`` (payment already captured) the decrement is applied
+        regardless and shortfalls are only logged.
+
+        ``stock`` optionally maps medicine id -> (pharmacy id, reorder point,
+        quantity before) as read with the cart; sell-outs and reorder-point
+        crossings are then found in memory instead of by re-reading the rows.
+        """
+        from django.db import transaction
+        from django.db.models import Case, F, IntegerField, Value, When
+        from django.utils import timezone
+        from medicines.services import MedicineAvailabilityService, StockAlertService
+        from .models import StockReservation
+
+        if quantities:
+            wanted = Case(
+                *[When(id=medicine_id, then=Value(quantity)) for medicine_id, quantity in quantities.items()],
+                output_field=IntegerField(),
+            )
+            with transaction.atomic():
+                StockReservationService._lock(quantities)
+                rows = Medicine.objects.filter(id__in=quantities)
+                if strict:
+                    rows = rows.filter(quantity__gte=wanted + StockReservationService._reserved(exclude_user=user))
+                updated = rows.update(quantity=F('quantity') - wanted, updated_at=timezone.now())
+                if strict and updated != len(quantities):
+                    # Raising rolls back the rows that were decremented
+                    raise ValueError("Some items in your cart are no longer in stock")
+
+            if stock is None:
+                stock = {
+                    medicine_id: (pharmacy_id, reorder_point, quantity + quantities[medicine_id])
+                    for medicine_id, pharmacy_id, reorder_point, quantity in Medicine.objects.filter(
+                        id__in=quantities
+                    ).values_list('id', 'pharmacy_id', 'reorder_point', 'quantity')
+                }
+            changes = [
+                (medicine_id, pharmacy_id, reorder_point, before, before - quantities[medicine_id])
+                for medicine_id, (pharmacy_id, reorder_point, before) in stock.items()
+                if medicine_id in quantities
+            ]
+
+            if not strict:
+                oversold = [medicine_id for medicine_id, _, _, _, after in changes if after < 0]
+                if oversold:
+                    logger.error(f"Stock oversold for medicines {oversold} (order of user {user.id})")
+
+            # Medicines that just sold out change what the routing index reports
+            for pharmacy_id in {pharmacy_id for _, pharmacy_id, _, before, after in changes if before > 0 >= after}:
+                MedicineAvailabilityService.schedule_refresh(pharmacy_id)
+            StockAlertService.schedule(changes)
+
+        StockReservationService.release(user)
+
+    @staticmethod
+    def commit_cart(user, strict=True):
+        """Commit the in-stock lines of the user's cart.
+
+        The stock snapshot is read in the same query as the cart lines, so
+        the decrement path costs no extra query for sell-out and low stock
+        detection.
+        """
+        from .models import CartItem
+
+        quantities, stock = {}, {}
+        for medicine_id, quantity, pharmacy_id, reorder_point, before in CartItem.objects.filter(
+            cart__user=user, is_advance_order=False
+        ).values_list('medicine_id', 'quantity', 'medicine__pharmacy_id', 'medicine__reorder_point', 'medicine__quantity'):
+            quantities[medicine_id] = quantity
+            stock[medicine_id] = (pharmacy_id, reorder_point, before)
+        StockReservationService.commit(user, quantities, strict=strict, stock=stock)
+
+    @staticmethod
+    def purge_expired():
+        """Delete expired holds; returns the number removed"""
+        from django.utils import timezone
+        from .models import StockReservation
+
+        deleted, _ = StockReservation.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
+
+class SupplierBatchService:
+    """Service class rolling open advance-order items into supplier purchase orders"""
+
+    # Advance orders whose items still need to be ordered from a supplier
+    OPEN_ADVANCE_STATUSES = ('pending', 'confirmed')
+    # Advance order status each purchase order status fans out to
+    FAN_OUT_STATUSES = {'ordered': 'ordered', 'received': 'received'}
+    # Fulfilment order of advance order statuses; fan-out never moves an order back
+    ADVANCE_PROGRESS = ('pending', 'confirmed', 'ordered', 'received', 'ready')
+
+    @staticmethod
+    def normalize_name(name):
+        """Case, punctuation and spacing insensitive medicine name"""
+        return ' '.join(re.findall(r'\w+', name.lower()))[:200]
+
+    @staticmethod
+    def build_batches(pharmacy_id=None):
+        """Roll unbatched open advance-order items into each pharmacy's draft purchase order.
+
+        Each pharmacy's items are locked and re-read inside its transaction,
+        so an overlapping run (or a cancelled PO releasing items) cannot batch
+        the same item twice. Returns the number of items batched.
+        """
+        from collections import defaultdict
+        from django.db import transaction
+        from .models import AdvanceOrderItem, SupplierPurchaseOrder, SupplierPurchaseOrderLine
+
+        unbatched = AdvanceOrderItem.objects.filter(
+            purchase_order_line__isnull=True,
+            advance_order__status__in=SupplierBatchService.OPEN_ADVANCE_STATUSES,
+            advance_order__pharmacy__isnull=False,
+        )
+        if pharmacy_id is not None:
+            unbatched = unbatched.filter(advance_order__pharmacy_id=pharmacy_id)
+        pharmacy_ids = list(unbatched.values_list('advance_order__pharmacy_id', flat=True).distinct())
+
+        batched = 0
+        for batch_pharmacy_id in pharmacy_ids:
+            with transaction.atomic():
+                items = list(unbatched.select_for_update(of=('self',)).filter(
+                    advance_order__pharmacy_id=batch_pharmacy_id, purchase_order_line__isnull=True,
+                ))
+                if not items:
+                    continue  # Batched by an overlapping run
+
+                by_name = defaultdict(list)
+                for item in items:
+                    by_name[SupplierBatchService.normalize_name(item.medicine_name)].append(item)
+
+                purchase_order = SupplierPurchaseOrder.objects.select_for_update().filter(
+                    pharmacy_id=batch_pharmacy_id, status='draft'
+                ).first()
+                if purchase_order is None:
+                    purchase_order = SupplierPurchaseOrder.objects.create(pharmacy_id=batch_pharmacy_id)
+
+                lines = {line.normalized_name: line for line in purchase_order.lines.select_for_update()}
+                new_lines = []
+                for name, group in by_name.items():
+                    line = lines.get(name)
+                    if line is None:
+                        line = lines[name] = SupplierPurchaseOrderLine(
+                            purchase_order=purchase_order, normalized_name=name, medicine_name=group[0].medicine_name
+                        )
+                        new_lines.append(line)
+                    line.quantity += sum(item.quantity_requested for item in group)
+                    line.estimated_cost += sum(item.estimated_price or 0 for item in group)
+
+                existing_lines = [line for line in lines.values() if line.pk is not None]
+                if existing_lines:
+                    SupplierPurchaseOrderLine.objects.bulk_update(existing_lines, ['quantity', 'estimated_cost'])
+                if new_lines:
+                    SupplierPurchaseOrderLine.objects.bulk_create(new_lines)
+                    # Re-read so the new lines have primary keys on every backend
+                    lines = {line.normalized_name: line for line in purchase_order.lines.all()}
+
+                for name, group in by_name.items():
+                    for item in group:
+                        item.purchase_order_line = lines[name]
+                AdvanceOrderItem.objects.bulk_update(items, ['purchase_order_line'])
+                batched += len(items)
+
+            logger.info(f"Batched {len(items)} advance order items into supplier PO {purchase_order.id}")
+        return batched
+
+    @staticmethod
+    def update_status(purchase_order, new_status):
+        """Change a purchase order's status and fan it out to its advance orders.
+
+        Returns the number of advance orders updated.
+        """
+        from django.db import transaction
+        from django.utils import timezone
+        from .models import AdvanceOrderItem
+
+        if new_status == purchase_order.status:
+            return 0
+
+        with transaction.atomic():
+            purchase_order.status = new_status
+            if new_status == 'ordered' and purchase_order.ordered_at is None:
+                purchase_order.ordered_at = timezone.now()
+            purchase_order.save()
+
+            if new_status == 'cancelled':
+                # Release the items so the next run batches them again
+                AdvanceOrderItem.objects.filter(
+                    purchase_order_line__purchase_order=purchase_order
+                ).update(purchase_order_line=None)
+                return 0
+
+            target = SupplierBatchService.FAN_OUT_STATUSES.get(new_status)
+            if target is None:
+                return 0
+            return SupplierBatchService._fan_out(purchase_order, target)
+
+    @staticmethod
+    def _fan_out(purchase_order, target):
+        """Move the advance orders behind the purchase order to ``target`` in bulk.
+
+        An advance order only moves once all of its items are on purchase
+        orders that have reached ``target``; one with items still unbatched or
+        on another, earlier purchase order waits for that one.
+        """
+        from collections import Counter
+        from django.db.models import Exists, OuterRef, Q
+        from django.utils import timezone
+        from .models import AdvanceOrder, AdvanceOrderItem, PharmacyOrderStats
+
+        progress = SupplierBatchService.ADVANCE_PROGRESS
+        reached = [
+            status for status, advance_status in SupplierBatchService.FAN_OUT_STATUSES.items()
+            if progress.index(advance_status) >= progress.index(target)
+        ]
+        uncovered = AdvanceOrderItem.objects.filter(advance_order=OuterRef('pk')).filter(
+            Q(purchase_order_line__isnull=True) | ~Q(purchase_order_line__purchase_order__status__in=reached)
+        )
+        advance_orders = list(AdvanceOrder.objects.filter(
+            items__purchase_order_line__purchase_order=purchase_order,
+            status__in=progress[:progress.index(target)],
+        ).exclude(Exists(uncovered)).distinct())
+        if not advance_orders:
+            return 0
+
+        updates = {'status': target, 'updated_at': timezone.now()}
+        if purchase_order.supplier_name:
+            updates['supplier_name'] = purchase_order.supplier_name
+        if purchase_order.supplier_contact:
+            updates['supplier_contact'] = purchase_order.supplier_contact
+        AdvanceOrder.objects.filter(id__in=[advance_order.id for advance_order in advance_orders]).update(**updates)
+
+        old_statuses = {advance_order.id: advance_order.status for advance_order in advance_orders}
+        for advance_order in advance_orders:
+            advance_order.status = target
+
+        deltas = Counter()
+        for old_status in old_statuses.values():
+            deltas[PharmacyOrderStats.advance_field(old_status)] -= 1
+        deltas[PharmacyOrderStats.advance_field(target)] += len(advance_orders)
+        OrderStatsService._apply(purchase_order.pharmacy_id, deltas)
+        OrderEventService.record_advance_status_changes(advance_orders, old_statuses)
+        SupplierBatchService.schedule_status_digests(list(old_statuses))
+
+        logger.info(f"Supplier PO {purchase_order.id} moved {len(advance_orders)} advance orders to {target}")
+        return len(advance_orders)
+
+    @staticmethod
+    def schedule_status_digests(advance_order_ids):
+        """Email customers once the transaction commits, in the background when possible"""
+        from django.db import transaction
+        from healthkart360.celery import can_queue_tasks
+
+        def send():
+            if can_queue_tasks():
+                from .tasks import send_advance_order_status_digests
+                try:
+                    send_advance_order_status_digests.apply_async(args=[advance_order_ids], retry=False)
+                    return
+                except Exception as e:
+                    logger.warning(f"Could not queue advance order status digests: {e}")
+            SupplierBatchService.send_status_digests(advance_order_ids)
+
+        transaction.on_commit(send)
+
+    @staticmethod
+    def send_status_digests(advance_order_ids):
+        """Send each customer one email covering all of their updated advance orders"""
+        from collections import defaultdict
+        from notifications.services import NotificationService
+        from .models import AdvanceOrder
+
+        by_user = defaultdict(list)
+        advance_orders = AdvanceOrder.objects.filter(id__in=advance_order_ids).select_related(
+            'user', 'pharmacy'
+        ).prefetch_related('items').order_by('id')
+        for advance_order in advance_orders:
+            by_user[advance_order.user_id].append(advance_order)
+
+        sent = 0
+        for user_orders in by_user.values():
+            if NotificationService.send_advance_order_status_digest(user_orders[0].user, user_orders):
+                sent += 1
+        return sent
+
+
+
+class AdvanceOrderRoutingService:
+    """Service class routing unavailable prescription lines to pharmacies for advance orders"""
+
+    PLACEHOLDER_PRICE = 50  # Default price for advance orders
+
+    @staticmethod
+    def placeholder_medicines(prescription_medicines):
+        """Map prescription medicine id -> Medicine to put in the cart as an advance order.
+
+        Each line goes to the pharmacy the availability index ranks best,
+        falling back to the first pharmacy with medicines. A medicine of the
+        same name at that pharmacy is reused, otherwise an out-of-stock
+        placeholder is created; all placeholders are created in one insert.
+        """
+        from datetime import date, timedelta
+        from medicines.services import MedicineAvailabilityService
+        from pharmacy.models import Pharmacy
+
+        if not prescription_medicines:
+            return {}
+
+        routes = MedicineAvailabilityService.route({med.medicine_name for med in prescription_medicines})
+        fallback_id = None
+        if None in routes.values():
+            fallback = (
+                Pharmacy.objects.filter(medicine__isnull=False).distinct().order_by('id').first()
+                or Pharmacy.objects.order_by('id').first()
+            )
+            fallback_id = fallback.id if fallback else None
+
+        targets = {}
+        for med in prescription_medicines:
+            pharmacy_id = routes.get(med.medicine_name) or fallback_id
+            if pharmacy_id is not None:
+                targets[med.id] = (med.medicine_name, pharmacy_id)
+        if not targets:
+            return {}
+
+        def existing_medicines():
+            found = {}
+            for medicine in Medicine.objects.filter(
+                name__in={name for name, _ in targets.values()},
+                pharmacy_id__in={pharmacy_id for _, pharmacy_id in targets.values()},
+            ).select_related('pharmacy').order_by('id'):
+                found.setdefault((medicine.name, medicine.pharmacy_id), medicine)
+            return found
+
+        found = existing_medicines()
+        missing = {}
+        for med in prescription_medicines:
+            key = targets.get(med.id)
+            if key and key not in found and key not in missing:
+                missing[key] = Medicine(
+                    name=med.medicine_name,
+                    pharmacy_id=key[1],
+                    generic_name=med.medicine_name,
+                    brand=MedicineAvailabilityService.PLACEHOLDER_BRAND,
+                    medicine_type='tablet',
+                    strength=med.dosage or 'N/A',
+                    price=AdvanceOrderRoutingService.PLACEHOLDER_PRICE,
+                    quantity=0,  # Out of stock
+                    expiry_date=date.today() + timedelta(days=365),
+                    batch_number=f'AO-{med.id}',
+                    is_essential=False,
+                    is_prescription_required=True,
+                )
+        if missing:
+            Medicine.objects.bulk_create(missing.values())
+            # Re-read so the placeholders have primary keys on every backend
+            found = existing_medicines()
+
+        return {med_id: found[key] for med_id, key in targets.items() if key in found}
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import time
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseForbidden, StreamingHttpResponse
+from .events import OrderEventBus
+from .services import OrderEventService
+
+# How long one SSE connection stays open before the browser reconnects with
+# Last-Event-ID. Keeps proxies happy and bounds per-connection state.
+STREAM_MAX_SECONDS = 55
+STREAM_POLL_SECONDS = 1
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_RETRY_MS = 3000
+# A WSGI response closes at once, so every reconnect is a full request
+# (session, user and pharmacy queries); keep those to one a minute per page
+STREAM_WSGI_RETRY_MS = 60000
+
+
+def _get_request_pharmacy(request):
+    """Resolve the pharmacy of the logged in user (runs in a sync thread)"""
+    if not request.user.is_authenticated:
+        return None
+    return getattr(request.user, 'pharmacy', None) or getattr(request.user, 'owned_pharmacy', None)
+
+
+def _parse_cursor(request):
+    cursor = request.headers.get('Last-Event-ID') or request.GET.get('cursor')
+    try:
+        return int(cursor) if cursor is not None else None
+    except ValueError:
+        return None
+
+
+def _format_event(event, stats):
+    # The OrderEvent id is the SSE id, so Last-Event-ID resumes from the change log
+    return f"id: {event['cursor']}\nevent: {event['event']}\ndata: {json.dumps({**event, 'stats': stats})}\n\n"
+
+
+def _format_resync(latest):
+    # Tell the client its cursor is too far behind to replay so it refetches state
+    return f"id: {latest}\nevent: resync\ndata: {json.dumps({'cursor': latest})}\n\n"
+
+
+def _read_events(pharmacy, cursor):
+    """SSE frames for the pharmacy's events after ``cursor``, and the new cursor"""
+    changes = OrderEventService.get_changes(cursor, OrderEventService.MAX_PAGE_SIZE, pharmacy=pharmacy)
+    if changes['has_more']:
+        latest = OrderEventService.latest_cursor(pharmacy)
+        return [_format_resync(latest)], latest
+    if not changes['events']:
+        return [], cursor
+    stats = OrderEventBus.stats_payload(pharmacy.id)
+    return [_format_event(event, stats) for event in changes['events']], changes['next_cursor']
+
+
+async def _event_stream(pharmacy, cursor):
+    """Async SSE generator; reads the event log only when the bus says it changed"""
+    yield f"retry: {STREAM_RETRY_MS}\n\n"
+    seen = None  # Catch up from the client's cursor first
+    if cursor is None:
+        seen = await OrderEventBus.aversion(pharmacy.id)
+        cursor = await sync_to_async(OrderEventService.latest_cursor)(pharmacy)
+        yield f"id: {cursor}\nevent: ready\ndata: {json.dumps({'cursor': cursor})}\n\n"
+
+    started = last_sent = time.monotonic()
+    while time.monotonic() - started < STREAM_MAX_SECONDS:
+        version = await OrderEventBus.aversion(pharmacy.id)
+        if version != seen:
+            seen = version
+            frames, cursor = await sync_to_async(_read_events)(pharmacy, cursor)
+            for frame in frames:
+                yield frame
+                last_sent = time.monotonic()
+
+        if time.monotonic() - last_sent >= STREAM_KEEPALIVE_SECONDS:
+            yield ": keepalive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(STREAM_POLL_SECONDS)
+
+
+def _event_backlog(pharmacy, cursor):
+    """Sync fallback for WSGI servers: flush pending events and close.
+
+    A sync worker cannot hold idle connections cheaply, so the browser
+    reconnects after a long ``retry`` instead; events arrive up to a minute
+    late, like the reload poll this replaced.
+    """
+    yield f"retry: {STREAM_WSGI_RETRY_MS}\n\n"
+    if cursor is None:
+        cursor = OrderEventService.latest_cursor(pharmacy)
+        yield f"id: {cursor}\nevent: ready\ndata: {json.dumps({'cursor': cursor})}\n\n"
+        return
+    frames, cursor = _read_events(pharmacy, cursor)
+    yield from frames
+
+
+async def order_event_stream(request):
+    """Server-Sent Events feed of order-created and status-changed events"""
+    pharmacy = await sync_to_async(_get_request_pharmacy)(request)
+    if pharmacy is None:
+        return HttpResponseForbidden('Access denied')
+
+    cursor = _parse_cursor(request)
+    if isinstance(request, ASGIRequest):
+        stream = _event_stream(pharmacy, cursor)
+    else:
+        stream = _event_backlog(pharmacy, cursor)
+
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -36,4 +36,107 @@ def send_order_confirmation_emails(self, order_id):
         logger.error(f"[Celery Task] Error sending emails for order {order_id}: {exc}. Retrying...")
         raise self.retry(exc=exc)
     finally:
-        connections.close_all()
\ No newline at end of file
+        connections.close_all()
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=300)
+def archive_old_orders(self, max_batches=20):
+    """
+    Celery task moving finished orders to the archive tables in batches.
+    Each batch is its own transaction; if work remains after max_batches
+    the task re-queues itself instead of holding a worker.
+    """
+    from .services import OrderArchiveService
+
+    try:
+        total = 0
+        for _ in range(max_batches):
+            archived = OrderArchiveService.archive_batch()
+            total += archived
+            if not archived:
+                break
+        else:
+            self.apply_async(kwargs={'max_batches': max_batches}, countdown=60)
+        logger.info(f"[Celery Task] Archived {total} orders")
+        return total
+    except Exception as exc:
+        logger.error(f"[Celery Task] Error archiving orders: {exc}. Retrying...")
+        raise self.retry(exc=exc)
+    finally:
+        connections.close_all()
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60, ignore_result=True)
+def render_order_bill_pdf(self, order_id):
+    """
+    Celery task pre-rendering the PDF bill of an order so downloads are served
+    straight from storage.
+    """
+    from .services import BillPDFService, OrderArchiveService
+
+    try:
+        order = OrderArchiveService.get_order(order_id)
+        if order is None:
+            logger.error(f"[Celery Task] Order with ID {order_id} does not exist. Not rendering bill.")
+            return None
+        return BillPDFService.render(order)
+    except Exception as exc:
+        logger.error(f"[Celery Task] Error rendering bill PDF for order {order_id}: {exc}. Retrying...")
+        raise self.retry(exc=exc)
+    finally:
+        connections.close_all()
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60, ignore_result=True)
+def release_expired_reservations(self):
+    """
+    Celery task deleting stock holds whose TTL has passed. Expired holds are
+    already ignored by availability checks; this only keeps the table small.
+    """
+    from .services import StockReservationService
+
+    try:
+        released = StockReservationService.purge_expired()
+        logger.info(f"[Celery Task] Released {released} expired stock reservations")
+        return released
+    except Exception as exc:
+        logger.error(f"[Celery Task] Error releasing expired stock reservations: {exc}. Retrying...")
+        raise self.retry(exc=exc)
+    finally:
+        connections.close_all()
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=300)
+def batch_advance_order_items(self):
+    """
+    Celery task rolling open advance-order items into each pharmacy's draft
+    supplier purchase order.
+    """
+    from .services import SupplierBatchService
+
+    try:
+        batched = SupplierBatchService.build_batches()
+        logger.info(f"[Celery Task] Batched {batched} advance order items into supplier purchase orders")
+        return batched
+    except Exception as exc:
+        logger.error(f"[Celery Task] Error batching advance order items: {exc}. Retrying...")
+        raise self.retry(exc=exc)
+    finally:
+        connections.close_all()
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60, ignore_result=True)
+def send_advance_order_status_digests(self, advance_order_ids):
+    """
+    Celery task emailing each customer one digest of their advance orders
+    updated by a supplier purchase order status change.
+    """
+    from .services import SupplierBatchService
+
+    try:
+        sent = SupplierBatchService.send_status_digests(advance_order_ids)
+        logger.info(f"[Celery Task] Sent {sent} advance order status digests")
+    except Exception as exc:
+        logger.error(f"[Celery Task] Error sending advance order status digests: {exc}. Retrying...")
+        raise self.retry(exc=exc)
+    finally:
+        connections.close_all()
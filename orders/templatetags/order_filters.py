@@ -11,13 +11,17 @@ def multiply(value, arg):
     except (ValueError, TypeError):
         return 0
 
-@register.simple_tag
-def get_cart_count(user):
-    """Get the cart item count for a user"""
+@register.simple_tag(takes_context=True)
+def get_cart_count(context, user):
+    """Get the cart item count for a user.
+
+    Rendered on every page, so it reads the count the cart mutations keep in
+    the session (or a cached summary); it never queries the database.
+    """
     if user.is_authenticated:
+        request = context.get('request')
         try:
-            cart = CartService.get_or_create_cart(user)
-            return cart.item_count
-        except:
+            return CartService.session_item_count(getattr(request, 'session', None), user)
+        except Exception:
             return 0
     return 0
@@ -0,0 +1,264 @@
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+import razorpay
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.utils import timezone
+
+from medicines.models import Medicine
+from pharmacy.models import Pharmacy
+from users.models import User
+from .models import AdvanceOrder, CartItem, Order, OrderItem, PharmacyOrderStats, StockReservation
+from .services import CartService, OrderArchiveService, OrderSearchService, OrderStatsService, StockReservationService
+
+
+def create_pharmacy(quantity=5, medicines=2):
+    """A pharmacy owner, their pharmacy and ``medicines`` medicines with ``quantity`` units each"""
+    owner = User.objects.create_user(
+        username='owner', password='pw', phone_number='9000000001', email='owner@example.com', is_pharmacist=True
+    )
+    pharmacy = Pharmacy.objects.create(
+        owner=owner, name='City Pharmacy', address='1 Main Road', phone_number='9000000001',
+        license_number='LIC-1', email='pharmacy@example.com'
+    )
+    stock = [
+        Medicine.objects.create(
+            pharmacy=pharmacy, name=f'Paracetamol {i}', generic_name='paracetamol', brand='Brand',
+            medicine_type='tablet', strength='500mg', price=Decimal('10.00'), quantity=quantity,
+            expiry_date=date.today() + timedelta(days=365), batch_number=f'B{i}'
+        )
+        for i in range(medicines)
+    ]
+    return owner, pharmacy, stock
+
+
+def create_customer(username, phone_number):
+    return User.objects.create_user(
+        username=username, password='pw', phone_number=phone_number, email=f'{username}@example.com',
+        first_name=username.title(), last_name='Customer'
+    )
+
+
+class StockReservationServiceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner, self.pharmacy, (self.medicine, self.other_medicine) = create_pharmacy(quantity=5)
+        self.customer = create_customer('asha', '9000000002')
+        self.rival = create_customer('ravi', '9000000003')
+
+    def quantity(self, medicine):
+        medicine.refresh_from_db()
+        return medicine.quantity
+
+    def test_hold_reduces_available_to_promise_for_others(self):
+        CartService.add_to_cart(self.customer, self.medicine.id, 4)
+
+        expires_at = StockReservationService.reserve_cart(self.customer)
+
+        self.assertGreater(expires_at, timezone.now())
+        self.assertEqual(StockReservationService.available_to_promise([self.medicine.id])[self.medicine.id], 1)
+        # The holder's own holds are still available to them
+        available = StockReservationService.available_to_promise([self.medicine.id], exclude_user=self.customer)
+        self.assertEqual(available[self.medicine.id], 5)
+        # Holding moves no stock
+        self.assertEqual(self.quantity(self.medicine), 5)
+
+    def test_reserve_refuses_to_oversell_and_keeps_no_holds(self):
+        CartService.add_to_cart(self.customer, self.medicine.id, 4)
+        StockReservationService.reserve_cart(self.customer)
+        CartService.add_to_cart(self.rival, self.medicine.id, 1)
+        CartService.add_to_cart(self.rival, self.other_medicine.id, 1)
+        CartItem.objects.filter(cart__user=self.rival, medicine=self.medicine).update(quantity=2)
+
+        with self.assertRaises(ValueError):
+            StockReservationService.reserve_cart(self.rival)
+
+        self.assertFalse(StockReservation.objects.filter(user=self.rival).exists())
+
+    def test_cart_refuses_units_held_by_others(self):
+        CartService.add_to_cart(self.customer, self.medicine.id, 4)
+        StockReservationService.reserve_cart(self.customer)
+
+        with self.assertRaises(ValueError):
+            CartService.add_to_cart(self.rival, self.medicine.id, 2)
+        CartService.add_to_cart(self.rival, self.medicine.id, 1)
+        with self.assertRaises(ValueError):
+            CartService.update_cart_item(self.rival, self.medicine.id, 2)
+
+    def test_strict_commit_refuses_held_units_and_changes_nothing(self):
+        CartService.add_to_cart(self.customer, self.medicine.id, 4)
+        StockReservationService.reserve_cart(self.customer)
+
+        with self.assertRaises(ValueError):
+            StockReservationService.commit(self.rival, {self.medicine.id: 2, self.other_medicine.id: 1})
+
+        self.assertEqual(self.quantity(self.medicine), 5)
+        self.assertEqual(self.quantity(self.other_medicine), 5)
+        StockReservationService.commit(self.rival, {self.medicine.id: 1})
+        self.assertEqual(self.quantity(self.medicine), 4)
+
+    def test_commit_cart_takes_stock_and_drops_holds(self):
+        CartService.add_to_cart(self.customer, self.medicine.id, 4)
+        CartService.add_to_cart(self.customer, self.other_medicine.id, 1)
+        StockReservationService.reserve_cart(self.customer)
+
+        StockReservationService.commit_cart(self.customer)
+
+        self.assertEqual(self.quantity(self.medicine), 1)
+        self.assertEqual(self.quantity(self.other_medicine), 4)
+        self.assertFalse(StockReservation.objects.filter(user=self.customer).exists())
+
+    def test_captured_payment_commits_past_a_competing_hold(self):
+        # The rival's payment was captured after their hold expired and the
+        # customer's hold covered the stock: the non-strict commit still takes it
+        CartService.add_to_cart(self.customer, self.medicine.id, 5)
+        CartService.add_to_cart(self.rival, self.medicine.id, 3)
+        StockReservationService.reserve_cart(self.rival)
+        StockReservation.objects.filter(user=self.rival).update(expires_at=timezone.now() - timedelta(seconds=1))
+        StockReservationService.reserve_cart(self.customer)
+
+        StockReservationService.commit_cart(self.rival, strict=False)
+
+        self.assertEqual(self.quantity(self.medicine), 2)
+        self.assertFalse(StockReservation.objects.filter(user=self.rival).exists())
+        # The customer's strict commit now finds the stock short and takes nothing
+        with self.assertRaises(ValueError):
+            StockReservationService.commit_cart(self.customer)
+        self.assertEqual(self.quantity(self.medicine), 2)
+
+    def test_expired_holds_free_stock_and_are_purged(self):
+        CartService.add_to_cart(self.customer, self.medicine.id, 5)
+        StockReservationService.reserve_cart(self.customer)
+        self.assertEqual(StockReservationService.available_to_promise([self.medicine.id])[self.medicine.id], 0)
+
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(StockReservationService.available_to_promise([self.medicine.id])[self.medicine.id], 5)
+        CartService.add_to_cart(self.rival, self.medicine.id, 5)
+        StockReservationService.reserve_cart(self.rival)
+        self.assertEqual(StockReservationService.purge_expired(), 1)
+        self.assertTrue(StockReservation.objects.filter(user=self.rival).exists())
+
+    def test_release_view_drops_holds(self):
+        CartService.add_to_cart(self.customer, self.medicine.id, 4)
+        StockReservationService.reserve_cart(self.customer)
+        client = Client()
+        client.force_login(self.customer)
+
+        response = client.post('/en/orders/release-stock-hold/')
+
+        self.assertTrue(response.json()['success'])
+        self.assertFalse(StockReservation.objects.filter(user=self.customer).exists())
+
+    @mock.patch('orders.razorpay_views.razorpay.Client')
+    def test_failed_signature_releases_holds(self, client_class):
+        client_class.return_value.utility.verify_payment_signature.side_effect = (
+            razorpay.errors.SignatureVerificationError('bad signature')
+        )
+        CartService.add_to_cart(self.customer, self.medicine.id, 4)
+        StockReservationService.reserve_cart(self.customer)
+        client = Client()
+        client.force_login(self.customer)
+
+        response = client.post('/en/orders/razorpay-callback/', json.dumps({
+            'razorpay_payment_id': 'pay_1', 'razorpay_order_id': 'order_1', 'razorpay_signature': 'forged',
+        }), content_type='application/json')
+
+        self.assertFalse(response.json()['success'])
+        self.assertFalse(StockReservation.objects.filter(user=self.customer).exists())
+        self.assertEqual(self.quantity(self.medicine), 5)
+
+
+class OrderStatsServiceTest(TestCase):
+    COUNTERS = [
+        'pending_count', 'confirmed_count', 'preparing_count', 'ready_count', 'out_for_delivery_count',
+        'delivered_count', 'completed_count', 'cancelled_count', 'advance_pending_count',
+        'advance_confirmed_count', 'advance_ordered_count', 'advance_received_count', 'advance_ready_count',
+        'advance_cancelled_count', 'revenue',
+    ]
+
+    def setUp(self):
+        self.owner, self.pharmacy, (self.medicine,) = create_pharmacy(medicines=1)
+        self.customer = create_customer('asha', '9000000002')
+        OrderStatsService.get_stats(self.pharmacy)
+
+    def place_order(self, price):
+        order = Order.objects.create(user=self.customer, pharmacy=self.pharmacy)
+        OrderItem.objects.create(order=order, medicine=self.medicine, quantity=1, price=Decimal(price))
+        order.calculate_totals()
+        OrderStatsService.record_order_placed(order)
+        return order
+
+    def set_status(self, order, status):
+        old_status, order.status = order.status, status
+        order.save()
+        OrderStatsService.record_status_change(order, old_status)
+
+    def set_advance_status(self, advance_order, status):
+        old_status, advance_order.status = advance_order.status, status
+        advance_order.save()
+        OrderStatsService.record_advance_status_change(advance_order, old_status)
+
+    def assertMatchesRecount(self):
+        kept = PharmacyOrderStats.objects.values(*self.COUNTERS).get(pk=self.pharmacy.pk)
+        OrderStatsService.rebuild(self.pharmacy.pk)
+        recount = PharmacyOrderStats.objects.values(*self.COUNTERS).get(pk=self.pharmacy.pk)
+        self.assertEqual(kept, recount)
+
+    def test_counters_match_recount(self):
+        delivered = self.place_order('120.00')
+        cancelled = self.place_order('40.00')
+        completed = self.place_order('75.50')
+        advance_order = AdvanceOrder.objects.create(user=self.customer, pharmacy=self.pharmacy)
+        OrderStatsService.record_advance_order_placed(advance_order)
+        self.assertMatchesRecount()
+
+        for status in ('confirmed', 'preparing', 'ready', 'delivered'):
+            self.set_status(delivered, status)
+        self.set_status(cancelled, 'cancelled')
+        for status in ('confirmed', 'delivered', 'completed'):
+            self.set_status(completed, status)
+        self.set_status(completed, 'completed')  # No change
+        for status in ('confirmed', 'ordered', 'received'):
+            self.set_advance_status(advance_order, status)
+        self.assertMatchesRecount()
+        stats = OrderStatsService.get_stats(self.pharmacy)
+        self.assertEqual(stats.revenue, Decimal('195.50'))
+
+        # Revenue leaves with an order moved back out of a revenue status
+        self.set_status(delivered, 'out_for_delivery')
+        self.assertMatchesRecount()
+
+        # Archived orders keep counting towards the totals and revenue
+        self.assertEqual(OrderArchiveService.archive_batch(days=0), 2)
+        self.assertFalse(Order.objects.filter(id__in=[cancelled.id, completed.id]).exists())
+        self.assertMatchesRecount()
+
+
+class ArchivedOrderSearchTest(TestCase):
+    def setUp(self):
+        self.owner, self.pharmacy, (self.medicine,) = create_pharmacy(medicines=1)
+        self.customer = create_customer('asha', '9000000002')
+        self.order = Order.objects.create(user=self.customer, pharmacy=self.pharmacy, status='completed')
+        OrderItem.objects.create(order=self.order, medicine=self.medicine, quantity=1, price=Decimal('10.00'))
+        OrderSearchService.index_order(self.order)
+        OrderArchiveService.archive_batch(days=0)
+
+    def test_archived_order_is_still_found(self):
+        self.assertEqual(OrderSearchService.search(self.pharmacy, 'paracetamol asha'), [('regular', self.order.id)])
+
+        OrderSearchService.rebuild(self.pharmacy.pk)
+
+        self.assertEqual(OrderSearchService.search(self.pharmacy, 'paracetamol asha'), [('regular', self.order.id)])
+
+    def test_pharmacy_orders_lists_archived_hits(self):
+        client = Client()
+        client.force_login(self.owner)
+
+        response = client.get('/en/orders/pharmacy-orders/', {'search': 'paracetamol', 'status': 'completed'})
+
+        self.assertEqual([order['id'] for order in response.context['combined_orders']], [self.order.id])
+        self.assertContains(response, 'Paracetamol 0')
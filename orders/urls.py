@@ -2,6 +2,7 @@ from django.urls import path
 
 from . import views
 from . import razorpay_views
+from . import stream_views
 
 app_name = 'orders'
 
@@ -21,32 +22,43 @@ urlpatterns = [
     path('update-cart/<int:medicine_id>/', views.update_cart_item, name='update_cart_item'),
     path('remove-from-cart/<int:medicine_id>/', views.remove_from_cart, name='remove_from_cart'),
     path('clear-cart/', views.clear_cart, name='clear_cart'),
+    path('api/cart/batch/', views.cart_batch, name='cart_batch'),
     path('checkout/', views.checkout, name='checkout'),
     
     # Order management
     path('create/', views.create_order, name='create'),
     path('my-orders/', views.my_orders, name='my_orders'),
     path('pharmacy-orders/', views.pharmacy_orders, name='pharmacy_orders'),
+    path('pharmacy-orders/export/', views.export_orders, name='export_orders'),
     path('detail/<int:order_id>/', views.order_detail, name='order_detail'),
     path('bill/<int:order_id>/', views.order_bill, name='order_bill'),
+    path('bill/<int:order_id>/pdf/', views.order_bill_pdf, name='order_bill_pdf'),
     path('update-status/<int:order_id>/', views.update_order_status, name='update_status'),
     
     # Advance orders
     path('advance-orders/', views.advance_orders, name='advance_orders'),
     path('advance-order/<int:order_id>/', views.advance_order_detail, name='advance_order_detail'),
     path('create-advance-order/', views.create_advance_order, name='create_advance_order'),
+    path('api/advance-catalog/', views.advance_catalog, name='advance_catalog'),
     path('update-advance-order-status/<int:order_id>/', views.update_advance_order_status, name='update_advance_order_status'),
+
+    # Supplier purchase orders (batched advance-order items)
+    path('supplier-orders/', views.supplier_orders, name='supplier_orders'),
+    path('supplier-orders/<int:purchase_order_id>/status/', views.update_supplier_order_status, name='update_supplier_order_status'),
     
     # Legacy routes
     path('select-medicines/', views.select_medicines, name='select_medicines'),
     
     # API endpoints
     path('api/orders-data/', views.get_orders_data, name='get_orders_data'),
+    path('api/orders/changes/', views.get_order_changes, name='get_order_changes'),
+    path('api/orders/stream/', stream_views.order_event_stream, name='order_event_stream'),
     path('api/pharmacy-dashboard-data/', views.get_pharmacy_dashboard_data, name='get_pharmacy_dashboard_data'),
 
     # Razorpay integration endpoints
     path('create-razorpay-order/', razorpay_views.create_razorpay_order, name='create_razorpay_order'),
     path('razorpay-callback/', razorpay_views.razorpay_callback, name='razorpay_callback'),
+    path('release-stock-hold/', razorpay_views.release_stock_hold, name='release_stock_hold'),
 
     # API endpoints
     path('api/orders/', views.orders_api, name='orders_api'),
@@ -2,16 +2,19 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from django.db.models import Sum, Q
+from django.db import transaction
+from django.db.models import Count, Sum, Q
 from django.template.loader import render_to_string
 from django.utils import timezone
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, Http404
+import json
 import logging
-from .models import Order, OrderItem, Prescription, PrescriptionMedicine, Cart, CartItem, MedicineReminder, AdvanceOrder, AdvanceOrderItem
+from .models import Order, ArchivedOrder, OrderItem, Prescription, PrescriptionMedicine, Cart, CartItem, MedicineReminder, AdvanceOrder, AdvanceOrderItem, SupplierPurchaseOrder
 from .forms import OrderForm, PrescriptionUploadForm, PrescriptionMedicineForm, CheckoutForm, ReminderForm
-from .services import PrescriptionProcessor, CartService, ReminderService
+from .services import PrescriptionProcessor, CartService, ReminderService, OrderStatsService, OrderEventService, OrderSearchService, OrderArchiveService, BillPDFService, StockReservationService, SupplierBatchService, AdvanceOrderRoutingService
 from core.ocr_utils import extract_text_from_image
 from medicines.models import Medicine
+from medicines.services import MedicineCatalogService
 from pharmacy.models import Pharmacy
 from notifications.services import NotificationService
 
@@ -107,11 +110,12 @@ def prescription_medicines(request, prescription_id):
                             'quantity': int(quantity)
                         })
             if selected_medicines:
-                for item in selected_medicines:
-                    try:
-                        CartService.add_to_cart(request.user, item['medicine'].id, item['quantity'])
-                    except ValueError as e:
-                        messages.warning(request, str(e))
+                result = CartService.apply_batch(request.user, [
+                    {'medicine_id': item['medicine'].id, 'quantity': item['quantity'], 'action': 'add'}
+                    for item in selected_medicines
+                ], session=request.session)
+                for error in result['errors']:
+                    messages.warning(request, error['message'])
                 messages.success(request, 'Selected medicines added to cart!')
                 return redirect('orders:view_cart')
             else:
@@ -119,65 +123,39 @@ def prescription_medicines(request, prescription_id):
 
         elif action == 'create_advance_orders':
             # Clear existing cart
-            CartService.clear_cart(request.user)
+            CartService.clear_cart(request.user, session=request.session)
 
             # Add selected unavailable medicines to cart with advance order flag
-            advance_order_items = []
+            selected = []
             for med in prescription_medicines:
                 is_selected = request.POST.get(f'advance_select_{med.id}')
                 quantity = request.POST.get(f'advance_quantity_{med.id}')
                 if is_selected and quantity and int(quantity) > 0 and not med.is_available:
-                    # For advance orders, we need to find a pharmacy that can fulfill this order
-                    # First, try to find a pharmacy that has this medicine type
-                    pharmacy = None
-                    medicine_match = Medicine.objects.filter(
-                        name__icontains=med.medicine_name.split()[0]  # Match first word of medicine name
-                    ).first()
-
-                    if medicine_match:
-                        pharmacy = medicine_match.pharmacy
-                    else:
-                        # If no pharmacy found, get the first pharmacy with medicines
-                        pharmacy = Pharmacy.objects.filter(
-                            medicine__isnull=False
-                        ).distinct().first()
-
-                    if not pharmacy:
-                        # Last resort: get any pharmacy
-                        pharmacy = Pharmacy.objects.first()
-
-                    if pharmacy:
-                        # Create a temporary medicine entry for advance order
-                        from datetime import date, timedelta
-                        temp_medicine, created = Medicine.objects.get_or_create(
-                            name=med.medicine_name,
-                            pharmacy=pharmacy,
-                            defaults={
-                                'generic_name': med.medicine_name,
-                                'brand': 'Advance Order',
-                                'medicine_type': 'tablet',
-                                'strength': med.dosage or 'N/A',
-                                'price': 50.00,  # Default price for advance orders
-                                'quantity': 0,  # Out of stock
-                                'expiry_date': date.today() + timedelta(days=365),
-                                'batch_number': f'AO-{med.id}',
-                                'is_essential': False,
-                                'is_prescription_required': True,
-                            }
-                        )
+                    selected.append((med, int(quantity)))
 
-                        # Add to cart with advance order flag
-                        CartService.add_to_cart(request.user, temp_medicine.id, int(quantity), is_advance_order=True)
-                        advance_order_items.append({
-                            'medicine': temp_medicine,
-                            'quantity': int(quantity),
-                            'name': med.medicine_name,
-                            'dosage': med.dosage,
-                            'frequency': med.frequency,
-                            'pharmacy': pharmacy
-                        })
+            # Route every line to a pharmacy through the availability index and
+            # create the placeholder medicines in bulk
+            placeholders = AdvanceOrderRoutingService.placeholder_medicines([med for med, quantity in selected])
+            advance_order_items = []
+            for med, quantity in selected:
+                temp_medicine = placeholders.get(med.id)
+                if temp_medicine:
+                    advance_order_items.append({
+                        'medicine': temp_medicine,
+                        'quantity': quantity,
+                        'name': med.medicine_name,
+                        'dosage': med.dosage,
+                        'frequency': med.frequency,
+                        'pharmacy': temp_medicine.pharmacy
+                    })
 
             if advance_order_items:
+                # Add to cart with advance order flag, in one batch
+                CartService.apply_batch(request.user, [
+                    {'medicine_id': item['medicine'].id, 'quantity': item['quantity'],
+                     'action': 'add', 'is_advance_order': True}
+                    for item in advance_order_items
+                ], session=request.session)
                 messages.success(request, 'Advance order items added to cart. Please proceed to checkout to complete your payment.')
                 return redirect('orders:checkout')
             else:
@@ -197,15 +175,15 @@ def add_to_cart(request, medicine_id):
     if request.method == 'POST':
         try:
             quantity = int(request.POST.get('quantity', 1))
-            cart_item = CartService.add_to_cart(request.user, medicine_id, quantity)
+            cart_item = CartService.add_to_cart(request.user, medicine_id, quantity, session=request.session)
             
             # Get updated cart count
-            cart = CartService.get_or_create_cart(request.user)
+            summary = CartService.get_summary(request.user)
             
             return JsonResponse({
                 'success': True,
                 'message': 'Medicine added to cart',
-                'cart_count': cart.item_count
+                'cart_count': summary['item_count']
             })
             
         except ValueError as e:
@@ -226,13 +204,14 @@ def view_cart(request):
     """View shopping cart using the new Cart model"""
     try:
         cart = CartService.get_or_create_cart(request.user)
-        cart_items = cart.items.all()
+        cart_items = cart.items.select_related('medicine', 'medicine__pharmacy')
+        summary = CartService.get_summary(request.user)
         
         context = {
             'cart': cart,
             'cart_items': cart_items,
-            'total_amount': cart.total_amount,
-            'cart_count': cart.item_count
+            'total_amount': summary['subtotal'],
+            'cart_count': summary['item_count']
         }
         return render(request, 'orders/cart.html', context)
     except Exception as e:
@@ -245,15 +224,15 @@ def update_cart_item(request, medicine_id):
     if request.method == 'POST':
         try:
             quantity = int(request.POST.get('quantity', 0))
-            cart_item = CartService.update_cart_item(request.user, medicine_id, quantity)
+            cart_item = CartService.update_cart_item(request.user, medicine_id, quantity, session=request.session)
             
             # Get updated cart info
-            cart = CartService.get_or_create_cart(request.user)
+            summary = CartService.get_summary(request.user)
             
             return JsonResponse({
                 'success': True,
-                'cart_count': cart.item_count,
-                'total_amount': str(cart.total_amount)
+                'cart_count': summary['item_count'],
+                'total_amount': str(summary['subtotal'])
             })
         except ValueError as e:
             return JsonResponse({
@@ -268,14 +247,14 @@ def remove_from_cart(request, medicine_id):
     """Remove item from cart"""
     if request.method == 'POST':
         try:
-            success = CartService.remove_from_cart(request.user, medicine_id)
+            success = CartService.remove_from_cart(request.user, medicine_id, session=request.session)
 
             if success:
-                cart = CartService.get_or_create_cart(request.user)
+                summary = CartService.get_summary(request.user)
                 return JsonResponse({
                     'success': True,
-                    'cart_count': cart.item_count,
-                    'total_amount': str(cart.total_amount)
+                    'cart_count': summary['item_count'],
+                    'total_amount': str(summary['subtotal'])
                 })
             else:
                 return JsonResponse({
@@ -294,7 +273,7 @@ def remove_from_cart(request, medicine_id):
 def clear_cart(request):
     """Clear entire cart"""
     if request.method == 'POST':
-        success = CartService.clear_cart(request.user)
+        success = CartService.clear_cart(request.user, session=request.session)
         
         if success:
             return JsonResponse({
@@ -309,18 +288,56 @@ def clear_cart(request):
     
     return JsonResponse({'success': False, 'message': 'Invalid request'})
 
+@login_required
+def cart_batch(request):
+    """Apply many cart changes in one request.
+
+    Expects a JSON body ``{"lines": [{"medicine_id": 1, "quantity": 2,
+    "action": "add"|"set"|"remove", "is_advance_order": false}, ...]}``.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Invalid request'})
+
+    try:
+        payload = json.loads(request.body)
+        lines = [
+            {
+                'medicine_id': int(line['medicine_id']),
+                'quantity': int(line.get('quantity', 1)),
+                'action': line.get('action', 'add'),
+                **({'is_advance_order': bool(line['is_advance_order'])} if 'is_advance_order' in line else {}),
+            }
+            for line in payload['lines']
+        ]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'message': 'Invalid cart lines'}, status=400)
+    if len(lines) > CartService.MAX_BATCH_LINES:
+        return JsonResponse({'success': False, 'message': f'At most {CartService.MAX_BATCH_LINES} lines per request'}, status=400)
+
+    result = CartService.apply_batch(request.user, lines, session=request.session)
+    summary = CartService.get_summary(request.user)
+    return JsonResponse({
+        'success': bool(result['applied']) or not result['errors'],
+        'applied': result['applied'],
+        'errors': result['errors'],
+        'cart_count': summary['item_count'],
+        'total_amount': str(summary['subtotal'])
+    })
+
 @login_required
 def checkout(request):
     """Enhanced checkout process with delivery options including Cash on Delivery"""
     try:
         cart = CartService.get_or_create_cart(request.user)
+        # Fresh summary: totals shown at checkout must reflect current prices
+        summary = CartService.get_summary(request.user, fresh=True)
 
-        if cart.item_count == 0:
+        if summary['item_count'] == 0:
             messages.warning(request, 'Your cart is empty')
             return redirect('orders:view_cart')
 
         # Check if cart contains advance order items
-        has_advance_order_items = cart.items.filter(is_advance_order=True).exists()
+        has_advance_order_items = summary['has_advance_items']
 
         if request.method == 'POST':
             form = CheckoutForm(request.POST, initial={'user': request.user})
@@ -343,54 +360,63 @@ def checkout(request):
                     pharmacy = first_item.medicine.pharmacy
                     logger.info(f"Order assigned to pharmacy {pharmacy.name} (customer order from medicine)")
 
-                # Create order manually
-                order = Order()
-                order.user = request.user
-                order.pharmacy = pharmacy
-                order.status = 'pending'
-
-                # Set form fields
-                order.payment_method = form.cleaned_data.get('payment_method', 'cod')
-                order.delivery_method = form.cleaned_data['delivery_method']
-                order.delivery_address = form.cleaned_data.get('delivery_address', '')
-                order.notes = form.cleaned_data.get('notes', '')
-
-                # Mark as advance order if cart contains advance order items
-                if has_advance_order_items:
-                    order.is_advance_order = True
-                    order.advance_order_type = 'restock'
-
-                # Calculate delivery charges
-                from decimal import Decimal
-                if order.delivery_method == 'home_delivery':
-                    order.delivery_charges = Decimal('50.00')  # Fixed delivery charge
-                else:
-                    order.delivery_charges = Decimal('0.00')
+                with transaction.atomic():
+                    # Take the stock and create the order together: one conditional
+                    # update, so concurrent orders for the last units cannot oversell,
+                    # and a failure creating the order puts the stock back
+                    try:
+                        StockReservationService.commit_cart(request.user)
+                    except ValueError as e:
+                        messages.error(request, str(e))
+                        return redirect('orders:view_cart')
 
-                # Set default payment_status for COD orders
-                if order.payment_method == 'cod':
-                    order.payment_status = 'pending'
-                else:
-                    order.payment_status = 'paid'
+                    # Create order manually
+                    order = Order()
+                    order.user = request.user
+                    order.pharmacy = pharmacy
+                    order.status = 'pending'
+
+                    # Set form fields
+                    order.payment_method = form.cleaned_data.get('payment_method', 'cod')
+                    order.delivery_method = form.cleaned_data['delivery_method']
+                    order.delivery_address = form.cleaned_data.get('delivery_address', '')
+                    order.notes = form.cleaned_data.get('notes', '')
+
+                    # Mark as advance order if cart contains advance order items
+                    if has_advance_order_items:
+                        order.is_advance_order = True
+                        order.advance_order_type = 'restock'
+
+                    # Calculate delivery charges
+                    from decimal import Decimal
+                    if order.delivery_method == 'home_delivery':
+                        order.delivery_charges = Decimal('50.00')  # Fixed delivery charge
+                    else:
+                        order.delivery_charges = Decimal('0.00')
 
-                order.save()
+                    # Set default payment_status for COD orders
+                    if order.payment_method == 'cod':
+                        order.payment_status = 'pending'
+                    else:
+                        order.payment_status = 'paid'
 
-                # Create order items
-                for cart_item in cart.items.all():
-                    OrderItem.objects.create(
-                        order=order,
-                        medicine=cart_item.medicine,
-                        quantity=cart_item.quantity,
-                        price=cart_item.medicine.price
-                    )
+                    order.save()
 
-                    # Only update medicine stock for non-advance order items
-                    if not cart_item.is_advance_order:
-                        cart_item.medicine.quantity -= cart_item.quantity
-                        cart_item.medicine.save()
+                    # Create order items
+                    for cart_item in cart.items.select_related('medicine'):
+                        OrderItem.objects.create(
+                            order=order,
+                            medicine=cart_item.medicine,
+                            quantity=cart_item.quantity,
+                            price=cart_item.medicine.price
+                        )
 
-                # Calculate totals after items are created
-                order.calculate_totals()
+                    # Calculate totals after items are created
+                    order.calculate_totals()
+                OrderStatsService.record_order_placed(order)
+                OrderEventService.record_order_placed(order)
+                OrderSearchService.index_order(order)
+                BillPDFService.schedule(order.id)
 
                 # Create AdvanceOrder record if this is an advance order
                 if has_advance_order_items:
@@ -400,6 +426,8 @@ def checkout(request):
                         order_type='restock',
                         status='pending'
                     )
+                    OrderStatsService.record_advance_order_placed(advance_order)
+                    OrderEventService.record_advance_order_placed(advance_order)
 
                     # Create AdvanceOrderItems for advance order items
                     for cart_item in cart.items.filter(is_advance_order=True):
@@ -411,6 +439,7 @@ def checkout(request):
                             quantity_requested=cart_item.quantity,
                             estimated_price=cart_item.medicine.price * cart_item.quantity
                         )
+                    OrderSearchService.index_advance_order(advance_order)
 
                     # Send advance order notification email to pharmacist
                     from notifications.services import NotificationService as NotifyService
@@ -432,7 +461,7 @@ def checkout(request):
                         logger.error(f"Failed to send verification code email to customer for advance order {advance_order.id}")
 
                 # Clear cart
-                CartService.clear_cart(request.user)
+                CartService.clear_cart(request.user, session=request.session)
 
                 # Send order confirmation emails synchronously (fallback)
                 try:
@@ -463,8 +492,8 @@ def checkout(request):
 
         context = {
             'cart': cart,
-            'cart_items': cart.items.all(),
-            'total_amount': cart.total_amount,
+            'cart_items': cart.items.select_related('medicine'),
+            'total_amount': summary['subtotal'],
             'form': form,
             'has_advance_order_items': has_advance_order_items
         }
@@ -480,7 +509,9 @@ def checkout(request):
 @login_required
 def order_detail(request, order_id):
     """Enhanced order detail view"""
-    order = get_object_or_404(Order, id=order_id)
+    order = OrderArchiveService.get_order(order_id)
+    if order is None:
+        raise Http404('Order not found')
 
     # Check if user owns the order or is the pharmacy owner
     # Get pharmacy from user.pharmacy or user.owned_pharmacy
@@ -501,7 +532,8 @@ def order_detail(request, order_id):
 @login_required
 def my_orders(request):
     """User's order history"""
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
+    # Includes orders already moved to the archive tables
+    orders = OrderArchiveService.get_user_orders(request.user)
     return render(request, 'orders/my_orders.html', {'orders': orders})
 
 @login_required
@@ -526,22 +558,6 @@ def pharmacy_orders(request):
         if status_filter in ['pending', 'confirmed', 'completed']:
             filtered_advance_orders = filtered_advance_orders.filter(status=status_filter)
 
-    # Search functionality
-    search_query = request.GET.get('search')
-    if search_query:
-        filtered_orders = filtered_orders.filter(
-            Q(user__first_name__icontains=search_query) |
-            Q(user__last_name__icontains=search_query) |
-            Q(id__icontains=search_query) |
-            Q(items__medicine__name__icontains=search_query)
-        ).distinct()
-        filtered_advance_orders = filtered_advance_orders.filter(
-            Q(user__first_name__icontains=search_query) |
-            Q(user__last_name__icontains=search_query) |
-            Q(id__icontains=search_query) |
-            Q(items__medicine_name__icontains=search_query)
-        ).distinct()
-
     # Date range filter
     date_from = request.GET.get('date_from')
     date_to = request.GET.get('date_to')
@@ -552,11 +568,42 @@ def pharmacy_orders(request):
         filtered_orders = filtered_orders.filter(created_at__date__lte=date_to)
         filtered_advance_orders = filtered_advance_orders.filter(created_at__date__lte=date_to)
 
+    # Search uses the ranked token index; only the requested page of hits is loaded
+    search_query = request.GET.get('search', '').strip()
+    search_page = None
+    archived_orders = ArchivedOrder.objects.none()
+    if search_query:
+        from django.core.paginator import Paginator
+
+        # Archived orders are searchable too; they keep their regular order id
+        archived_orders = ArchivedOrder.objects.filter(pharmacy=pharmacy).select_related('user', 'pharmacy')
+        if status_filter:
+            archived_orders = archived_orders.filter(status=status_filter)
+        if date_from:
+            archived_orders = archived_orders.filter(created_at__date__gte=date_from)
+        if date_to:
+            archived_orders = archived_orders.filter(created_at__date__lte=date_to)
+
+        ranked_keys = OrderSearchService.search(pharmacy, search_query)
+        if status_filter or date_from or date_to:
+            # Drop hits excluded by the status/date filters (id-only queries)
+            allowed = {('regular', order_id) for order_id in filtered_orders.values_list('id', flat=True)}
+            allowed.update(('regular', order_id) for order_id in archived_orders.values_list('id', flat=True))
+            allowed.update(('advance', order_id) for order_id in filtered_advance_orders.values_list('id', flat=True))
+            ranked_keys = [key for key in ranked_keys if key in allowed]
+        search_page = Paginator(ranked_keys, 25).get_page(request.GET.get('page'))
+        page_order_ids = [order_id for order_type, order_id in search_page if order_type == 'regular']
+        filtered_orders = filtered_orders.filter(id__in=page_order_ids)
+        archived_orders = archived_orders.filter(id__in=page_order_ids).prefetch_related('items')
+        filtered_advance_orders = filtered_advance_orders.filter(
+            id__in=[order_id for order_type, order_id in search_page if order_type == 'advance']
+        )
+
     # Create a unified list for template rendering
     combined_orders = []
 
-    # Add regular orders
-    for order in filtered_orders:
+    # Add regular orders, plus archived ones found by the search
+    for order in list(filtered_orders) + list(archived_orders):
         order_dict = {
             'id': order.id,
             'user': order.user,
@@ -587,24 +634,68 @@ def pharmacy_orders(request):
         }
         combined_orders.append(advance_order_dict)
 
-    # Sort combined orders by creation date (newest first)
-    combined_orders.sort(key=lambda o: o['created_at'], reverse=True)
+    if search_page is not None:
+        # Keep the relevance order of the search hits
+        rank = {key: position for position, key in enumerate(search_page)}
+        combined_orders.sort(key=lambda o: rank[(o['order_type'], o['id'])])
+    else:
+        # Sort combined orders by creation date (newest first)
+        combined_orders.sort(key=lambda o: o['created_at'], reverse=True)
 
     context = {
         'orders': filtered_orders,
         'advance_orders': filtered_advance_orders,
         'combined_orders': combined_orders,
         'pharmacy': pharmacy,
-        'pending_count': all_orders.filter(status='pending').count() + all_advance_orders.filter(status='pending').count(),
-        'confirmed_count': all_orders.filter(status='confirmed').count() + all_advance_orders.filter(status='confirmed').count(),
-        'ready_count': all_orders.filter(status='ready').count(),
-        'delivered_count': all_orders.filter(status='delivered').count(),
-        'completed_count': all_orders.filter(status='completed').count() + all_advance_orders.filter(status='completed').count(),
-        'total_orders': all_orders.count() + all_advance_orders.count(),
-        'total_revenue': all_orders.filter(status__in=['delivered', 'completed']).aggregate(Sum('total_amount'))['total_amount__sum'] or 0,
+        'search_query': search_query,
+        'search_page': search_page,
     }
+    # Badge counts come from the denormalized stats row (one primary-key lookup)
+    context.update(OrderStatsService.get_stats(pharmacy).as_badges())
     return render(request, 'orders/pharmacy_orders.html', context)
 
+@login_required
+def export_orders(request):
+    """Stream the pharmacy's orders, including archived ones, as CSV"""
+    import csv
+    from django.http import StreamingHttpResponse
+
+    # Get pharmacy from user.pharmacy or user.owned_pharmacy
+    pharmacy = getattr(request.user, 'pharmacy', None) or getattr(request.user, 'owned_pharmacy', None)
+    if pharmacy is None:
+        messages.error(request, 'Access denied.')
+        return redirect('core:dashboard')
+
+    class Echo:
+        def write(self, value):
+            return value
+
+    writer = csv.writer(Echo())
+    orders = OrderArchiveService.iter_pharmacy_orders(
+        pharmacy,
+        status=request.GET.get('status'),
+        date_from=request.GET.get('date_from'),
+        date_to=request.GET.get('date_to'),
+    )
+
+    def rows():
+        yield writer.writerow(['Order ID', 'Customer', 'Items', 'Total Amount', 'Status', 'Order Date', 'Archived'])
+        for order in orders:
+            items = '; '.join(f"{item.medicine.name} x{item.quantity}" for item in order.items.all())
+            yield writer.writerow([
+                order.id,
+                f"{order.user.first_name} {order.user.last_name}",
+                items,
+                order.total_amount,
+                order.get_status_display(),
+                order.created_at.strftime('%Y-%m-%d %H:%M'),
+                'yes' if getattr(order, 'is_archived', False) else 'no',
+            ])
+
+    response = StreamingHttpResponse(rows(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="pharmacy_orders_{timezone.now().strftime("%Y%m%d")}.csv"'
+    return response
+
 @login_required
 def update_order_status(request, order_id):
     """Update order status"""
@@ -665,6 +756,8 @@ def update_order_status(request, order_id):
             old_status = order.status
             order.status = new_status
             order.save()
+            OrderStatsService.record_status_change(order, old_status)
+            OrderEventService.record_status_change(order, old_status)
             logger.info(f"Order {order.id} status updated from {old_status} to {new_status}")
 
             # Send email notification for status update to customer
@@ -726,6 +819,8 @@ def update_advance_order_status(request, order_id):
             old_status = advance_order.status
             advance_order.status = new_status
             advance_order.save()
+            OrderStatsService.record_advance_status_change(advance_order, old_status)
+            OrderEventService.record_advance_status_change(advance_order, old_status)
 
             # Send email notification for status update
             if NotificationService.send_advance_order_status_notification(advance_order):
@@ -745,6 +840,64 @@ def update_advance_order_status(request, order_id):
 
     return redirect('orders:advance_order_detail', order_id=advance_order.id)
 
+@login_required
+def supplier_orders(request):
+    """Consolidated supplier purchase orders built from open advance-order items"""
+    # Get pharmacy from user.pharmacy or user.owned_pharmacy
+    pharmacy = getattr(request.user, 'pharmacy', None) or getattr(request.user, 'owned_pharmacy', None)
+    if pharmacy is None:
+        messages.error(request, 'Access denied.')
+        return redirect('core:dashboard')
+
+    if request.method == 'POST':
+        # Batch now instead of waiting for the scheduled run
+        batched = SupplierBatchService.build_batches(pharmacy.id)
+        messages.success(request, f'{batched} advance order items added to the draft purchase order.')
+        return redirect('orders:supplier_orders')
+
+    purchase_orders = SupplierPurchaseOrder.objects.filter(pharmacy=pharmacy).annotate(
+        advance_order_count=Count('lines__advance_items__advance_order', distinct=True)
+    ).prefetch_related('lines').order_by('-created_at')[:50]
+    context = {
+        'purchase_orders': purchase_orders,
+        'status_choices': SupplierPurchaseOrder.STATUS_CHOICES,
+    }
+    return render(request, 'orders/supplier_orders.html', context)
+
+@login_required
+def update_supplier_order_status(request, purchase_order_id):
+    """Update a supplier purchase order and fan the status out to its advance orders"""
+    # Get pharmacy from user.pharmacy or user.owned_pharmacy
+    pharmacy = getattr(request.user, 'pharmacy', None) or getattr(request.user, 'owned_pharmacy', None)
+    if pharmacy is None:
+        messages.error(request, 'Access denied.')
+        return redirect('core:dashboard')
+
+    purchase_order = get_object_or_404(SupplierPurchaseOrder, id=purchase_order_id, pharmacy=pharmacy)
+
+    if request.method == 'POST':
+        new_status = request.POST.get('status')
+        if new_status in dict(SupplierPurchaseOrder.STATUS_CHOICES):
+            purchase_order.supplier_name = request.POST.get('supplier_name', purchase_order.supplier_name).strip()
+            purchase_order.supplier_contact = request.POST.get('supplier_contact', purchase_order.supplier_contact).strip()
+            purchase_order.save(update_fields=['supplier_name', 'supplier_contact', 'updated_at'])
+            updated = SupplierBatchService.update_status(purchase_order, new_status)
+            message = f'Purchase order #{purchase_order.id} is now {purchase_order.get_status_display()}; {updated} advance orders updated'
+
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                return JsonResponse({
+                    'success': True,
+                    'message': message,
+                    'new_status': new_status,
+                    'status_display': purchase_order.get_status_display(),
+                    'advance_orders_updated': updated
+                })
+            messages.success(request, message)
+        else:
+            messages.error(request, 'Invalid status.')
+
+    return redirect('orders:supplier_orders')
+
 @login_required
 def get_orders_data(request):
     """AJAX endpoint to get orders data for real-time updates"""
@@ -752,17 +905,15 @@ def get_orders_data(request):
     pharmacy = getattr(request.user, 'pharmacy', None) or getattr(request.user, 'owned_pharmacy', None)
     if pharmacy is None:
         return JsonResponse({'success': False, 'message': 'Access denied'})
-    orders = Order.objects.filter(pharmacy=pharmacy).order_by('-created_at')
-
-    # Log recent orders information
-    logger.info(f"Pharmacy {pharmacy.name} (ID: {pharmacy.id}): Fetched {len(orders)} total orders for AJAX data")
+    order_stats = OrderStatsService.get_stats(pharmacy).as_order_stats()
 
     # Get recent orders for dashboard
-    recent_orders = orders[:10]
+    recent_orders = Order.objects.filter(pharmacy=pharmacy).order_by('-created_at').select_related('user').annotate(
+        items_count=Count('items')
+    )[:10]
 
     orders_data = []
     for order in recent_orders:
-        logger.info(f"AJAX order ID {order.id}: User {order.user.username}, Status {order.status}, Amount {order.total_amount}")
         orders_data.append({
             'id': order.id,
             'customer_name': f"{order.user.first_name} {order.user.last_name}",
@@ -770,29 +921,12 @@ def get_orders_data(request):
             'status_display': order.get_status_display(),
             'total_amount': str(order.total_amount),
             'created_at': order.created_at.strftime('%Y-%m-%d %H:%M'),
-            'items_count': order.items.count(),
+            'items_count': order.items_count,
         })
 
-    # Get statistics
-    pending_count = orders.filter(status='pending').count()
-    confirmed_count = orders.filter(status='confirmed').count()
-    ready_count = orders.filter(status='ready').count()
-    delivered_count = orders.filter(status='delivered').count()
-    completed_count = orders.filter(status='completed').count()
-    total_orders = orders.count()
-    total_revenue = orders.filter(status__in=['delivered', 'completed']).aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-
-    logger.info(f"Pharmacy {pharmacy.name} (ID: {pharmacy.id}): Stats - Pending: {pending_count}, Confirmed: {confirmed_count}, Ready: {ready_count}, Delivered: {delivered_count}, Completed: {completed_count}, Total: {total_orders}, Revenue: {total_revenue}")
-
-    stats = {
-        'pending_count': pending_count,
-        'confirmed_count': confirmed_count,
-        'ready_count': ready_count,
-        'delivered_count': delivered_count,
-        'completed_count': completed_count,
-        'total_orders': total_orders,
-        'total_revenue': str(total_revenue),
-    }
+    logger.info(f"Pharmacy {pharmacy.name} (ID: {pharmacy.id}): Stats - {order_stats}")
+
+    stats = dict(order_stats, total_revenue=str(order_stats['total_revenue']))
 
     return JsonResponse({
         'success': True,
@@ -800,6 +934,26 @@ def get_orders_data(request):
         'stats': stats
     })
 
+@login_required
+def get_order_changes(request):
+    """Incremental sync endpoint: order events after the given cursor.
+
+    Pharmacists receive events for their pharmacy, customers for their own
+    orders. Clients store ``next_cursor`` and pass it back as ``cursor``.
+    """
+    try:
+        cursor = int(request.GET.get('cursor', 0))
+        limit = int(request.GET.get('limit', OrderEventService.DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'cursor and limit must be integers'}, status=400)
+    if cursor < 0 or limit < 1:
+        return JsonResponse({'success': False, 'message': 'cursor and limit must be positive'}, status=400)
+
+    # Get pharmacy from user.pharmacy or user.owned_pharmacy
+    pharmacy = getattr(request.user, 'pharmacy', None) or getattr(request.user, 'owned_pharmacy', None)
+    changes = OrderEventService.get_changes(cursor, limit, pharmacy=pharmacy, user=request.user)
+    return JsonResponse({'success': True, **changes})
+
 @login_required
 def get_pharmacy_dashboard_data(request):
     """AJAX endpoint to get pharmacy dashboard data for real-time updates"""
@@ -807,16 +961,17 @@ def get_pharmacy_dashboard_data(request):
     pharmacy = getattr(request.user, 'pharmacy', None) or getattr(request.user, 'owned_pharmacy', None)
     if pharmacy is None:
         return JsonResponse({'success': False, 'message': 'Access denied'})
-    from django.db.models import Sum
+    from django.db.models import F, Sum
     medicines = Medicine.objects.filter(pharmacy=pharmacy)
 
     # Calculate dashboard statistics
     total_medicines = medicines.count()
     total_quantity = medicines.aggregate(total=Sum('quantity'))['total'] or 0
-    low_stock_count = medicines.filter(quantity__lt=10, quantity__gt=0).count()
-    in_stock_count = medicines.filter(quantity__gte=10).count()
-    pending_orders = Order.objects.filter(pharmacy=pharmacy, status='pending').count()
-    pending_advance_orders = AdvanceOrder.objects.filter(pharmacy=pharmacy, status='pending').count()
+    low_stock_count = medicines.filter(quantity__gt=0, quantity__lte=F('reorder_point')).count()
+    in_stock_count = medicines.filter(quantity__gt=F('reorder_point')).count()
+    order_stats = OrderStatsService.get_stats(pharmacy)
+    pending_orders = order_stats.pending_count
+    pending_advance_orders = order_stats.advance_pending_count
 
     logger.info(f"Pharmacy {pharmacy.name} (ID: {pharmacy.id}): Dashboard stats - Medicines: {total_medicines}, Total Qty: {total_quantity}, In Stock: {in_stock_count}, Low Stock: {low_stock_count}, Pending Orders: {pending_orders}, Pending Advance Orders: {pending_advance_orders}")
 
@@ -867,10 +1022,6 @@ def advance_orders(request):
 @login_required
 def create_advance_order(request):
     """Create advance order for low stock or out of stock medicines by adding to cart and redirecting to checkout"""
-    # Get all medicines that are low stock or out of stock from all pharmacies
-    low_stock_medicines = Medicine.objects.filter(quantity__lt=10, quantity__gt=0)
-    out_of_stock_medicines = Medicine.objects.filter(quantity=0)
-
     if request.method == 'POST':
         selected_meds = request.POST.getlist('medicines')
 
@@ -881,28 +1032,58 @@ def create_advance_order(request):
         # Clear existing cart or get cart
         from .services import CartService
         cart = CartService.get_or_create_cart(request.user)
-        CartService.clear_cart(request.user)
+        CartService.clear_cart(request.user, session=request.session)
 
-        # Add selected medicines to cart with advance order flag
+        # Add selected medicines to cart with advance order flag; unknown ids are skipped
+        lines = []
         for med_id in selected_meds:
-            try:
-                med = Medicine.objects.get(id=med_id)
-                qty_str = request.POST.get(f'quantity_{med_id}', '1')
-                qty_int = int(qty_str) if qty_str.isdigit() else 1
-                if qty_int > 0:
-                    CartService.add_to_cart(request.user, med.id, qty_int, is_advance_order=True)
-            except Medicine.DoesNotExist:
+            if not med_id.isdigit():
                 continue
+            qty_str = request.POST.get(f'quantity_{med_id}', '1')
+            qty_int = int(qty_str) if qty_str.isdigit() else 1
+            if qty_int > 0:
+                lines.append({'medicine_id': int(med_id), 'quantity': qty_int, 'action': 'add', 'is_advance_order': True})
+        CartService.apply_batch(request.user, lines, session=request.session)
 
         messages.success(request, 'Selected medicines added to cart. Please proceed to checkout to complete your advance order.')
         return redirect('orders:checkout')
 
+    # The medicine lists are loaded page by page from advance_catalog
     context = {
-        'low_stock_medicines': low_stock_medicines,
-        'out_of_stock_medicines': out_of_stock_medicines,
+        'pharmacies': Pharmacy.objects.order_by('name').only('id', 'name'),
+        'page_size': MedicineCatalogService.DEFAULT_PAGE_SIZE,
     }
     return render(request, 'orders/create_advance_order.html', context)
 
+@login_required
+def advance_catalog(request):
+    """Keyset-paginated JSON catalog of low / out of stock medicines for advance ordering.
+
+    Filters: ``stock`` (low|out), ``pharmacy``, ``generic`` and ``q``.
+    Clients pass the returned ``next_cursor`` back as ``cursor``.
+    """
+    stock = request.GET.get('stock', 'low')
+    if stock not in ('low', 'out'):
+        return JsonResponse({'success': False, 'message': 'stock must be low or out'}, status=400)
+    try:
+        cursor = int(request.GET.get('cursor', 0))
+        limit = int(request.GET.get('limit', MedicineCatalogService.DEFAULT_PAGE_SIZE))
+        pharmacy_id = int(request.GET['pharmacy']) if request.GET.get('pharmacy') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'cursor, limit and pharmacy must be integers'}, status=400)
+    if cursor < 0 or limit < 1:
+        return JsonResponse({'success': False, 'message': 'cursor and limit must be positive'}, status=400)
+
+    page = MedicineCatalogService.advance_catalog(
+        stock=stock,
+        pharmacy_id=pharmacy_id,
+        generic_name=request.GET.get('generic', '').strip(),
+        query=request.GET.get('q', '').strip(),
+        cursor=cursor,
+        limit=limit,
+    )
+    return JsonResponse({'success': True, **page})
+
 @login_required
 def advance_order_detail(request, order_id):
     """View advance order details"""
@@ -920,7 +1101,9 @@ def advance_order_detail(request, order_id):
 @login_required
 def order_bill(request, order_id):
     """Generate bill for order"""
-    order = get_object_or_404(Order, id=order_id)
+    order = OrderArchiveService.get_order(order_id)
+    if order is None:
+        raise Http404('Order not found')
 
     # Check if user owns the order or is the pharmacy owner
     # Get pharmacy from user.pharmacy or user.owned_pharmacy
@@ -941,6 +1124,40 @@ def order_bill(request, order_id):
 
     return render(request, 'orders/order_bill.html', context)
 
+@login_required
+def order_bill_pdf(request, order_id):
+    """Download the order bill as PDF, served from the content-addressed cache"""
+    from django.core.files.storage import default_storage
+    from django.http import FileResponse
+
+    order = OrderArchiveService.get_order(order_id)
+    if order is None:
+        raise Http404('Order not found')
+
+    # Check if user owns the order or is the pharmacy owner
+    # Get pharmacy from user.pharmacy or user.owned_pharmacy
+    pharmacy = getattr(request.user, 'pharmacy', None) or getattr(request.user, 'owned_pharmacy', None)
+    if order.user != request.user and (pharmacy is None or order.pharmacy != pharmacy):
+        messages.error(request, 'Access denied.')
+        return redirect('core:dashboard')
+
+    path = BillPDFService.get_cached_path(order)
+    if path is None:
+        # Not pre-rendered yet (or the bill changed); render it now
+        try:
+            path = BillPDFService.render(order)
+        except Exception as e:
+            logger.error(f"Failed to render bill PDF for order {order.id}: {str(e)}")
+            messages.error(request, 'Could not generate the PDF bill. Please try again.')
+            return redirect('orders:order_bill', order_id=order.id)
+
+    return FileResponse(
+        default_storage.open(path, 'rb'),
+        as_attachment=True,
+        filename=f"bill_order_{order.id}.pdf",
+        content_type='application/pdf',
+    )
+
 @login_required
 def generate_bill(request, prescription_id):
     """Generate bill for prescription medicines"""
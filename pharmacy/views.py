@@ -4,11 +4,13 @@ from django.contrib.auth import login
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
+from django.db.models import F
 from .forms import PharmacyRegistrationForm
 from .models import Pharmacy
 from users.models import User
 from medicines.models import Medicine
 from orders.models import Order, AdvanceOrder
+from orders.services import OrderStatsService
 
 logger = logging.getLogger(__name__)
 
@@ -60,11 +62,12 @@ def pharmacy_dashboard(request):
         medicines = Medicine.objects.filter(pharmacy=pharmacy)
         total_medicines = medicines.count()  # Number of medicine types
         total_quantity = medicines.aggregate(total=Sum('quantity'))['total'] or 0  # Sum of all quantities
-        low_stock_count = medicines.filter(quantity__lt=10, quantity__gt=0).count()
-        in_stock_count = medicines.filter(quantity__gte=10).count()
+        low_stock_count = medicines.filter(quantity__gt=0, quantity__lte=F('reorder_point')).count()
+        in_stock_count = medicines.filter(quantity__gt=F('reorder_point')).count()
         out_of_stock_count = medicines.filter(quantity=0).count()
-        pending_orders = Order.objects.filter(pharmacy=pharmacy, status='pending').count()
-        pending_advance_orders = AdvanceOrder.objects.filter(pharmacy=pharmacy, status='pending').count()
+        order_stats = OrderStatsService.get_stats(pharmacy)
+        pending_orders = order_stats.pending_count
+        pending_advance_orders = order_stats.advance_pending_count
         recent_orders = Order.objects.filter(pharmacy=pharmacy).order_by('-created_at').select_related('user')[:10]
         recent_advance_orders = AdvanceOrder.objects.filter(pharmacy=pharmacy).order_by('-created_at').select_related('user')[:10]
 
@@ -113,9 +116,9 @@ def manage_inventory(request):
         in_stock_count, out_of_stock_count, low_stock_count = cached_counts
     else:
         medicines_queryset = Medicine.objects.filter(pharmacy=pharmacy)
-        in_stock_count = medicines_queryset.filter(quantity__gte=10).count()
+        in_stock_count = medicines_queryset.filter(quantity__gt=F('reorder_point')).count()
         out_of_stock_count = medicines_queryset.filter(quantity=0).count()
-        low_stock_count = medicines_queryset.filter(quantity__lt=10, quantity__gt=0).count()
+        low_stock_count = medicines_queryset.filter(quantity__gt=0, quantity__lte=F('reorder_point')).count()
         cache.set(counts_cache_key, (in_stock_count, out_of_stock_count, low_stock_count), 600)
 
     # Paginate medicines for better performance
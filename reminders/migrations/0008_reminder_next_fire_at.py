@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0007_remove_send_sms'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reminder',
+            name='next_fire_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0008_reminder_next_fire_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DispatchLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('holder', models.CharField(max_length=200)),
+                ('expires_at', models.DateTimeField()),
+                ('acquired_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(fields=['updated_at'], name='reminders_r_updated_e81b10_idx'),
+        ),
+    ]
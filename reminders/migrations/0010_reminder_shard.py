@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:44
+
+from django.db import migrations, models
+from django.db.models.functions import Mod
+
+
+def assign_shards(apps, schema_editor):
+    Reminder = apps.get_model('reminders', 'Reminder')
+    Reminder.objects.update(shard=Mod('user_id', 64))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0009_dispatchlease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reminder',
+            name='shard',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(assign_shards, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(fields=['shard', 'next_fire_at'], name='reminders_r_shard_70516d_idx'),
+        ),
+    ]
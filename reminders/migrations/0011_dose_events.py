@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reminders', '0010_reminder_shard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAdherence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('scheduled', models.PositiveIntegerField(default=0)),
+                ('taken', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_adherence', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DoseEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scheduled_at', models.DateTimeField()),
+                ('taken_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('due', 'Due'), ('taken', 'Taken'), ('untaken', 'Marked not taken')], max_length=10)),
+                ('reminder', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dose_events', to='reminders.reminder')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dose_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['reminder', 'scheduled_at'], name='reminders_d_reminde_c82d2f_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyadherence',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='unique_daily_adherence'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from medicines.models import Medicine
+from django.utils import timezone
 from datetime import datetime, time, timedelta
 
 User = get_user_model()
@@ -33,12 +34,80 @@ class Reminder(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     taken = models.BooleanField(default=False)
     taken_at = models.DateTimeField(null=True, blank=True)
+    # When the reminder is next due; NULL while inactive. Kept by save() and
+    # advanced by ReminderDispatchService after each dispatch.
+    next_fire_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Dispatch partition, a fixed hash of the user; see ReminderDispatchService.shard_buckets
+    shard = models.PositiveSmallIntegerField(default=0)
+
+    # Fields that decide when the reminder fires
+    SCHEDULE_FIELDS = ('is_active', 'time_slot', 'specific_time')
+    # Fixed number of hash buckets; dispatch shards are unions of buckets, so
+    # the number of dispatch workers can change without rewriting rows
+    SHARD_BUCKETS = 64
+    # How far from a dose a taken/untaken mark still counts for that dose;
+    # half a day makes a mark count for the nearest dose
+    DOSE_WINDOW = timedelta(hours=12)
     
     def __str__(self):
         return f"{self.medicine_name} - {self.get_time_slot_display()} ({self.user.first_name})"
     
     class Meta:
         ordering = ['time_slot', 'specific_time']
+        indexes = [
+            # Incremental refresh of the scheduler daemon polls recent changes
+            models.Index(fields=['updated_at']),
+            # Each dispatch shard claims its due reminders by range
+            models.Index(fields=['shard', 'next_fire_at']),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_schedule = instance._schedule()
+        instance._loaded_fire_at = instance.next_fire_at
+        return instance
+
+    def _schedule(self):
+        return tuple(getattr(self, field, None) for field in self.SCHEDULE_FIELDS)
+
+    def save(self, *args, **kwargs):
+        self.shard = self.user_id % self.SHARD_BUCKETS
+        # Reschedule when the reminder is created, (de)activated or retimed
+        if not self.is_active:
+            self.next_fire_at = None
+        elif self.next_fire_at is None or getattr(self, '_loaded_schedule', None) != self._schedule():
+            self.next_fire_at = self.next_fire_after(timezone.now())
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'next_fire_at' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['next_fire_at']
+        super().save(*args, **kwargs)
+        self._loaded_schedule = self._schedule()
+        self._loaded_fire_at = self.next_fire_at
+
+    def last_fire_before(self, moment):
+        """Latest time at or before ``moment`` at which the reminder was due"""
+        local = timezone.localtime(moment)
+        fire_at = timezone.make_aware(datetime.combine(local.date(), self.notification_time))
+        if fire_at > moment:
+            fire_at = timezone.make_aware(datetime.combine(local.date() - timedelta(days=1), self.notification_time))
+        return fire_at
+
+    def dose_for(self, moment):
+        """The dose a mark made at ``moment`` belongs to: the latest one while
+        ``moment`` is within ``DOSE_WINDOW`` of it, otherwise the next one"""
+        fire_at = self.last_fire_before(moment)
+        if moment - fire_at <= self.DOSE_WINDOW:
+            return fire_at
+        return self.next_fire_after(moment)
+
+    def next_fire_after(self, moment):
+        """First time strictly after ``moment`` at which the reminder is due"""
+        local = timezone.localtime(moment)
+        fire_at = timezone.make_aware(datetime.combine(local.date(), self.notification_time))
+        if fire_at <= moment:
+            fire_at = timezone.make_aware(datetime.combine(local.date() + timedelta(days=1), self.notification_time))
+        return fire_at
     
     @property
     def notification_time(self):
@@ -58,10 +127,72 @@ class Reminder(models.Model):
             return time(hour, minute)
     
     def toggle_taken_status(self):
-        """Toggle the taken status of the reminder"""
+        """Toggle the taken status of the current dose and log it as a dose event"""
+        from .services import AdherenceService
+
         self.taken = not self.taken
         if self.taken:
-            self.taken_at = datetime.now()
+            self.taken_at = timezone.now()
         else:
             self.taken_at = None
         self.save()
+        AdherenceService.record_taken(self, self.taken)
+
+
+class DispatchLease(models.Model):
+    """A named, expiring lock held by one scheduler process at a time.
+
+    The holder renews it well before ``expires_at``; once it lapses any
+    other process may take it over. Managed by ``DispatchLeaseService``.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    holder = models.CharField(max_length=200)
+    expires_at = models.DateTimeField()
+    acquired_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} held by {self.holder} until {self.expires_at}"
+
+
+class DoseEvent(models.Model):
+    """Append-only log of medicine doses.
+
+    A 'due' row is written (in bulk) for every dose a reminder dispatch
+    sends, and a 'taken' or 'untaken' row each time the user marks the dose.
+    Rows are never updated; ``DailyAdherence`` holds the running totals.
+    """
+    STATUS_CHOICES = [
+        ('due', 'Due'),
+        ('taken', 'Taken'),
+        ('untaken', 'Marked not taken'),
+    ]
+
+    reminder = models.ForeignKey(Reminder, on_delete=models.CASCADE, related_name='dose_events')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='dose_events')
+    scheduled_at = models.DateTimeField()
+    taken_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['reminder', 'scheduled_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.reminder_id} {self.status} for {self.scheduled_at}"
+
+
+class DailyAdherence(models.Model):
+    """Doses due and taken per user and (local) day, kept incrementally by AdherenceService"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_adherence')
+    date = models.DateField()
+    scheduled = models.PositiveIntegerField(default=0)
+    taken = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_daily_adherence'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} on {self.date}: {self.taken}/{self.scheduled}"
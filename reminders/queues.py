@@ -0,0 +1,233 @@
+import heapq
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from django.conf import settings
+from .models import Reminder
+
+
+class DueQueue(ABC):
+    """Reminder ids ordered by fire time, popped by range when they fall due.
+
+    Entries are kept per ``Reminder.shard`` bucket so a dispatch shard pops
+    only its own buckets. Popped ids are re-checked against the database by
+    the dispatcher, so a stale entry never sends a wrong email.
+    """
+
+    @abstractmethod
+    def pop_due(self, now, buckets=None, limit=500):
+        """Return up to ``limit`` reminder ids due at ``now``, earliest first per bucket"""
+
+    @abstractmethod
+    def sync(self, now, buckets=None):
+        """Bring the queue up to date before a dispatch pops from it.
+
+        Returns a dict of reminder id -> the fire time given to unscheduled
+        reminders, or None when the queue needed no sync.
+        """
+
+
+class MirroredDueQueue(DueQueue):
+    """Due-queue holding a copy of ``Reminder.next_fire_at`` of active reminders.
+
+    Popping removes the entries. Writes update the copy once they commit,
+    and it is rebuilt from the database every ``RESYNC_SECONDS`` (and on
+    first use) to repair anything missed.
+    """
+
+    RESYNC_SECONDS = 60 * 60
+
+    @abstractmethod
+    def update(self, entries):
+        """Apply (reminder id, bucket, fire time) entries; a fire time of None removes the reminder"""
+
+    @abstractmethod
+    def replace(self, entries):
+        """Replace the whole queue with (reminder id, bucket, fire time) entries"""
+
+    @abstractmethod
+    def claim_resync(self):
+        """True when the caller should rebuild the queue now; the next caller then gets False"""
+
+    @abstractmethod
+    def invalidate(self):
+        """Have the next dispatch rebuild the queue, e.g. after raw ``next_fire_at`` updates"""
+
+    def sync(self, now, buckets=None):
+        from .services import ReminderDispatchService
+
+        if not self.claim_resync():
+            return None
+        return ReminderDispatchService.resync_due_queue(now)
+
+
+class LocalDueQueue(MirroredDueQueue):
+    """In-process due-queue: one min-heap per bucket, for tests and single-node setups.
+
+    Superseded heap entries are skipped lazily through ``fire_times``, the
+    current (bucket, fire time) of each queued reminder. Other processes
+    writing reminders do not reach this queue; the resync and, in the
+    scheduler daemon, the change feed bring it up to date.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.heaps = defaultdict(list)
+        self.fire_times = {}
+        self.synced_at = None
+
+    def _add(self, reminder_id, bucket, fire_at):
+        if self.fire_times.get(reminder_id) != (bucket, fire_at):
+            self.fire_times[reminder_id] = (bucket, fire_at)
+            heapq.heappush(self.heaps[bucket], (fire_at, reminder_id))
+
+    def update(self, entries):
+        with self.lock:
+            for reminder_id, bucket, fire_at in entries:
+                if fire_at is None:
+                    self.fire_times.pop(reminder_id, None)
+                else:
+                    self._add(reminder_id, bucket, fire_at)
+
+    def pop_due(self, now, buckets=None, limit=500):
+        due = []
+        with self.lock:
+            for bucket in (list(self.heaps) if buckets is None else buckets):
+                heap = self.heaps.get(bucket)
+                while heap and heap[0][0] <= now and len(due) < limit:
+                    fire_at, reminder_id = heapq.heappop(heap)
+                    if self.fire_times.get(reminder_id) != (bucket, fire_at):
+                        continue  # Superseded or removed
+                    del self.fire_times[reminder_id]
+                    due.append(reminder_id)
+        return due
+
+    def replace(self, entries):
+        with self.lock:
+            self.heaps = defaultdict(list)
+            self.fire_times = {}
+            for reminder_id, bucket, fire_at in entries:
+                self.fire_times[reminder_id] = (bucket, fire_at)
+                self.heaps[bucket].append((fire_at, reminder_id))
+            for heap in self.heaps.values():
+                heapq.heapify(heap)
+
+    def claim_resync(self):
+        with self.lock:
+            now = time.monotonic()
+            if self.synced_at is not None and now - self.synced_at < self.RESYNC_SECONDS:
+                return False
+            self.synced_at = now
+            return True
+
+    def invalidate(self):
+        with self.lock:
+            self.synced_at = None
+
+
+class DatabaseDueQueue(DueQueue):
+    """The ``next_fire_at`` index itself, for several processes without Redis.
+
+    ``pop_due`` is the indexed range query, so web processes, workers and
+    one-shot ``send_reminders`` runs all see the same queue and there is no
+    copy to keep in sync; the price is one query per tick. Nothing is
+    removed by popping: ``claim_due`` locks the rows and skips any that
+    another dispatcher advanced meanwhile.
+    """
+
+    def pop_due(self, now, buckets=None, limit=500):
+        reminders = Reminder.objects.filter(is_active=True, next_fire_at__lte=now)
+        if buckets is not None:
+            reminders = reminders.filter(shard__in=buckets)
+        return list(reminders.order_by('next_fire_at').values_list('id', flat=True)[:limit])
+
+    def sync(self, now, buckets=None):
+        from .services import ReminderDispatchService
+
+        # Bulk-activated reminders are not in the index until they get a fire time
+        return ReminderDispatchService.schedule_unscheduled(now, buckets) or None
+
+
+class RedisDueQueue(MirroredDueQueue):
+    """Due-queue in Redis: one sorted set per bucket, scored by fire time.
+
+    ``pop_due`` is a Lua script, so concurrent dispatchers never pop the
+    same reminder. A marker key set with NX elects the process that
+    rebuilds the queue each ``RESYNC_SECONDS``; if Redis loses its data the
+    marker goes with it and the next dispatch rebuilds.
+    """
+
+    KEY = 'reminders:due:{}'
+    SYNC_KEY = 'reminders:due:synced'
+    POP_SCRIPT = """
+        local due = {}
+        local limit = tonumber(ARGV[2])
+        for _, key in ipairs(KEYS) do
+            if limit <= 0 then break end
+            local ids = redis.call('ZRANGEBYSCORE', key, '-inf', ARGV[1], 'LIMIT', 0, limit)
+            if #ids > 0 then
+                redis.call('ZREM', key, unpack(ids))
+                for _, id in ipairs(ids) do table.insert(due, id) end
+                limit = limit - #ids
+            end
+        end
+        return due
+    """
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.pop_script = self.client.register_script(self.POP_SCRIPT)
+
+    def _keys(self, buckets=None):
+        return [self.KEY.format(bucket) for bucket in (range(Reminder.SHARD_BUCKETS) if buckets is None else buckets)]
+
+    def update(self, entries):
+        pipe = self.client.pipeline(transaction=False)
+        for reminder_id, bucket, fire_at in entries:
+            if fire_at is None:
+                pipe.zrem(self.KEY.format(bucket), reminder_id)
+            else:
+                pipe.zadd(self.KEY.format(bucket), {reminder_id: fire_at.timestamp()})
+        pipe.execute()
+
+    def pop_due(self, now, buckets=None, limit=500):
+        return [int(reminder_id) for reminder_id in self.pop_script(keys=self._keys(buckets), args=[now.timestamp(), limit])]
+
+    def replace(self, entries):
+        mappings = defaultdict(dict)
+        for reminder_id, bucket, fire_at in entries:
+            mappings[bucket][reminder_id] = fire_at.timestamp()
+        # One MULTI/EXEC: dispatchers see the old queue or the new one, never an empty one
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(*self._keys())
+        for bucket, mapping in mappings.items():
+            pipe.zadd(self.KEY.format(bucket), mapping)
+        pipe.execute()
+
+    def claim_resync(self):
+        return bool(self.client.set(self.SYNC_KEY, 1, nx=True, ex=self.RESYNC_SECONDS))
+
+    def invalidate(self):
+        self.client.delete(self.SYNC_KEY)
+
+
+_due_queue = None
+
+
+def get_due_queue():
+    """The process-wide due-queue.
+
+    Redis when REDIS_URL is set; otherwise the in-process queue, or the
+    ``next_fire_at`` index when ``REMINDER_DUE_QUEUE`` is 'database'.
+    """
+    global _due_queue
+    if _due_queue is None:
+        if settings.REDIS_URL:
+            _due_queue = RedisDueQueue(settings.REDIS_URL)
+        elif getattr(settings, 'REMINDER_DUE_QUEUE', 'local') == 'database':
+            _due_queue = DatabaseDueQueue()
+        else:
+            _due_queue = LocalDueQueue()
+    return _due_queue
@@ -0,0 +1,251 @@
+import heapq
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from .models import Reminder
+from .services import DispatchLeaseService, ReminderDispatchService
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderChangeFeed:
+    """Reminder change notifications, from the processes writing reminders to the scheduler.
+
+    Published ids go to listeners in the same process and, when Redis is
+    configured, to a pub/sub channel that schedulers in other processes
+    subscribe to. Without Redis the scheduler polls recently updated rows.
+    """
+
+    CHANNEL = 'reminders:changed'
+    _listeners = []
+    _client = None
+
+    @staticmethod
+    def _redis():
+        import redis
+        if ReminderChangeFeed._client is None:
+            ReminderChangeFeed._client = redis.Redis.from_url(settings.REDIS_URL)
+        return ReminderChangeFeed._client
+
+    @staticmethod
+    def publish(reminder_ids):
+        """Announce changed reminders once the current transaction commits"""
+        reminder_ids = list(reminder_ids)
+        if not reminder_ids:
+            return
+
+        def send():
+            for listener in list(ReminderChangeFeed._listeners):
+                listener(reminder_ids)
+            if settings.REDIS_URL:
+                try:
+                    ReminderChangeFeed._redis().publish(ReminderChangeFeed.CHANNEL, ','.join(map(str, reminder_ids)))
+                except Exception as e:
+                    # Never fail a reminder write; the scheduler's periodic reload catches up
+                    logger.error(f"Failed to publish reminder changes {reminder_ids}: {e}")
+
+        transaction.on_commit(send)
+
+    @staticmethod
+    def subscribe(callback):
+        """Call ``callback(ids)`` on every change; returns the Redis listener thread, if any"""
+        ReminderChangeFeed._listeners.append(callback)
+        if not settings.REDIS_URL:
+            return None
+
+        def on_message(message):
+            callback([int(reminder_id) for reminder_id in message['data'].decode().split(',') if reminder_id])
+
+        pubsub = ReminderChangeFeed._redis().pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{ReminderChangeFeed.CHANNEL: on_message})
+        return pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    @staticmethod
+    def unsubscribe(callback, thread=None):
+        if callback in ReminderChangeFeed._listeners:
+            ReminderChangeFeed._listeners.remove(callback)
+        if thread is not None:
+            thread.stop()
+
+
+class ReminderScheduler:
+    """Reminder dispatch daemon that sleeps until the next fire time on a min-heap.
+
+    The heap holds (fire time, reminder id) for every active reminder. It is
+    loaded from ``next_fire_at`` when the process becomes leader and kept
+    current from ``ReminderChangeFeed``. It only decides when to wake up:
+    due reminders are still claimed from the database by
+    ``ReminderDispatchService``, so a stale entry costs an empty dispatch,
+    never a wrong email. Entries are invalidated lazily through
+    ``fire_times``, which holds the current fire time of each reminder.
+
+    Sleeps are recomputed from the wall clock on every wake-up and capped
+    at ``MAX_SLEEP_SECONDS``, so an overrun sleep, a suspended process or a
+    clock step is corrected within seconds instead of accumulating.
+    """
+
+    LEASE_NAME = 'reminder-scheduler'
+    LEASE_SECONDS = 30
+    MAX_SLEEP_SECONDS = 10  # Also how often the lease is renewed
+    POLL_SECONDS = 30  # Change polling when Redis pub/sub is not available
+    POLL_OVERLAP_SECONDS = 5  # Re-read rows written by transactions that committed late
+    RELOAD_SECONDS = 60 * 60  # Full reload as a backstop for missed notifications
+    LATE_WARNING_SECONDS = 2
+
+    def __init__(self, holder=None):
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}"
+        self.heap = []
+        self.fire_times = {}
+        self.changed = set()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.is_leader = False
+        self.polling = True
+        self.polled_at = None
+        self.loaded_at = None
+
+    def load(self):
+        """Rebuild the heap from the database"""
+        now = timezone.now()
+        with self.lock:
+            self.changed.clear()
+        # Unscheduled reminders are left out until the due-queue resync gives them a time
+        self.fire_times = dict(
+            Reminder.objects.filter(is_active=True, next_fire_at__isnull=False).values_list('id', 'next_fire_at')
+        )
+        self.heap = [(fire_at, reminder_id) for reminder_id, fire_at in self.fire_times.items()]
+        heapq.heapify(self.heap)
+        self.loaded_at = self.polled_at = now
+        logger.info(f"Reminder scheduler loaded {len(self.heap)} reminders")
+
+    def _schedule(self, reminder_id, fire_at):
+        if self.fire_times.get(reminder_id) != fire_at:
+            self.fire_times[reminder_id] = fire_at
+            heapq.heappush(self.heap, (fire_at, reminder_id))
+
+    def notify(self, reminder_ids):
+        """Change notification: re-read the reminders and wake the loop"""
+        with self.lock:
+            self.changed.update(reminder_ids)
+        self.wakeup.set()
+
+    def apply_changes(self, now):
+        """Re-read notified (or, when polling, recently updated) reminders into the heap"""
+        with self.lock:
+            reminder_ids, self.changed = self.changed, set()
+        fields = ('id', 'shard', 'is_active', 'next_fire_at')
+        rows = []
+        if reminder_ids:
+            rows += Reminder.objects.filter(id__in=reminder_ids).values_list(*fields)
+        if self.polling and (now - self.polled_at).total_seconds() >= self.POLL_SECONDS:
+            rows += Reminder.objects.filter(
+                updated_at__gte=self.polled_at - timedelta(seconds=self.POLL_OVERLAP_SECONDS)
+            ).values_list(*fields)
+            self.polled_at = now
+
+        found = set()
+        for reminder_id, shard, is_active, fire_at in rows:
+            found.add(reminder_id)
+            if is_active and fire_at is not None:
+                self._schedule(reminder_id, fire_at)
+            else:
+                self.fire_times.pop(reminder_id, None)
+        for reminder_id in reminder_ids - found:
+            self.fire_times.pop(reminder_id, None)  # Deleted
+
+        # Writes made by other processes reach an in-process due-queue only this way
+        # (deleted reminders stay queued until popped; dispatch drops them)
+        ReminderDispatchService.enqueue(
+            (reminder_id, shard, fire_at if is_active else None) for reminder_id, shard, is_active, fire_at in rows
+        )
+
+    def pop_due(self, now):
+        """Remove and return the ids due at ``now``, with the earliest fire time among them"""
+        due, earliest = [], None
+        while self.heap and self.heap[0][0] <= now:
+            fire_at, reminder_id = heapq.heappop(self.heap)
+            if self.fire_times.get(reminder_id) != fire_at:
+                continue  # Superseded or removed
+            del self.fire_times[reminder_id]
+            due.append(reminder_id)
+            earliest = earliest or fire_at
+        return due, earliest
+
+    def next_fire_at(self):
+        while self.heap and self.fire_times.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def tick(self):
+        """Dispatch whatever is due now and reschedule it"""
+        now = timezone.now()
+        if (now - self.loaded_at).total_seconds() >= self.RELOAD_SECONDS:
+            self.load()
+        self.apply_changes(now)
+
+        due, earliest = self.pop_due(now)
+        if not due:
+            return
+        lateness = (now - earliest).total_seconds()
+        if lateness > self.LATE_WARNING_SECONDS:
+            logger.warning(f"Reminder dispatch running {lateness:.1f}s late")
+
+        try:
+            stats = ReminderDispatchService.dispatch(now)
+        except Exception:
+            with self.lock:
+                self.changed.update(due)  # Re-read and retried on the next wake-up
+            raise
+        for reminder_id, fire_at in stats['rescheduled'].items():
+            self._schedule(reminder_id, fire_at)
+        # Due but not claimed by us: deleted, deactivated or sent by another dispatcher
+        self.notify(set(due) - set(stats['rescheduled']))
+
+    def sleep(self):
+        """Sleep until the next fire time, a change notification or the renewal deadline"""
+        timeout = self.MAX_SLEEP_SECONDS
+        next_fire_at = self.next_fire_at()
+        if next_fire_at is not None:
+            timeout = min(timeout, max((next_fire_at - timezone.now()).total_seconds(), 0))
+        if self.wakeup.wait(timeout):
+            self.wakeup.clear()
+
+    def run(self):
+        """Dispatch loop; only the process holding the lease dispatches"""
+        thread = ReminderChangeFeed.subscribe(self.notify)
+        self.polling = thread is None
+        logger.info(f"Reminder scheduler {self.holder} started")
+        try:
+            while not self.stopping:
+                close_old_connections()
+                if not DispatchLeaseService.acquire(self.LEASE_NAME, self.holder, self.LEASE_SECONDS):
+                    if self.is_leader:
+                        logger.warning(f"Reminder scheduler {self.holder} lost the dispatch lease")
+                    self.is_leader = False
+                    self.wakeup.wait(self.LEASE_SECONDS / 2)
+                    self.wakeup.clear()
+                    continue
+                if not self.is_leader:
+                    logger.info(f"Reminder scheduler {self.holder} is now dispatching")
+                    self.is_leader = True
+                    self.load()
+                try:
+                    self.tick()
+                except Exception as e:
+                    logger.error(f"Reminder scheduler tick failed: {e}")
+                self.sleep()
+        finally:
+            ReminderChangeFeed.unsubscribe(self.notify, thread)
+            if self.is_leader:
+                DispatchLeaseService.release(self.LEASE_NAME, self.holder)
+            logger.info(f"Reminder scheduler {self.holder} stopped")
+
+    def stop(self):
+        self.stopping = True
+        self.wakeup.set()
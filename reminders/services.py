@@ -0,0 +1,621 @@
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from .models import DispatchLease, Reminder
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderDispatchService:
+    """Service class sending due reminders popped from the due-queue.
+
+    The due-queue (``reminders.queues``) mirrors ``next_fire_at`` of the
+    active reminders (in Redis or in process), and every tick pops the
+    reminders due by now from it as one range operation, so a tick with
+    nothing due runs no SQL and a busy tick only reads the rows it sends.
+    ``REMINDER_DUE_QUEUE = 'database'`` pops from the ``next_fire_at`` index
+    instead, one query per tick. A reminder whose fire time
+    passed while no tick ran (a deploy, a stalled worker) is still due on
+    the next tick and is sent then, once.
+
+    Dispatch can be split into shards, each covering a fixed subset of the
+    ``Reminder.shard`` hash buckets (users), so several workers can share a
+    burst; ``dispatch_shard`` runs one shard under its own lease.
+    """
+
+    BATCH_SIZE = 500
+    SHARD_LEASE_SECONDS = 120
+    # Ledger rows still pending this long after their claim belong to a dead run
+    STALLED_SECONDS = 120
+    _stalled_checked_at = None  # time.monotonic() of this process's last look for them
+
+    @staticmethod
+    def catch_up_window():
+        """How late a reminder may still be sent; older ones are skipped to their next time"""
+        from django.conf import settings
+        return timedelta(minutes=getattr(settings, 'REMINDER_CATCH_UP_MINUTES', 360))
+
+    @staticmethod
+    def shard_count():
+        """Number of dispatch shards (parallel dispatch tasks)"""
+        from django.conf import settings
+        return min(max(getattr(settings, 'REMINDER_DISPATCH_SHARDS', 4), 1), Reminder.SHARD_BUCKETS)
+
+    @staticmethod
+    def shard_buckets(shard, shard_count):
+        """The ``Reminder.shard`` buckets covered by dispatch shard ``shard`` of ``shard_count``"""
+        return [bucket for bucket in range(Reminder.SHARD_BUCKETS) if bucket % shard_count == shard]
+
+    @staticmethod
+    def _reminders(buckets=None):
+        reminders = Reminder.objects.filter(is_active=True)
+        return reminders if buckets is None else reminders.filter(shard__in=buckets)
+
+    @staticmethod
+    def due_queue():
+        from .queues import get_due_queue
+        return get_due_queue()
+
+    @staticmethod
+    def mirrored_queue():
+        """The due-queue when it is a copy that reminder writes must update, else None"""
+        from .queues import MirroredDueQueue
+
+        queue = ReminderDispatchService.due_queue()
+        return queue if isinstance(queue, MirroredDueQueue) else None
+
+    @staticmethod
+    def enqueue(entries):
+        """Apply (reminder id, bucket, fire time or None) entries to the due-queue on commit"""
+        queue = ReminderDispatchService.mirrored_queue()
+        if queue is None:
+            return  # The queue is the next_fire_at index the write itself updated
+        entries = list(entries)
+        if not entries:
+            return
+
+        def apply():
+            try:
+                queue.update(entries)
+            except Exception as e:
+                # Never fail a reminder write; the periodic resync repairs the queue
+                logger.error(f"Failed to update the reminder due-queue: {e}")
+
+        transaction.on_commit(apply)
+
+    @staticmethod
+    def requeue(reminders):
+        """Bring the due-queue in line with a queryset after a bulk update"""
+        if ReminderDispatchService.mirrored_queue() is None:
+            return
+        ReminderDispatchService.enqueue(
+            (reminder_id, shard, fire_at if is_active else None)
+            for reminder_id, shard, is_active, fire_at in reminders.values_list('id', 'shard', 'is_active', 'next_fire_at')
+        )
+
+    @staticmethod
+    def resync_due_queue(now=None):
+        """Rebuild the due-queue from the database.
+
+        Unscheduled reminders get a fire time first. Returns a dict of
+        reminder id -> the fire time given to them.
+        """
+        now = now or timezone.now()
+        scheduled = ReminderDispatchService.schedule_unscheduled(now)
+        ReminderDispatchService.mirrored_queue().replace(
+            ReminderDispatchService._reminders().filter(next_fire_at__isnull=False)
+            .values_list('id', 'shard', 'next_fire_at').iterator(chunk_size=2000)
+        )
+        logger.info("Rebuilt the reminder due-queue")
+        return scheduled
+
+    @staticmethod
+    def schedule_unscheduled(now=None, buckets=None):
+        """Give active reminders without a fire time (bulk activated, pre-existing) one.
+
+        Returns a dict of reminder id -> the fire time given.
+        """
+        now = now or timezone.now()
+        reminders = list(ReminderDispatchService._reminders(buckets).filter(next_fire_at__isnull=True))
+        for reminder in reminders:
+            reminder.next_fire_at = reminder.next_fire_after(now)
+        Reminder.objects.bulk_update(reminders, ['next_fire_at'], batch_size=ReminderDispatchService.BATCH_SIZE)
+        ReminderDispatchService.enqueue((reminder.id, reminder.shard, reminder.next_fire_at) for reminder in reminders)
+        if reminders:
+            from .scheduler import ReminderChangeFeed
+            ReminderChangeFeed.publish(reminder.id for reminder in reminders)
+        return {reminder.id: reminder.next_fire_at for reminder in reminders}
+
+    @staticmethod
+    def claim_due(reminder_ids, now=None, token='', oldest=None):
+        """Claim reminders popped from the due-queue, advance their fire times and ledger them.
+
+        The rows are locked with SKIP LOCKED, so a dispatcher never waits on
+        rows another one is claiming; skipped reminders go back on the queue
+        as they are. A popped reminder that is no longer due (retimed after
+        it was queued, or advanced by a concurrent dispatch reading the
+        database due-queue) goes back on the queue at its current time;
+        inactive and deleted ones are dropped. In the same
+        transaction every claimed reminder due at or after ``oldest`` gets a
+        pending send-ledger row (Notification) owned by ``token``;
+        ``deliver`` sends those. Returns (reminder, fire time) pairs.
+        """
+        from notifications.models import Notification
+
+        now = now or timezone.now()
+        with transaction.atomic():
+            reminders = list(
+                Reminder.objects.select_for_update(skip_locked=True, of=('self',))
+                .filter(id__in=reminder_ids, is_active=True)
+                .select_related('user').order_by('next_fire_at')
+            )
+            claimed = []
+            advanced = defaultdict(list)
+            for reminder in reminders:
+                if reminder.next_fire_at is not None and reminder.next_fire_at > now:
+                    continue  # Requeued below as it is
+                claimed.append((reminder, reminder.next_fire_at))
+                reminder.next_fire_at = reminder.next_fire_after(now)
+                advanced[reminder.next_fire_at].append(reminder.id)
+            # Reminders firing together share their next time: one UPDATE per time.
+            # A new dose starts out not taken.
+            for next_fire_at, ids in advanced.items():
+                Reminder.objects.filter(id__in=ids).update(next_fire_at=next_fire_at, taken=False, taken_at=None)
+
+            # A fire time already in the ledger was handled by an earlier run
+            doses = [
+                (reminder, fire_at) for reminder, fire_at in claimed
+                if fire_at is not None and (oldest is None or fire_at >= oldest)
+            ]
+            Notification.objects.bulk_create([
+                Notification(
+                    user_id=reminder.user_id,
+                    reminder=reminder,
+                    notification_type='email',
+                    status='pending',
+                    message=f"Medicine reminder: {reminder.medicine_name}",
+                    scheduled_for=fire_at,
+                    claim_token=token,
+                )
+                for reminder, fire_at in doses
+            ], ignore_conflicts=True)
+            # Only doses whose ledger row this claim inserted are new; a re-run
+            # of a fire time already in the ledger must not count it again
+            inserted = set(Notification.objects.filter(
+                claim_token=token, reminder_id__in=[reminder.id for reminder, fire_at in doses]
+            ).values_list('reminder_id', 'scheduled_for')) if doses else set()
+            AdherenceService.record_doses([
+                (reminder, fire_at) for reminder, fire_at in doses if (reminder.id, fire_at) in inserted
+            ])
+            ReminderDispatchService.enqueue((reminder.id, reminder.shard, reminder.next_fire_at) for reminder in reminders)
+            skipped = set(reminder_ids) - {reminder.id for reminder in reminders}
+            if skipped:
+                # Locked by another dispatch or an edit (or inactive, deleted): re-read unlocked
+                ReminderDispatchService.requeue(Reminder.objects.filter(id__in=skipped))
+        return claimed
+
+    @staticmethod
+    def adopt_stalled(token, now=None):
+        """Take over pending ledger rows of runs that died between claiming and sending.
+
+        Rows already being sent are left alone: whether their email went
+        out is unknown, and a duplicate is worse than a miss. Returns the
+        number adopted.
+        """
+        from notifications.models import Notification
+
+        now = now or timezone.now()
+        return Notification.objects.filter(
+            status='pending', scheduled_for__isnull=False,
+            created_at__lt=now - timedelta(seconds=ReminderDispatchService.STALLED_SECONDS),
+        ).update(claim_token=token)
+
+    @staticmethod
+    def group_for_digests(ledger):
+        """Split ledger rows into one group per email.
+
+        Users with ``reminder_digest`` on get one group per minute of fire
+        time; everyone else gets one group per reminder.
+        """
+        groups = defaultdict(list)
+        for entry in ledger:
+            user = entry.reminder.user
+            if user.reminder_digest:
+                key = (user.id, entry.scheduled_for.replace(second=0, microsecond=0))
+            else:
+                key = ('reminder', entry.id)
+            groups[key].append(entry)
+        return list(groups.values())
+
+    @staticmethod
+    def deliver(token, now=None):
+        """Email the pending ledger rows owned by ``token`` in bulk.
+
+        The rows are marked sending first and sent or failed afterwards,
+        each in one UPDATE. Only the rows that the sending UPDATE changed
+        are emailed, so rows adopted by another dispatch in the meantime
+        are not sent twice. Reminders of a digest user due in the same
+        minute share one email. Messages are all rendered first and then handed
+        to ``NotificationService.send_email_batch``, which sends them over
+        pooled connections. Returns (number sent, number failed).
+        """
+        from notifications.models import Notification
+        from notifications.services import NotificationService
+
+        now = now or timezone.now()
+        if not Notification.objects.filter(claim_token=token, status='pending').update(status='sending'):
+            return 0, 0
+        ledger = list(Notification.objects.filter(claim_token=token, status='sending').select_related('reminder__user'))
+
+        messages, built, failed = [], [], []
+        for entries in ReminderDispatchService.group_for_digests(ledger):
+            reminders = [entry.reminder for entry in entries]
+            try:
+                if len(reminders) > 1:
+                    messages.append(NotificationService.build_reminder_digest_email(reminders[0].user, reminders))
+                else:
+                    messages.append(NotificationService.build_reminder_email(reminders[0]))
+                built.append([entry.id for entry in entries])
+            except Exception as e:
+                logger.error(f"Could not build reminder email for reminders {[reminder.id for reminder in reminders]}: {e}")
+                failed += [entry.id for entry in entries]
+
+        results = NotificationService.send_email_batch(messages) if messages else []
+        sent = [entry_id for entry_ids, ok in zip(built, results) if ok for entry_id in entry_ids]
+        failed += [entry_id for entry_ids, ok in zip(built, results) if not ok for entry_id in entry_ids]
+        if sent:
+            Notification.objects.filter(id__in=sent).update(status='sent', sent_at=now)
+        if failed:
+            Notification.objects.filter(id__in=failed).update(status='failed')
+        return len(sent), len(failed)
+
+    @staticmethod
+    def dispatch(now=None, buckets=None):
+        """Send every due reminder.
+
+        All due reminders are popped and claimed first and then delivered
+        together, so a burst (every slot reminder firing at 07:00) goes out
+        as one batch. The send ledger makes re-running a dispatch (task
+        retries, overlapping schedulers) idempotent: a fire time is sent at
+        most once. ``buckets`` limits the dispatch to some ``Reminder.shard``
+        buckets. With a Redis or in-process due-queue, when nothing is due
+        and it needs no resync, no query is run, apart from a look for
+        stalled sends every ``STALLED_SECONDS``. Returns counts of sent, failed and skipped reminders,
+        plus the new fire time of each claimed reminder under
+        ``rescheduled``.
+        """
+        import uuid
+
+        now = now or timezone.now()
+        oldest = now - ReminderDispatchService.catch_up_window()
+        token = uuid.uuid4().hex
+        stats = {'sent': 0, 'failed': 0, 'skipped': 0, 'rescheduled': {}}
+
+        queue = ReminderDispatchService.due_queue()
+        rescheduled = queue.sync(now, buckets)
+        resynced = rescheduled is not None
+        if resynced:
+            stats['rescheduled'] = rescheduled
+        claimed_any = False
+        while True:
+            reminder_ids = queue.pop_due(now, buckets, ReminderDispatchService.BATCH_SIZE)
+            claimed = ReminderDispatchService.claim_due(reminder_ids, now, token, oldest) if reminder_ids else []
+            for reminder, fire_at in claimed:
+                if fire_at is not None and fire_at < oldest:
+                    logger.warning(f"Skipped reminder {reminder.id} due at {fire_at}, too late to send")
+                    stats['skipped'] += 1
+                stats['rescheduled'][reminder.id] = reminder.next_fire_at
+            claimed_any = claimed_any or bool(claimed)
+            if len(reminder_ids) < ReminderDispatchService.BATCH_SIZE:
+                break
+        # An idle tick only looks for stalled sends once per STALLED_SECONDS
+        checked_at = ReminderDispatchService._stalled_checked_at
+        check_stalled = checked_at is None or time.monotonic() - checked_at >= ReminderDispatchService.STALLED_SECONDS
+        if not (resynced or claimed_any or check_stalled):
+            return stats
+
+        ReminderDispatchService._stalled_checked_at = time.monotonic()
+        adopted = ReminderDispatchService.adopt_stalled(token, now)
+        if adopted:
+            logger.warning(f"Adopted {adopted} reminder sends left pending by an interrupted dispatch")
+        elif not (resynced or claimed_any):
+            return stats
+        stats['sent'], stats['failed'] = ReminderDispatchService.deliver(token, now)
+        logger.info(f"Reminder dispatch: {stats['sent']} sent, {stats['failed']} failed, {stats['skipped']} skipped")
+        return stats
+
+    @staticmethod
+    def dispatch_shard(shard, shard_count=None, holder=None):
+        """Dispatch one shard while holding its lease.
+
+        Returns the dispatch stats, or None when another worker holds the
+        shard; a second worker on the same shard therefore backs off
+        instead of competing for the same rows.
+        """
+        import uuid
+
+        shard_count = shard_count or ReminderDispatchService.shard_count()
+        holder = holder or uuid.uuid4().hex
+        lease = f"reminder-shard-{shard}-of-{shard_count}"
+        if not DispatchLeaseService.acquire(lease, holder, ReminderDispatchService.SHARD_LEASE_SECONDS):
+            logger.info(f"Reminder shard {shard}/{shard_count} is being dispatched elsewhere")
+            return None
+        try:
+            return ReminderDispatchService.dispatch(buckets=ReminderDispatchService.shard_buckets(shard, shard_count))
+        finally:
+            DispatchLeaseService.release(lease, holder)
+
+
+class ReminderEtaService:
+    """Service class queueing reminder dispatch as Celery tasks with an ETA.
+
+    Instead of a beat task polling every minute, each upcoming fire time of
+    a dispatch shard gets one ``dispatch_reminder_slot`` task that the
+    worker holds until that time, so nothing touches the database while no
+    reminder is due. Reminders firing at the same time in the same shard
+    share the task and are sent as one batch.
+
+    Tasks are only queued for fire times within ``HORIZON_SECONDS``: the
+    Redis broker redelivers messages unacknowledged for longer than its
+    visibility timeout, so far-off ETAs would be duplicated. The hourly
+    ``reconcile`` queues the next hour's slots and anything overdue;
+    reminder changes queue or revoke their slot straight away. Task ids are
+    derived from the slot, so a slot is queued once and can be revoked
+    without storing ids; a slot task that runs anyway after its reminders
+    moved only finds nothing due.
+    """
+
+    RECONCILE_SECONDS = 60 * 60
+    HORIZON_SECONDS = RECONCILE_SECONDS + 5 * 60  # Overlap so no slot falls between two runs
+
+    @staticmethod
+    def enabled():
+        """Whether reminder changes queue ETA tasks; an eager worker cannot hold a task until its ETA"""
+        from django.conf import settings
+        from healthkart360.celery import can_queue_tasks
+        return (
+            getattr(settings, 'REMINDER_ETA_TASKS', True) and can_queue_tasks()
+            and not getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False)
+        )
+
+    @staticmethod
+    def task_id(shard, shard_count, fire_at):
+        return f"reminder-slot-{shard}-of-{shard_count}-{int(fire_at.timestamp())}"
+
+    @staticmethod
+    def _slots(fire_times, now):
+        """(dispatch shard, fire time) of (bucket, fire time) pairs within the horizon"""
+        shard_count = ReminderDispatchService.shard_count()
+        horizon = now + timedelta(seconds=ReminderEtaService.HORIZON_SECONDS)
+        return {
+            (bucket % shard_count, fire_at)
+            for bucket, fire_at in fire_times
+            if fire_at is not None and fire_at <= horizon
+        }
+
+    @staticmethod
+    def queue(fire_times, now=None):
+        """Queue a dispatch task for each (bucket, fire time) slot due within the horizon.
+
+        Slots already queued are skipped. Returns the number queued.
+        """
+        from django.core.cache import cache
+        from .tasks import dispatch_reminder_slot
+
+        now = now or timezone.now()
+        shard_count = ReminderDispatchService.shard_count()
+        queued = 0
+        for shard, fire_at in sorted(ReminderEtaService._slots(fire_times, now), key=lambda slot: slot[1]):
+            task_id = ReminderEtaService.task_id(shard, shard_count, fire_at)
+            # Remembered until shortly after the slot fires, so reconcile re-queues lost overdue slots
+            if not cache.add(task_id, True, max((fire_at - now).total_seconds(), 0) + 60):
+                continue
+            try:
+                dispatch_reminder_slot.apply_async(
+                    args=[shard, shard_count, fire_at.isoformat()], eta=fire_at, task_id=task_id, retry=False
+                )
+                queued += 1
+            except Exception as e:
+                cache.delete(task_id)
+                logger.warning(f"Could not queue reminder slot {task_id}: {e}")
+        return queued
+
+    @staticmethod
+    def revoke(fire_times, now=None):
+        """Revoke the queued slots of (bucket, fire time) pairs no active reminder fires at any more"""
+        from django.core.cache import cache
+        from healthkart360.celery import app
+
+        now = now or timezone.now()
+        shard_count = ReminderDispatchService.shard_count()
+        for shard, fire_at in ReminderEtaService._slots(fire_times, now):
+            buckets = ReminderDispatchService.shard_buckets(shard, shard_count)
+            if Reminder.objects.filter(is_active=True, shard__in=buckets, next_fire_at=fire_at).exists():
+                continue  # Still needed by other reminders
+            task_id = ReminderEtaService.task_id(shard, shard_count, fire_at)
+            try:
+                app.control.revoke(task_id)
+            except Exception as e:
+                logger.warning(f"Could not revoke reminder slot {task_id}: {e}")
+            cache.delete(task_id)
+
+    @staticmethod
+    def reschedule(before, after):
+        """Queue and revoke slots for changed reminders once the transaction commits.
+
+        ``before`` and ``after`` are (bucket, fire time) pairs of the
+        reminders before and after the change.
+        """
+        if not ReminderEtaService.enabled():
+            return
+        before, after = set(before), set(after)
+        if before == after:
+            return
+
+        def apply():
+            try:
+                ReminderEtaService.queue(after - before)
+                ReminderEtaService.revoke(before - after)
+            except Exception as e:
+                # Never fail a reminder write; the hourly reconcile catches up
+                logger.error(f"Failed to reschedule reminder slots: {e}")
+
+        transaction.on_commit(apply)
+
+    @staticmethod
+    def fire_times(reminders):
+        """(bucket, fire time) pairs of a queryset, to pass to ``reschedule`` after a bulk update"""
+        if not ReminderEtaService.enabled():
+            return []
+        return list(reminders.filter(is_active=True, next_fire_at__isnull=False).values_list('shard', 'next_fire_at'))
+
+    @staticmethod
+    def schedule_activated(reminders):
+        """Give bulk-activated reminders (saved without a fire time) one and queue their slots"""
+        now = timezone.now()
+        reminders = list(reminders.filter(is_active=True, next_fire_at__isnull=True))
+        for reminder in reminders:
+            reminder.next_fire_at = reminder.next_fire_after(now)
+        Reminder.objects.bulk_update(reminders, ['next_fire_at'])
+        ReminderEtaService.reschedule([], [(reminder.shard, reminder.next_fire_at) for reminder in reminders])
+
+    @staticmethod
+    def reconcile(now=None):
+        """Queue every slot due within the horizon, including overdue ones.
+
+        Runs hourly as the backstop for slots that were never queued (no
+        broker at write time, bulk updates) or were lost with the broker.
+        Returns the number of tasks queued.
+        """
+        now = now or timezone.now()
+        ReminderDispatchService.schedule_unscheduled(now)
+        fire_times = Reminder.objects.filter(
+            is_active=True, next_fire_at__lte=now + timedelta(seconds=ReminderEtaService.HORIZON_SECONDS)
+        ).values_list('shard', 'next_fire_at').distinct()
+        return ReminderEtaService.queue(fire_times, now)
+
+
+class DispatchLeaseService:
+    """Service class for the expiring leases that elect a single dispatching process"""
+
+    @staticmethod
+    def acquire(name, holder, ttl_seconds):
+        """Take or renew the lease; returns True while ``holder`` owns it"""
+        from django.db import IntegrityError
+        from django.db.models import Q
+
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=ttl_seconds)
+        # Renewing our own lease or taking over a lapsed one is one conditional UPDATE
+        if DispatchLease.objects.filter(Q(holder=holder) | Q(expires_at__lte=now), name=name).update(
+            holder=holder, expires_at=expires_at
+        ):
+            return True
+        try:
+            with transaction.atomic():
+                DispatchLease.objects.create(name=name, holder=holder, expires_at=expires_at, acquired_at=now)
+            return True
+        except IntegrityError:
+            return False  # Someone else holds it
+
+    @staticmethod
+    def release(name, holder):
+        """Give the lease up so another process can take over immediately"""
+        DispatchLease.objects.filter(name=name, holder=holder).delete()
+
+
+class AdherenceService:
+    """Service class for the dose-event log and the per-user daily adherence totals.
+
+    Every dose event also moves a ``DailyAdherence`` counter of the dose's
+    local day, with conditional F() updates grouped so a burst of doses
+    costs a few queries. Week and month adherence are then a single
+    aggregate over at most ``MONTH_DAYS`` rows per user.
+    """
+
+    WEEK_DAYS = 7
+    MONTH_DAYS = 30
+
+    @staticmethod
+    def _increment(field, counts):
+        """Add ``counts[(user id, date)]`` to ``field`` of the matching DailyAdherence rows"""
+        from django.db.models import F
+        from .models import DailyAdherence
+
+        if not counts:
+            return
+        DailyAdherence.objects.bulk_create(
+            [DailyAdherence(user_id=user_id, date=date) for user_id, date in counts], ignore_conflicts=True
+        )
+        # Most users in a burst get the same increment: one UPDATE per (date, amount)
+        groups = defaultdict(list)
+        for (user_id, date), amount in counts.items():
+            groups[date, amount].append(user_id)
+        for (date, amount), user_ids in groups.items():
+            rows = DailyAdherence.objects.filter(date=date, user_id__in=user_ids)
+            if amount < 0:
+                rows = rows.filter(**{f'{field}__gte': -amount})  # Never below zero
+            rows.update(**{field: F(field) + amount})
+
+    @staticmethod
+    def record_doses(doses):
+        """Log (reminder, scheduled time) pairs as due doses, in bulk"""
+        from collections import Counter
+        from .models import DoseEvent
+
+        doses = list(doses)
+        if not doses:
+            return
+        DoseEvent.objects.bulk_create([
+            DoseEvent(reminder=reminder, user_id=reminder.user_id, scheduled_at=scheduled_at, status='due')
+            for reminder, scheduled_at in doses
+        ], batch_size=1000)
+        AdherenceService._increment('scheduled', Counter(
+            (reminder.user_id, timezone.localdate(scheduled_at)) for reminder, scheduled_at in doses
+        ))
+
+    @staticmethod
+    def record_taken(reminder, taken, now=None):
+        """Log the user marking the reminder's current dose as taken (or not taken after all).
+
+        A mark made well before the next dose belongs to that dose rather than
+        the previous one; see ``Reminder.dose_for``.
+        """
+        from .models import DoseEvent
+
+        now = now or timezone.now()
+        scheduled_at = reminder.dose_for(now)
+        with transaction.atomic():
+            DoseEvent.objects.create(
+                reminder=reminder, user_id=reminder.user_id, scheduled_at=scheduled_at,
+                taken_at=now if taken else None, status='taken' if taken else 'untaken',
+            )
+            AdherenceService._increment('taken', {(reminder.user_id, timezone.localdate(scheduled_at)): 1 if taken else -1})
+
+    @staticmethod
+    def adherence(user, today=None):
+        """Doses due, taken and the taken rate over the last week and month, in one query"""
+        from django.db.models import Q, Sum
+        from .models import DailyAdherence
+
+        today = today or timezone.localdate()
+        week_start = today - timedelta(days=AdherenceService.WEEK_DAYS - 1)
+        month_start = today - timedelta(days=AdherenceService.MONTH_DAYS - 1)
+        totals = DailyAdherence.objects.filter(user=user, date__gte=month_start, date__lte=today).aggregate(
+            week_scheduled=Sum('scheduled', filter=Q(date__gte=week_start)),
+            week_taken=Sum('taken', filter=Q(date__gte=week_start)),
+            month_scheduled=Sum('scheduled'),
+            month_taken=Sum('taken'),
+        )
+
+        def period(prefix):
+            scheduled = totals[f'{prefix}_scheduled'] or 0
+            taken = totals[f'{prefix}_taken'] or 0
+            # Doses marked without a dispatched reminder can push taken past scheduled
+            rate = round(min(taken / scheduled, 1) * 100, 1) if scheduled else None
+            return {'scheduled': scheduled, 'taken': taken, 'adherence': rate}
+
+        return {'week': period('week'), 'month': period('month')}
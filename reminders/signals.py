@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Reminder
+from .scheduler import ReminderChangeFeed
+from .services import ReminderDispatchService, ReminderEtaService
+
+
+@receiver(post_save, sender=Reminder)
+def reminder_saved(sender, instance, **kwargs):
+    ReminderChangeFeed.publish([instance.id])
+    previous = getattr(instance, '_loaded_fire_at', None)
+    if previous != instance.next_fire_at:
+        ReminderDispatchService.enqueue([(instance.id, instance.shard, instance.next_fire_at)])
+        ReminderEtaService.reschedule([(instance.shard, previous)], [(instance.shard, instance.next_fire_at)])
+
+
+@receiver(post_delete, sender=Reminder)
+def reminder_deleted(sender, instance, **kwargs):
+    ReminderChangeFeed.publish([instance.id])
+    ReminderDispatchService.enqueue([(instance.id, instance.shard, None)])
+    ReminderEtaService.reschedule([(instance.shard, instance.next_fire_at)], [])
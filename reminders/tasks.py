@@ -1,5 +1,5 @@
 from celery import shared_task
-from django.core.management import call_command
+from django.db import connections
 import logging
 
 logger = logging.getLogger(__name__)
@@ -7,17 +7,82 @@ logger = logging.getLogger(__name__)
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
 def send_reminder_emails(self):
     """
-    Celery task to send reminder emails every minute.
-    This task is scheduled via Celery Beat to run automatically.
+    Celery task to send the reminder emails that are due. Scheduled every
+    minute via Celery Beat when REMINDER_ETA_TASKS is off; it fans the work
+    out as one dispatch_reminder_shard task per shard, so the workers share
+    large slot bursts.
     """
+    from .services import ReminderDispatchService
+
     try:
         logger.info("[Celery Beat] Starting scheduled reminder email check")
 
-        # Call the Django management command
-        call_command('send_reminders', verbosity=1)
+        shard_count = ReminderDispatchService.shard_count()
+        for shard in range(shard_count):
+            dispatch_reminder_shard.apply_async(args=[shard, shard_count], retry=False)
 
-        logger.info("[Celery Beat] Completed scheduled reminder email check")
+        logger.info(f"[Celery Beat] Queued reminder dispatch for {shard_count} shards")
 
     except Exception as exc:
         logger.error(f"[Celery Beat] Error in scheduled reminder check: {exc}")
         raise self.retry(exc=exc)
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=10)
+def dispatch_reminder_shard(self, shard, shard_count):
+    """
+    Celery task sending the due reminders of one dispatch shard. A shard
+    already being dispatched by another worker is skipped.
+    """
+    from .services import ReminderDispatchService
+
+    try:
+        stats = ReminderDispatchService.dispatch_shard(shard, shard_count, holder=self.request.id)
+        if stats is None:
+            return None
+        logger.info(f"[Celery Task] Reminder shard {shard}/{shard_count}: {stats['sent']} sent, {stats['failed']} failed")
+        return stats['sent']
+    except Exception as exc:
+        logger.error(f"[Celery Task] Error dispatching reminder shard {shard}/{shard_count}: {exc}. Retrying...")
+        raise self.retry(exc=exc)
+    finally:
+        connections.close_all()
+
+@shared_task(bind=True, max_retries=12, default_retry_delay=5)
+def dispatch_reminder_slot(self, shard, shard_count, fire_at):
+    """
+    Celery task queued with an ETA of ``fire_at`` by ReminderEtaService,
+    sending the reminders of one shard due at that time. Retried shortly
+    while another worker is dispatching the same shard.
+    """
+    from .services import ReminderDispatchService
+
+    try:
+        stats = ReminderDispatchService.dispatch_shard(shard, shard_count, holder=self.request.id)
+    except Exception as exc:
+        logger.error(f"[Celery Task] Error dispatching reminder slot {fire_at} shard {shard}/{shard_count}: {exc}. Retrying...")
+        raise self.retry(exc=exc)
+    finally:
+        connections.close_all()
+    if stats is None:
+        raise self.retry()
+    logger.info(f"[Celery Task] Reminder slot {fire_at} shard {shard}/{shard_count}: {stats['sent']} sent, {stats['failed']} failed")
+    return stats['sent']
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def reconcile_reminder_tasks(self):
+    """
+    Celery task run hourly by Celery Beat when REMINDER_ETA_TASKS is on.
+    Queues the dispatch tasks of the coming hour and of overdue reminders
+    that reminder changes did not queue.
+    """
+    from .services import ReminderEtaService
+
+    try:
+        queued = ReminderEtaService.reconcile()
+        logger.info(f"[Celery Beat] Queued {queued} reminder dispatch tasks")
+        return queued
+    except Exception as exc:
+        logger.error(f"[Celery Beat] Error reconciling reminder tasks: {exc}")
+        raise self.retry(exc=exc)
+    finally:
+        connections.close_all()
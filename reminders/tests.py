@@ -0,0 +1,109 @@
+from datetime import datetime, time, timedelta
+
+from django.core import mail
+from django.test import TestCase
+from django.utils import timezone
+
+from notifications.models import Notification
+from users.models import User
+from . import queues
+from .models import DoseEvent, Reminder
+from .services import AdherenceService, ReminderDispatchService
+
+
+class ReminderSendLedgerTest(TestCase):
+    def setUp(self):
+        queues._due_queue = None
+        ReminderDispatchService._stalled_checked_at = None
+        self.user = User.objects.create_user(
+            username='asha', password='pw', phone_number='9000000002', email='asha@example.com',
+            reminder_digest=False
+        )
+        self.reminders = [
+            Reminder.objects.create(user=self.user, medicine_name=f'Medicine {i}', time_slot='morning')
+            for i in range(3)
+        ]
+        self.now = timezone.now()
+        self.fire_at = self.now - timedelta(seconds=30)
+
+    def make_due(self):
+        """Set every reminder due at ``fire_at``, as a raw update that bypasses the due-queue"""
+        Reminder.objects.update(next_fire_at=self.fire_at)
+        return [reminder.id for reminder in self.reminders]
+
+    def test_fire_time_is_sent_once(self):
+        ReminderDispatchService.claim_due(self.make_due(), self.now, 'first')
+        self.assertEqual(ReminderDispatchService.deliver('first', self.now), (3, 0))
+
+        # A second run over the same fire times (retry, overlapping scheduler)
+        claimed = ReminderDispatchService.claim_due(self.make_due(), self.now, 'second')
+
+        self.assertEqual(len(claimed), 3)
+        self.assertEqual(ReminderDispatchService.deliver('second', self.now), (0, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(Notification.objects.filter(scheduled_for=self.fire_at).count(), 3)
+
+    def test_dispatch_rerun_sends_nothing_new(self):
+        self.make_due()
+        queues.get_due_queue().invalidate()
+        self.assertEqual(ReminderDispatchService.dispatch(self.now)['sent'], 3)
+
+        self.make_due()
+        queues.get_due_queue().invalidate()
+
+        self.assertEqual(ReminderDispatchService.dispatch(self.now)['sent'], 0)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_deliver_sends_only_rows_it_marked_sending(self):
+        ReminderDispatchService.claim_due(self.make_due(), self.now, 'mine')
+        adopted, in_flight, *mine = Notification.objects.filter(claim_token='mine').order_by('id')
+        # One row was taken over by another dispatch, another one is already
+        # being sent by an earlier run
+        Notification.objects.filter(id=adopted.id).update(claim_token='theirs')
+        Notification.objects.filter(id=in_flight.id).update(status='sending', claim_token='theirs')
+
+        self.assertEqual(ReminderDispatchService.deliver('mine', self.now), (len(mine), 0))
+
+        self.assertEqual(len(mail.outbox), len(mine))
+        self.assertEqual(Notification.objects.get(id=adopted.id).status, 'pending')
+        self.assertEqual(Notification.objects.get(id=in_flight.id).status, 'sending')
+        # Nothing is left for a second delivery under the same token
+        self.assertEqual(ReminderDispatchService.deliver('mine', self.now), (0, 0))
+        self.assertEqual(len(mail.outbox), len(mine))
+
+    def test_stalled_sending_rows_are_not_adopted(self):
+        ReminderDispatchService.claim_due(self.make_due(), self.now, 'dead')
+        pending, sending, _ = Notification.objects.filter(claim_token='dead').order_by('id')
+        Notification.objects.filter(id=sending.id).update(status='sending')
+        Notification.objects.filter(claim_token='dead').update(created_at=self.now - timedelta(minutes=5))
+
+        self.assertEqual(ReminderDispatchService.adopt_stalled('rescue', self.now), 2)
+
+        self.assertEqual(Notification.objects.get(id=sending.id).claim_token, 'dead')
+        self.assertEqual(ReminderDispatchService.deliver('rescue', self.now), (2, 0))
+        self.assertEqual(Notification.objects.get(id=sending.id).status, 'sending')
+
+
+class DoseAttributionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='asha', password='pw', phone_number='9000000002')
+        self.reminder = Reminder.objects.create(user=self.user, medicine_name='Metformin', time_slot='morning')
+        self.today = timezone.localdate()
+
+    def at(self, hour, minute=0, days=0):
+        return timezone.make_aware(datetime.combine(self.today + timedelta(days=days), time(hour, minute)))
+
+    def test_mark_belongs_to_the_nearest_dose(self):
+        # A late mark still counts for the morning's dose
+        self.assertEqual(self.reminder.dose_for(self.at(9, 30)), self.at(7))
+        self.assertEqual(self.reminder.dose_for(self.at(19)), self.at(7))
+        # Marking ahead of time counts for the upcoming dose, not yesterday's
+        self.assertEqual(self.reminder.dose_for(self.at(6, 30)), self.at(7))
+        self.assertEqual(self.reminder.dose_for(self.at(22)), self.at(7, days=1))
+
+    def test_early_mark_is_logged_against_the_next_dose(self):
+        AdherenceService.record_taken(self.reminder, True, now=self.at(6, 30))
+
+        event = DoseEvent.objects.get(reminder=self.reminder)
+        self.assertEqual(event.scheduled_at, self.at(7))
+        self.assertEqual(event.status, 'taken')
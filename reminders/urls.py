@@ -14,6 +14,7 @@ urlpatterns = [
     path('due-reminders/', views.get_due_reminders, name='due_reminders'),
     path('mark-taken/<int:reminder_id>/', views.toggle_reminder_taken, name='mark_taken'),
     path('statistics/', views.reminder_statistics, name='statistics'),
+    path('adherence/', views.reminder_adherence, name='adherence'),
     path('bulk-actions/', views.bulk_actions, name='bulk_actions'),
     path('test-notification/<int:reminder_id>/', views.test_notification, name='test_notification'),
 ]
@@ -2,10 +2,13 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
+from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
 from .models import Reminder
 from .forms import ReminderForm
+from .scheduler import ReminderChangeFeed
+from .services import AdherenceService, ReminderDispatchService, ReminderEtaService
 from notifications.services import NotificationService
 
 @login_required
@@ -188,22 +191,29 @@ def toggle_reminder_taken(request, reminder_id):
 @login_required
 def reminder_statistics(request):
     """Get reminder statistics for the user"""
-    reminders = Reminder.objects.filter(user=request.user)
-    
-    stats = {
-        'total_reminders': reminders.count(),
-        'active_reminders': reminders.filter(is_active=True).count(),
-        'morning_reminders': reminders.filter(time_slot='morning').count(),
-        'afternoon_reminders': reminders.filter(time_slot='afternoon').count(),
-        'evening_reminders': reminders.filter(time_slot='evening').count(),
-        'night_reminders': reminders.filter(time_slot='night').count(),
-    }
+    # All counts in one aggregate query
+    stats = Reminder.objects.filter(user=request.user).aggregate(
+        total_reminders=Count('id'),
+        active_reminders=Count('id', filter=Q(is_active=True)),
+        **{
+            f'{slot}_reminders': Count('id', filter=Q(time_slot=slot))
+            for slot, label in Reminder.TIME_CHOICES
+        }
+    )
     
     return JsonResponse({
         'success': True,
         'statistics': stats
     })
 
+@login_required
+def reminder_adherence(request):
+    """Doses due and taken over the last week and month, from the daily adherence totals"""
+    return JsonResponse({
+        'success': True,
+        'adherence': AdherenceService.adherence(request.user)
+    })
+
 @login_required
 def bulk_actions(request):
     """Perform bulk actions on reminders"""
@@ -220,10 +230,17 @@ def bulk_actions(request):
         reminders = Reminder.objects.filter(id__in=reminder_ids, user=request.user)
         
         if action == 'activate':
-            reminders.update(is_active=True)
+            reminders.filter(is_active=False).update(is_active=True, next_fire_at=None, updated_at=timezone.now())
+            ReminderEtaService.schedule_activated(reminders)
+            ReminderDispatchService.requeue(reminders)
+            ReminderChangeFeed.publish(reminders.values_list('id', flat=True))
             message = f'{reminders.count()} reminders activated'
         elif action == 'deactivate':
-            reminders.update(is_active=False)
+            fire_times = ReminderEtaService.fire_times(reminders)
+            reminders.update(is_active=False, next_fire_at=None, updated_at=timezone.now())
+            ReminderEtaService.reschedule(fire_times, [])
+            ReminderDispatchService.requeue(reminders)
+            ReminderChangeFeed.publish(reminders.values_list('id', flat=True))
             message = f'{reminders.count()} reminders deactivated'
         elif action == 'delete':
             count = reminders.count()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""
+Reminder Email Rendering Benchmark
+Compares the old f-string reminder email, rendering the template through
+Django for every message, and the compiled NotificationRenderer.
+
+Usage: python scripts/benchmark_reminder_email.py [messages]
+"""
+
+import os
+import sys
+import time
+
+# Add project root to path
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'healthkart360.settings')
+
+import django
+django.setup()
+
+from django.template.loader import render_to_string
+from django.utils import translation
+from notifications.rendering import NotificationRenderer
+from reminders.models import Reminder
+from users.models import User
+
+
+def fstring_email(user, reminder):
+    """The f-string build that NotificationService used before the renderer"""
+    message = f"""
+        Hello {user.first_name},
+
+        It's time to take your medicine!
+
+        Medicine: {reminder.medicine_name}
+        Time: {reminder.get_time_slot_display()}
+        Notes: {reminder.notes or 'No additional notes'}
+
+        Please take your medicine as prescribed.
+
+        Best regards,
+        HealthKart 360 Team
+        """
+
+    html_message = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <title>Medicine Reminder - HealthKart 360</title>
+            <style>
+                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; background-color: #f4f4f4; margin: 0; padding: 20px; }}
+                .container {{ max-width: 600px; margin: 0 auto; background-color: #ffffff; padding: 30px; border-radius: 10px; box-shadow: 0 0 10px rgba(0,0,0,0.1); }}
+                .header {{ text-align: center; padding-bottom: 20px; border-bottom: 2px solid #007bff; }}
+                .header h1 {{ color: #007bff; margin: 0; font-size: 24px; }}
+                .content {{ padding: 20px 0; }}
+                .reminder-details {{ background-color: #f8f9fa; padding: 20px; border-radius: 5px; margin: 20px 0; }}
+                .reminder-details p {{ margin: 10px 0; }}
+                .footer {{ text-align: center; padding-top: 20px; border-top: 1px solid #eee; font-size: 12px; color: #777; }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h1>Medicine Reminder</h1>
+                </div>
+                <div class="content">
+                    <p>Hello {user.first_name},</p>
+                    <p>It's time to take your medicine!</p>
+
+                    <div class="reminder-details">
+                        <p><strong>Medicine:</strong> {reminder.medicine_name}</p>
+                        <p><strong>Time:</strong> {reminder.get_time_slot_display()}</p>
+                        <p><strong>Notes:</strong> {reminder.notes or 'No additional notes'}</p>
+                    </div>
+
+                    <p>Please take your medicine as prescribed.</p>
+                </div>
+                <div class="footer">
+                    <p>Best regards,<br>HealthKart 360 Team</p>
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+    return message, html_message
+
+
+def values_for(user, reminder, language):
+    return {
+        'first_name': user.first_name,
+        'medicine_name': reminder.medicine_name,
+        'time_slot': reminder.get_time_slot_display(),
+        'notes': reminder.notes or NotificationRenderer.translate("No additional notes", language),
+    }
+
+
+def django_email(user, reminder, language):
+    """Render both templates through the template engine for every message"""
+    values = values_for(user, reminder, language)
+    with translation.override(language):
+        return (
+            render_to_string('notifications/reminder_email.txt', values),
+            render_to_string('notifications/reminder_email.html', values),
+        )
+
+
+def compiled_email(user, reminder, language):
+    values = values_for(user, reminder, language)
+    return (
+        NotificationRenderer.render('notifications/reminder_email.txt', language, values),
+        NotificationRenderer.render('notifications/reminder_email.html', language, values),
+    )
+
+
+def timed(label, build, pairs):
+    start = time.perf_counter()
+    for user, reminder in pairs:
+        build(user, reminder)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms total {elapsed / len(pairs) * 1e6:9.1f} µs/email")
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    languages = ['en', 'hi', 'mr']
+    pairs = []
+    for i in range(count):
+        # Unsaved instances: the benchmark measures rendering only, not queries
+        user = User(first_name=f"User {i}", email=f"user{i}@example.com", preferred_language=languages[i % 3])
+        reminder = Reminder(user=user, medicine_name=f"Medicine {i} <500mg>", time_slot='morning', notes='After food' if i % 2 else '')
+        pairs.append((user, reminder))
+
+    print("HealthKart360 Reminder Email Rendering Benchmark")
+    print(f"Emails: {count} across {', '.join(languages)}\n")
+
+    # Warm-up compiles each template once per language, as the first email of a process would
+    for language in languages:
+        compiled_email(*pairs[0], language)
+        django_email(*pairs[0], language)
+
+    baseline = timed("f-string (old, English only)", fstring_email, pairs)
+    engine = timed("template engine per email", lambda u, r: django_email(u, r, NotificationRenderer.language_for(u)), pairs)
+    compiled = timed("compiled renderer", lambda u, r: compiled_email(u, r, NotificationRenderer.language_for(u)), pairs)
+
+    print(f"\nCompiled renderer: {baseline / compiled:.2f}x the f-string speed, {engine / compiled:.1f}x faster than the template engine")
+
+
+if __name__ == "__main__":
+    main()
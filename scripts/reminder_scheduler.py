@@ -1,20 +1,18 @@
 #!/usr/bin/env python
 """
 Automated Reminder Scheduler
-This script runs continuously and checks for due reminders every minute.
-It can be run as a background service or scheduled task.
+This script runs continuously and sends each reminder at its fire time.
+Several copies may run; only the one holding the dispatch lease sends.
 """
 
 import os
 import sys
-import time
 import logging
-from datetime import datetime
 
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(level)s - %(message)s',
+    format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
         logging.FileHandler('reminder_scheduler.log'),
         logging.StreamHandler()
@@ -33,40 +31,23 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'healthkart360.settings')
 import django
 django.setup()
 
-from django.core.management import call_command
-from django.utils import timezone
-
-
-def run_reminder_check():
-    """Run the reminder check command"""
-    try:
-        logger.info("Starting reminder check...")
-        call_command('send_reminders', verbosity=1)
-        logger.info("Reminder check completed successfully")
-    except Exception as e:
-        logger.error(f"Error during reminder check: {str(e)}")
+import signal
+from reminders.scheduler import ReminderScheduler
 
 
 def main():
-    """Main scheduler loop"""
+    """Run the reminder scheduler until interrupted"""
     logger.info("Starting Reminder Scheduler Service")
     logger.info("Press Ctrl+C to stop the service")
 
-    try:
-        while True:
-            # Get current time
-            now = timezone.localtime()
-            current_second = now.second
-
-            # Run reminder check every minute at :00 seconds
-            if current_second == 0:
-                logger.info(f"Running reminder check at {now.strftime('%Y-%m-%d %H:%M:%S')}")
-                run_reminder_check()
-
-            # Sleep for 1 second to check again
-            time.sleep(1)
+    scheduler = ReminderScheduler()
+    # Stop cleanly on SIGTERM too, releasing the dispatch lease for a standby
+    signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
 
+    try:
+        scheduler.run()
     except KeyboardInterrupt:
+        scheduler.stop()
         logger.info("Reminder Scheduler stopped by user")
     except Exception as e:
         logger.error(f"Unexpected error in scheduler: {str(e)}")
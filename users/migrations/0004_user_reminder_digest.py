@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_profile_picture'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='reminder_digest',
+            field=models.BooleanField(default=True, help_text='Combine reminders due at the same time into one email'),
+        ),
+    ]
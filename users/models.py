@@ -13,6 +13,7 @@ class User(AbstractUser):
     profile_picture = models.ImageField(upload_to='profile_pictures/', null=True, blank=True)
     is_pharmacist = models.BooleanField(default=False)
     pharmacy = models.ForeignKey('pharmacy.Pharmacy', on_delete=models.SET_NULL, null=True, blank=True, related_name='pharmacists')
+    reminder_digest = models.BooleanField(default=True, help_text="Combine reminders due at the same time into one email")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -28,6 +28,10 @@ def user_login(request):
             user = authenticate(request, username=username, password=password)
             if user is not None:
                 login(request, user)
+                # Warm the cached cart summary and the navbar cart badge count
+                from orders.services import CartService
+                CartService.get_summary(user, fresh=True)
+                CartService.remember_count(request.session, user)
                 # Redirect pharmacists to pharmacy dashboard
                 if hasattr(user, 'is_pharmacist') and user.is_pharmacist:
                     return redirect('pharmacy:dashboard')
@@ -48,6 +52,7 @@ def profile(request):
         user.email = request.POST.get('email', user.email)
         user.phone_number = request.POST.get('phone_number', user.phone_number)
         user.preferred_language = request.POST.get('preferred_language', user.preferred_language)
+        user.reminder_digest = request.POST.get('reminder_digest') == 'on'
 
         # Handle pharmacy name update for pharmacists
         if hasattr(user, 'is_pharmacist') and user.is_pharmacist: